@@ -14,7 +14,6 @@ Note: In production, sensitive values (like SECRET_KEY) should be managed secure
 
 import os
 import logging
-import secrets
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -24,7 +23,6 @@ from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 import pyotp
-from jose import JWTError, jwt
 
 # --- SQLAlchemy Setup ---
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, create_engine, func
@@ -33,6 +31,9 @@ from sqlalchemy.orm import sessionmaker, declarative_base, Session
 # --- Prometheus Instrumentation ---
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine
+
 # -----------------------------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------------------------
@@ -41,6 +42,15 @@ load_dotenv()  # Load .env file if available
 SECRET_KEY = os.getenv("SECRET_KEY", "your_super_secret_key")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./2fa.db")
 OTP_EXPIRATION_MINUTES = int(os.getenv("OTP_EXPIRATION_MINUTES", "5"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "2fa_service")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.getenv("TRACE_STATEMENT_MAX_LENGTH", "1024"))
 ALGORITHM = "HS256"
 
 # -----------------------------------------------------------------------------
@@ -49,6 +59,21 @@ ALGORITHM = "HS256"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("2FA-Service")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # Database Setup (SQLAlchemy)
 # -----------------------------------------------------------------------------
@@ -56,6 +81,7 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -189,6 +215,16 @@ app.openapi = custom_openapi
 # -----------------------------------------------------------------------------
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
 # -----------------------------------------------------------------------------
 # API Endpoints
 # -----------------------------------------------------------------------------
@@ -8,6 +8,8 @@ from jose import jwt
 from main import app, Base, get_db, SECRET_KEY, OTPGenerateResponse, OTPVerifyResponse
 from main import User  # The User model from main.py
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 # Use an in-memory SQLite database.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
@@ -90,3 +92,6 @@ def test_verify_invalid_otp():
     response_ver = client.post("/auth/verify", json={"username": "testuser2", "otp_code": "000000"})
     assert response_ver.status_code in (400, 401)
 
+def test_requests_are_traced():
+    response = client.get("/openapi.json", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
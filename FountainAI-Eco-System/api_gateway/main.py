@@ -7,28 +7,125 @@ requests in the FountainAI ecosystem. It performs JWT validation and dynamically
 requests to backend services based on the first URL segment.
 
 Features:
-- Validates JWT tokens using a simple AuthService.
-- Uses a service map to forward requests to the correct backend service.
-- Proxies requests asynchronously using httpx.
+- Validates JWT tokens using a simple AuthService, caching verified tokens until they expire.
+- Routes requests by longest path prefix using a routing table loaded from a watched
+  JSON file or the central registry, hot-swapped on change, with per-route timeouts,
+  retries and cache TTLs.
+- Actively health-checks each backend and fails fast (503) while it is ejected.
+- Guards each backend with a circuit breaker and a max-in-flight bulkhead (503 when tripped).
+- Retries idempotent calls with jittered backoff under a global retry budget, and can
+  hedge GETs that are slower than the route's recent p95.
+- Optionally caches GET responses in memory, honouring Cache-Control and ETag.
+- Coalesces identical concurrent GETs into a single upstream call (single-flight).
+- Offers a POST /batch fan-out endpoint that runs sub-requests concurrently under one deadline.
+- Proxies requests asynchronously over shared, pooled httpx clients (one per backend),
+  streaming request and response bodies instead of buffering them.
+- Compresses responses with gzip/brotli/zstd as negotiated via Accept-Encoding.
 - Exposes Prometheus metrics.
 - Provides a health-check endpoint.
 - Overrides the OpenAPI schema to 3.0.3 (Swagger-compatible).
 """
 
 import os
+import time
+import asyncio
+import json
+import hashlib
 import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
 import httpx
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import Response
-from jose import JWTError, jwt
+from fastapi.responses import Response, StreamingResponse
+from jose import JWTError
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge
+
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware
+from fountainai_common.auth import JWKSVerifier, RevocationList
+from fountainai_common.compression import CompressionMiddleware, available_encodings
+from fountainai_common.upstream import UpstreamPool, HealthChecker
+from fountainai_common.resilience import ServiceGuard, RetryBudget, LatencyTracker, with_retries
+from fountainai_common.http_cache import (
+    CachedResponse, ResponseCache, SingleFlight, parse_cache_control, parse_route_ttls, single_flight_key
+)
 
 # Load environment variables.
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your_api_gateway_secret_key")
+JWKS_URL = os.getenv("JWKS_URL", "")  # e.g. http://fountainai-rbac:8001/.well-known/jwks.json
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "300"))
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "2"))
+JWT_ACCEPT_HMAC = os.getenv("JWT_ACCEPT_HMAC", "true").lower() == "true"
+REVOCATIONS_URL = os.getenv("REVOCATIONS_URL", "")  # e.g. http://fountainai-rbac:8001/token/revocations
+REVOCATIONS_POLL_TIMEOUT = float(os.getenv("REVOCATIONS_POLL_TIMEOUT", "30"))
+REVOCATIONS_RETRY_INTERVAL = float(os.getenv("REVOCATIONS_RETRY_INTERVAL", "5"))
 API_GATEWAY_HOST = os.getenv("API_GATEWAY_HOST", "0.0.0.0")
 API_GATEWAY_PORT = int(os.getenv("API_GATEWAY_PORT", "8002"))
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "30"))
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+BULKHEAD_MAX_IN_FLIGHT = int(os.getenv("BULKHEAD_MAX_IN_FLIGHT", "50"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+RESPONSE_CACHE_DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "0"))
+RESPONSE_CACHE_ROUTE_TTLS = os.getenv("RESPONSE_CACHE_ROUTE_TTLS", "")
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_MAX_BYTES = int(os.getenv("SINGLE_FLIGHT_MAX_BYTES", str(1024 * 1024)))
+HEALTH_CHECK_ENABLED = os.getenv("HEALTH_CHECK_ENABLED", "true").lower() == "true"
+HEALTH_CHECK_PATH = os.getenv("HEALTH_CHECK_PATH", "/health")
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_CHECK_MAX_LATENCY = float(os.getenv("HEALTH_CHECK_MAX_LATENCY", "1.0"))
+HEALTH_CHECK_UNHEALTHY_THRESHOLD = int(os.getenv("HEALTH_CHECK_UNHEALTHY_THRESHOLD", "3"))
+HEALTH_CHECK_HEALTHY_THRESHOLD = int(os.getenv("HEALTH_CHECK_HEALTHY_THRESHOLD", "2"))
+ROUTES_SOURCE = os.getenv("ROUTES_SOURCE", "file")  # "file" or "registry"
+ROUTES_FILE = os.getenv("ROUTES_FILE", "routes.json")
+ROUTES_REGISTRY_URL = os.getenv("ROUTES_REGISTRY_URL", "http://central_gateway:8000")
+ROUTES_RELOAD_INTERVAL = float(os.getenv("ROUTES_RELOAD_INTERVAL", "5"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "1.0"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "10"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.01"))
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip")
+COMPRESSION_CONTENT_TYPES = os.getenv(
+    "COMPRESSION_CONTENT_TYPES", "application/json,application/javascript,application/xml,text/"
+)
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+BATCH_DEFAULT_TIMEOUT = float(os.getenv("BATCH_DEFAULT_TIMEOUT", "10"))
+BATCH_MAX_TIMEOUT = float(os.getenv("BATCH_MAX_TIMEOUT", "30"))
+BATCH_MAX_RESPONSE_BYTES = int(os.getenv("BATCH_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "api_gateway")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
 
 # -----------------------------------------------------------------------------
 # Logging configuration
@@ -36,13 +133,112 @@ API_GATEWAY_PORT = int(os.getenv("API_GATEWAY_PORT", "8002"))
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api-gateway")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+)
+
+# -----------------------------------------------------------------------------
+# Token Revocation (Change Stream from fountainai-rbac)
+# -----------------------------------------------------------------------------
+revocation_list = RevocationList(
+    url=REVOCATIONS_URL, poll_timeout=REVOCATIONS_POLL_TIMEOUT, retry_interval=REVOCATIONS_RETRY_INTERVAL
+)
+
+# -----------------------------------------------------------------------------
+# JWKS Verification (Asymmetric Tokens from fountainai-rbac)
+# -----------------------------------------------------------------------------
+jwks_verifier = JWKSVerifier(
+    url=JWKS_URL,
+    refresh_interval=JWKS_REFRESH_INTERVAL,
+    min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+    timeout=JWKS_TIMEOUT,
+    accept_hmac=JWT_ACCEPT_HMAC,
+    revocations=revocation_list,
+)
+
 # -----------------------------------------------------------------------------
 # Simple Auth Service & Dependency for JWT Validation
 # -----------------------------------------------------------------------------
+JWT_CACHE_LOOKUPS = Counter(
+    "gateway_jwt_cache_requests_total", "Token verifications answered from (hit) or added to (miss) the cache", ["result"]
+)
+JWT_CACHE_HIT_RATIO = Gauge("gateway_jwt_cache_hit_ratio", "Share of token verifications served from the cache")
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified tokens, keyed by a SHA-256 digest of the token.
+    Entries live until the token's `exp` (capped at `max_ttl` seconds), so a hot
+    token costs a hash lookup instead of a signature check.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_MAX_ENTRIES, max_ttl: float = JWT_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._hits = 0
+        self._lookups = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _record(self, hit: bool):
+        self._lookups += 1
+        self._hits += hit
+        JWT_CACHE_LOOKUPS.labels(result="hit" if hit else "miss").inc()
+        JWT_CACHE_HIT_RATIO.set(self._hits / self._lookups)
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() < entry[0]:
+            self._entries.move_to_end(key)
+            self._record(True)
+            return dict(entry[1])
+        if entry is not None:
+            del self._entries[key]
+        self._record(False)
+        return None
+
+    def put(self, key: str, claims: dict, exp: Optional[float]):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        self._entries[key] = (expires_at, dict(claims))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
 class AuthService:
+    def __init__(self):
+        self.token_cache = VerifiedTokenCache()
+
     def verify_token(self, token: str, secret_key: str, algorithm: str = "HS256") -> dict:
+        # The verifying key and algorithm are part of the cache key, so a token is
+        # never served from the cache for a key it was not checked against.
+        key = VerifiedTokenCache.digest(f"{algorithm}:{secret_key}:{token}")
+        cached = self.token_cache.get(key)
+        if cached is not None:
+            if cached.pop("jti", None) in revocation_list:
+                logger.error("JWT error: token has been revoked")
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token signature or expired."
+                )
+            return cached
         try:
-            payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+            payload = jwks_verifier.decode(token, secret_key, algorithm)
             username = payload.get("sub")
             roles = payload.get("roles")
             if username is None:
@@ -50,7 +246,10 @@ class AuthService:
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid token payload."
                 )
-            return {"username": username, "roles": roles}
+            user = {"username": username, "roles": roles}
+            # The jti rides along in the cache so revocations apply to cached tokens too.
+            self.token_cache.put(key, {**user, "jti": payload.get("jti")}, payload.get("exp"))
+            return user
         except JWTError as e:
             logger.error("JWT error: %s", e)
             raise HTTPException(
@@ -71,15 +270,6 @@ def get_token_header(authorization: str = None):
 def get_current_user(token: str = Depends(get_token_header)):
     return auth_service.verify_token(token, SECRET_KEY)
 
-# -----------------------------------------------------------------------------
-# Service Map: Mapping first URL segment to backend service URL.
-# -----------------------------------------------------------------------------
-service_map = {
-    "service_a": "http://service_a:8000",
-    "typesense_client": "http://typesense_client_service:8001",
-    # Add additional microservices here.
-}
-
 # -----------------------------------------------------------------------------
 # FastAPI Application Initialization
 # -----------------------------------------------------------------------------
@@ -113,6 +303,497 @@ app.openapi = custom_openapi
 from prometheus_fastapi_instrumentator import Instrumentator
 Instrumentator().instrument(app).expose(app)
 
+# -----------------------------------------------------------------------------
+# Response Compression (Accept-Encoding Negotiation)
+# -----------------------------------------------------------------------------
+def compression_route_label(path: str) -> str:
+    """Metric label: the routing-table route serving the path, else the gateway endpoint."""
+    route, _ = routing_table.match(path)
+    if route is not None:
+        return route.name
+    first = path.strip("/").partition("/")[0]
+    return first if first in ("batch", "health", "metrics") else "unmatched"
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        route_label=compression_route_label,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        encodings=available_encodings(COMPRESSION_ENCODINGS),
+        content_types=COMPRESSION_CONTENT_TYPES,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY,
+        zstd_level=COMPRESSION_ZSTD_LEVEL,
+    )
+
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+@app.on_event("startup")
+async def start_jwks_refresh():
+    jwks_verifier.start()
+
+@app.on_event("shutdown")
+async def stop_jwks_refresh():
+    jwks_verifier.stop()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    revocation_list.stop()
+
+# -----------------------------------------------------------------------------
+# Shared Upstream Connection Pool
+# -----------------------------------------------------------------------------
+upstream_pool = UpstreamPool(
+    max_connections=UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive=UPSTREAM_MAX_KEEPALIVE,
+    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    http2=UPSTREAM_HTTP2,
+    timeout=UPSTREAM_TIMEOUT,
+)
+
+@app.on_event("shutdown")
+async def close_upstream_pool():
+    await upstream_pool.aclose()
+
+# -----------------------------------------------------------------------------
+# Routing Table: Hot-Reloadable, Compiled Into a Prefix Trie
+# -----------------------------------------------------------------------------
+# Used when no routes file exists and the registry has not been reached yet.
+DEFAULT_ROUTES = {
+    "service_a": "http://service_a:8000",
+    "typesense_client": "http://typesense_client_service:8001",
+}
+
+ROUTING_TABLE_ROUTES = Gauge("gateway_routing_table_routes", "Routes in the active routing table")
+ROUTING_TABLE_RELOADS = Counter(
+    "gateway_routing_table_reloads_total", "Routing table reload attempts", ["result"]
+)
+
+class Route:
+    """A backend reachable under a (possibly multi-segment) path prefix, with per-route options."""
+
+    __slots__ = ("name", "prefix", "url", "timeout", "retries", "cache_ttl", "public")
+
+    def __init__(
+        self,
+        prefix: str,
+        url: str,
+        name: Optional[str] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        public: bool = False,
+    ):
+        self.prefix = prefix.strip("/")
+        if not self.prefix or not url:
+            raise ValueError(f"Route needs a non-empty prefix and url: {prefix!r} -> {url!r}")
+        self.url = url.rstrip("/")
+        # Backend name used for pooled clients, guards, health checks and metrics.
+        self.name = name or self.prefix
+        self.timeout = timeout
+        self.retries = retries
+        self.cache_ttl = cache_ttl
+        # GETs return the same response to every caller, so they are cached and
+        # coalesced once for all users rather than per user.
+        self.public = public
+
+class RoutingTable:
+    """
+    Immutable set of routes compiled into a segment trie. Each node is a dict keyed by
+    path segment; the route ending at a node is stored under the `None` key. match()
+    walks the request path in place with str.find instead of splitting it, so a lookup
+    costs one dict probe per segment and returns the longest matching prefix.
+    """
+
+    def __init__(self, routes: List[Route], source: str = "default"):
+        self.routes = routes
+        self.source = source
+        self._root: Dict[Optional[str], object] = {}
+        for route in routes:
+            node = self._root
+            for segment in route.prefix.split("/"):
+                node = node.setdefault(segment, {})
+            if None in node:
+                raise ValueError(f"Duplicate route prefix '{route.prefix}'")
+            node[None] = route
+
+    def match(self, path: str) -> Tuple[Optional[Route], str]:
+        """Return (route, remaining sub-path) for the longest matching prefix, or (None, "")."""
+        node = self._root
+        best, best_end = None, 0
+        start, length = (1 if path.startswith("/") else 0), len(path)
+        while start < length:
+            end = path.find("/", start)
+            if end == -1:
+                end = length
+            node = node.get(path[start:end])
+            if node is None:
+                break
+            route = node.get(None)
+            if route is not None:
+                best, best_end = route, end
+            start = end + 1
+        if best is None:
+            return None, ""
+        return best, path[best_end + 1:]
+
+    def targets(self) -> List[Tuple[str, str]]:
+        return [(route.name, route.url) for route in self.routes]
+
+def compile_routes(config, source: str = "config") -> RoutingTable:
+    """
+    Build a routing table from either a flat {"prefix": "url"} mapping (the central
+    registry's format) or {"routes": [{"prefix", "url", "name", "timeout", "retries",
+    "cache_ttl", "public"}, ...]}. Raises ValueError on malformed input.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("Routing config must be a JSON object")
+    if "routes" in config:
+        entries = config["routes"]
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ValueError("'routes' must be a list of objects")
+        routes = [
+            Route(
+                e.get("prefix", ""),
+                e.get("url", ""),
+                name=e.get("name"),
+                timeout=float(e["timeout"]) if e.get("timeout") is not None else None,
+                retries=int(e["retries"]) if e.get("retries") is not None else None,
+                cache_ttl=float(e["cache_ttl"]) if e.get("cache_ttl") is not None else None,
+                public=bool(e.get("public", False)),
+            )
+            for e in entries
+        ]
+    else:
+        routes = [Route(prefix, url) for prefix, url in config.items()]
+    return RoutingTable(routes, source)
+
+def load_routes_file(path: str) -> RoutingTable:
+    with open(path) as f:
+        return compile_routes(json.load(f), source=f"file:{path}")
+
+def set_routing_table(table: RoutingTable):
+    """Swap the active routing table; in-flight requests keep the table they matched against."""
+    global routing_table
+    routing_table = table
+    ROUTING_TABLE_ROUTES.set(len(table.routes))
+    logger.info("Routing table loaded from %s with %d routes", table.source, len(table.routes))
+
+class RouteWatcher:
+    """
+    Reloads the routing table in the background, either when ROUTES_FILE's mtime changes
+    or when the central registry's /registry listing changes. A reload that fails to
+    fetch or compile is logged and the previous table stays active.
+    """
+
+    def __init__(
+        self,
+        source: str = ROUTES_SOURCE,
+        path: str = ROUTES_FILE,
+        registry_url: str = ROUTES_REGISTRY_URL,
+        interval: float = ROUTES_RELOAD_INTERVAL,
+    ):
+        self.source = source
+        self.path = path
+        self.registry_url = registry_url.rstrip("/")
+        self.interval = interval
+        self._fingerprint = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch(self):
+        """Return (fingerprint, config) for the current route source."""
+        if self.source == "registry":
+            response = await upstream_pool.request("central_gateway", "GET", f"{self.registry_url}/registry")
+            response.raise_for_status()
+            config = response.json()
+            return json.dumps(config, sort_keys=True), config
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._fingerprint:
+            return mtime, None
+        with open(self.path) as f:
+            return mtime, json.load(f)
+
+    async def reload_once(self) -> bool:
+        """Reload if the source changed. Returns True when a new table was installed."""
+        try:
+            fingerprint, config = await self._fetch()
+            if fingerprint == self._fingerprint:
+                return False
+            table = compile_routes(config, source=self.source if self.source == "registry" else f"file:{self.path}")
+        except (OSError, ValueError, httpx.HTTPError) as e:
+            ROUTING_TABLE_RELOADS.labels(result="error").inc()
+            logger.error("Routing table reload from %s failed; keeping current table: %s", self.source, e)
+            return False
+        self._fingerprint = fingerprint
+        set_routing_table(table)
+        ROUTING_TABLE_RELOADS.labels(result="reloaded").inc()
+        return True
+
+    async def _run(self):
+        while True:
+            await self.reload_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+routing_table = RoutingTable([Route(prefix, url) for prefix, url in DEFAULT_ROUTES.items()])
+if ROUTES_SOURCE == "file" and os.path.exists(ROUTES_FILE):
+    try:
+        routing_table = load_routes_file(ROUTES_FILE)
+    except (OSError, ValueError) as e:
+        logger.error("Could not load %s; using default routes: %s", ROUTES_FILE, e)
+route_watcher = RouteWatcher()
+
+@app.on_event("startup")
+async def start_route_watcher():
+    if ROUTES_RELOAD_INTERVAL > 0:
+        route_watcher.start()
+
+@app.on_event("shutdown")
+async def stop_route_watcher():
+    await route_watcher.stop()
+
+# -----------------------------------------------------------------------------
+# Streaming Pass-Through Helpers
+# -----------------------------------------------------------------------------
+# Connection-level headers that must not be forwarded by a proxy (RFC 7230, section 6.1).
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+})
+
+def filter_hop_by_hop(headers) -> Dict[str, str]:
+    """Drop hop-by-hop headers, including any named in the Connection header."""
+    dropped = set(HOP_BY_HOP_HEADERS)
+    connection = next((v for k, v in headers.items() if k.lower() == "connection"), "")
+    for token in connection.split(","):
+        dropped.add(token.strip().lower())
+    return {k: v for k, v in headers.items() if k.lower() not in dropped}
+
+def upstream_body(request: Request):
+    """Return the incoming body as an async iterator, or None when the request carries no body."""
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
+        return request.stream()
+    return None
+
+class UpstreamCall:
+    """An open, streamed upstream response plus the bookkeeping to release once it is consumed."""
+
+    def __init__(self, backend: str, response: httpx.Response, on_close: Optional[Callable[[], None]] = None):
+        self.backend = backend
+        self.response = response
+        self.on_close = on_close
+        self._closed = False
+
+    async def aiter_raw(self):
+        if self.response.is_stream_consumed:
+            # Transports that pre-read the body (e.g. httpx.MockTransport) leave nothing to stream.
+            yield self.response.content
+        else:
+            async for chunk in self.response.aiter_raw():
+                yield chunk
+
+    async def read(self) -> bytes:
+        try:
+            return b"".join([chunk async for chunk in self.aiter_raw()])
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await upstream_pool.close_stream(self.backend, self.response)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+def stream_upstream_response(call: UpstreamCall) -> StreamingResponse:
+    """Relay raw upstream bytes (still encoded) and release the connection once done."""
+    async def relay():
+        try:
+            async for chunk in call.aiter_raw():
+                yield chunk
+        finally:
+            await call.aclose()
+
+    return StreamingResponse(
+        relay(),
+        status_code=call.response.status_code,
+        headers=filter_hop_by_hop(call.response.headers),
+    )
+
+async def relay_upstream(call: UpstreamCall, buffer_limit: int = 0) -> Response:
+    """Stream the upstream response, or buffer it when it is known to fit in `buffer_limit` bytes."""
+    length = call.response.headers.get("content-length", "")
+    if buffer_limit and length.isdigit() and int(length) <= buffer_limit:
+        body = await call.read()
+        return Response(
+            content=body,
+            status_code=call.response.status_code,
+            headers=filter_hop_by_hop(call.response.headers),
+        )
+    return stream_upstream_response(call)
+
+# -----------------------------------------------------------------------------
+# Active Health Checking and Outlier Ejection
+# -----------------------------------------------------------------------------
+health_checker = HealthChecker(
+    path=HEALTH_CHECK_PATH,
+    interval=HEALTH_CHECK_INTERVAL,
+    timeout=HEALTH_CHECK_TIMEOUT,
+    max_latency=HEALTH_CHECK_MAX_LATENCY,
+    unhealthy_threshold=HEALTH_CHECK_UNHEALTHY_THRESHOLD,
+    healthy_threshold=HEALTH_CHECK_HEALTHY_THRESHOLD,
+)
+
+async def load_health_check_targets() -> List[Tuple[str, str]]:
+    return routing_table.targets()
+
+@app.on_event("startup")
+async def start_health_checker():
+    if HEALTH_CHECK_ENABLED:
+        health_checker.start(load_health_check_targets)
+
+@app.on_event("shutdown")
+async def stop_health_checker():
+    await health_checker.stop()
+
+# -----------------------------------------------------------------------------
+# Circuit Breakers and Bulkheads (per backend service)
+# -----------------------------------------------------------------------------
+service_guards: Dict[str, ServiceGuard] = {}
+
+def guard_for(service_name: str) -> ServiceGuard:
+    guard = service_guards.get(service_name)
+    if guard is None:
+        guard = service_guards[service_name] = ServiceGuard(
+            service_name,
+            failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT,
+            half_open_max_calls=CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+            max_in_flight=BULKHEAD_MAX_IN_FLIGHT,
+        )
+    return guard
+
+def admit(service_name: str) -> ServiceGuard:
+    """Return the service's guard with a slot taken, or fail fast with 503."""
+    guard = guard_for(service_name)
+    reason = guard.try_acquire()
+    if reason == "circuit_open":
+        raise HTTPException(status_code=503, detail=f"Circuit open for '{service_name}'")
+    if reason == "bulkhead_full":
+        raise HTTPException(status_code=503, detail=f"Too many requests in flight to '{service_name}'")
+    return guard
+
+# -----------------------------------------------------------------------------
+# GET Response Cache (ETag / Cache-Control aware, LRU-bounded)
+# -----------------------------------------------------------------------------
+response_cache = ResponseCache(
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    max_entry_bytes=RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    default_ttl=RESPONSE_CACHE_DEFAULT_TTL,
+    route_ttls=parse_route_ttls(RESPONSE_CACHE_ROUTE_TTLS),
+)
+
+async def serve_cached_get(
+    route: str,
+    request: Request,
+    headers: Dict[str, str],
+    scope: str,
+    fetch: Callable[[Dict[str, str]], Awaitable[UpstreamCall]],
+    buffer_limit: int = 0,
+    route_ttl: Optional[float] = None,
+) -> Response:
+    """Answer a GET from the response cache, revalidating or refilling it from `fetch` as needed."""
+    request_directives = parse_cache_control(request.headers.get("cache-control", ""))
+    if "no-store" in request_directives:
+        response_cache.record("bypass")
+        return await relay_upstream(await fetch(headers), buffer_limit)
+
+    key = response_cache.key(route, request, scope)
+    entry = response_cache.get(key)
+    if entry is not None and entry.is_fresh() and "no-cache" not in request_directives:
+        response_cache.record("hit")
+        return entry.to_response(request, "HIT")
+
+    client_conditional = "if-none-match" in headers or "if-modified-since" in headers
+    if entry is not None and not client_conditional:
+        headers = {**headers, **entry.validators()}
+    call = await fetch(headers)
+    upstream = call.response
+
+    if upstream.status_code == 304 and entry is not None and (
+        not client_conditional or entry.confirmed_by(headers, upstream.headers.get("etag"))
+    ):
+        await call.aclose()
+        ttl = response_cache.ttl_for(route, upstream.headers, route_ttl, shared=not scope)
+        entry.refresh(ttl if ttl is not None else 0.0)
+        response_cache.record("revalidated")
+        return entry.to_response(request, "REVALIDATED")
+
+    response_cache.record("miss")
+    ttl = response_cache.ttl_for(route, upstream.headers, route_ttl, shared=not scope)
+    length = upstream.headers.get("content-length", "")
+    storable = (
+        upstream.status_code == 200
+        and ttl is not None
+        and (ttl > 0 or "etag" in upstream.headers or "last-modified" in upstream.headers)
+        and length.isdigit()
+        and int(length) <= response_cache.max_entry_bytes
+    )
+    if not storable:
+        if entry is not None:
+            response_cache.discard(key)
+        return await relay_upstream(call, buffer_limit)
+
+    body = await call.read()
+    cached = CachedResponse(upstream.status_code, filter_hop_by_hop(upstream.headers), body, ttl)
+    response_cache.put(key, cached)
+    return cached.to_response(request, "MISS")
+
+# -----------------------------------------------------------------------------
+# Request Coalescing (single-flight) for Identical Concurrent GETs
+# -----------------------------------------------------------------------------
+single_flight = SingleFlight()
+
+# -----------------------------------------------------------------------------
+# Retries (with a Global Budget) and Hedged GETs
+# -----------------------------------------------------------------------------
+retry_budget = RetryBudget(ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND)
+latency_tracker = LatencyTracker(quantile=HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY)
+
 # -----------------------------------------------------------------------------
 # Health Check Endpoint
 # -----------------------------------------------------------------------------
@@ -120,6 +801,149 @@ Instrumentator().instrument(app).expose(app)
 async def health_check():
     return {"status": "healthy"}
 
+# -----------------------------------------------------------------------------
+# Fan-out Aggregation (POST /batch)
+# -----------------------------------------------------------------------------
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = Field(None, description="Client-chosen identifier echoed back in the result")
+    method: str = Field("GET", regex="^(GET|POST|PUT|DELETE|PATCH)$", description="HTTP method")
+    path: str = Field(..., description="Proxied path: '<service>/<subpath>', e.g. 'character/characters/1'")
+    query: Dict[str, str] = Field(default_factory=dict, description="Query string parameters")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Extra headers for this sub-request")
+    body: Optional[Any] = Field(None, description="JSON body sent upstream")
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_items=1, description="Sub-requests, executed concurrently")
+    timeout: Optional[float] = Field(None, gt=0, description="Deadline in seconds for the whole batch")
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str]
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Optional[Any] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+BATCH_SUBREQUESTS = Counter(
+    "gateway_batch_subrequests_total", "Sub-requests executed through /batch", ["outcome"]
+)
+
+# Taken from the /batch request itself; a sub-request may not replace them.
+BATCH_OUTER_HEADERS = frozenset({"host", "content-length", "content-encoding", "authorization", "cookie"})
+
+def batch_headers(request: Request, sub: BatchSubRequest) -> Dict[str, str]:
+    """
+    Headers for a sub-request: the caller's end-to-end headers plus the sub-request's own.
+    Sub-requests cannot set hop-by-hop headers or swap the caller's credentials, so a
+    batch never reaches a backend as anyone other than the user who sent it.
+    """
+    headers = filter_hop_by_hop(request.headers)
+    for name in ("host", "content-length", "content-type", "content-encoding"):
+        headers.pop(name, None)
+    for name, value in filter_hop_by_hop(sub.headers).items():
+        if name.lower() not in BATCH_OUTER_HEADERS:
+            headers[name.lower()] = value
+    # Results are embedded in a JSON document, so ask for bodies we can decode.
+    headers["accept-encoding"] = "identity"
+    return headers
+
+async def run_subrequest(
+    request: Request,
+    sub: BatchSubRequest,
+    open_call: Callable[[BatchSubRequest, Dict[str, str], Optional[bytes]], Awaitable[UpstreamCall]],
+) -> BatchSubResponse:
+    headers = batch_headers(request, sub)
+    content = None
+    if sub.body is not None:
+        content = json.dumps(sub.body).encode()
+        headers["content-type"] = "application/json"
+    try:
+        call = await open_call(sub, headers, content)
+    except HTTPException as e:
+        return BatchSubResponse(id=sub.id, status=e.status_code, error=str(e.detail))
+
+    chunks, size = [], 0
+    try:
+        async for chunk in call.aiter_raw():
+            size += len(chunk)
+            if size > BATCH_MAX_RESPONSE_BYTES:
+                return BatchSubResponse(id=sub.id, status=502, error="Sub-response exceeds BATCH_MAX_RESPONSE_BYTES")
+            chunks.append(chunk)
+    finally:
+        await call.aclose()
+
+    raw = b"".join(chunks)
+    upstream = call.response
+    if "json" in upstream.headers.get("content-type", "") and raw:
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = raw.decode("utf-8", errors="replace")
+    else:
+        body = raw.decode("utf-8", errors="replace") if raw else None
+    return BatchSubResponse(
+        id=sub.id,
+        status=upstream.status_code,
+        headers=filter_hop_by_hop(upstream.headers),
+        body=body,
+    )
+
+async def execute_batch(
+    request: Request,
+    batch: BatchRequest,
+    open_call: Callable[[BatchSubRequest, Dict[str, str], Optional[bytes]], Awaitable[UpstreamCall]],
+) -> BatchResponse:
+    """Run all sub-requests concurrently under one deadline; failures are reported per sub-request."""
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_REQUESTS} requests")
+    timeout = min(batch.timeout or BATCH_DEFAULT_TIMEOUT, BATCH_MAX_TIMEOUT)
+    tasks = [asyncio.ensure_future(run_subrequest(request, sub, open_call)) for sub in batch.requests]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    responses = []
+    for sub, task in zip(batch.requests, tasks):
+        if task in pending:
+            result = BatchSubResponse(id=sub.id, status=504, error="Batch deadline exceeded")
+            outcome = "timeout"
+        elif task.exception() is not None:
+            result = BatchSubResponse(id=sub.id, status=502, error=str(task.exception()))
+            outcome = "error"
+        else:
+            result = task.result()
+            outcome = "ok" if result.error is None and result.status < 500 else "error"
+        BATCH_SUBREQUESTS.labels(outcome=outcome).inc()
+        responses.append(result)
+    return BatchResponse(responses=responses)
+
+def resolve_route(path: str) -> Tuple[Route, str]:
+    """Match a path against the routing table (404 unknown, 503 ejected)."""
+    route, sub_path = routing_table.match(path)
+    if route is None:
+        raise HTTPException(status_code=404, detail="Service not recognized.")
+    if not health_checker.is_healthy(route.name, route.url):
+        raise HTTPException(status_code=503, detail="Service unavailable.")
+    return route, sub_path
+
+@app.post("/batch", response_model=BatchResponse, tags=["Proxy"])
+async def batch(payload: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Executes several proxied requests concurrently and returns all results in one response.
+    Each sub-request has its own status; a failing or timed-out backend does not fail the batch.
+    Registered before the catch-all proxy so it is not forwarded to a backend named "batch".
+    """
+    async def open_call(sub: BatchSubRequest, headers: Dict[str, str], content: Optional[bytes]) -> UpstreamCall:
+        if not sub.path.strip("/"):
+            raise HTTPException(status_code=400, detail="Invalid path.")
+        route, sub_path = resolve_route(sub.path)
+        return await open_upstream(route, sub.method, sub_path, headers, sub.query, content)
+
+    return await execute_batch(request, payload, open_call)
+
 # -----------------------------------------------------------------------------
 # Proxy Endpoint: Catch-all route to forward requests.
 # -----------------------------------------------------------------------------
@@ -132,43 +956,81 @@ async def proxy(
     """
     Catches all requests and forwards them to the appropriate backend service.
     
-    The first segment of the path determines the target service.
+    The longest matching route prefix determines the target service.
     Example: /service_a/endpoint will be forwarded to http://service_a:8000/endpoint.
     """
-    path_parts = full_path.split("/")
-    if not path_parts or path_parts[0] == "":
+    if not full_path or full_path.startswith("/"):
         raise HTTPException(status_code=400, detail="Invalid path.")
 
-    target_key = path_parts[0]
-    service_url = service_map.get(target_key)
-    if not service_url:
-        raise HTTPException(status_code=404, detail="Service not recognized.")
-
-    sub_path = "/".join(path_parts[1:])  # This may be empty.
-    target_url = f"{service_url}/{sub_path}" if sub_path else service_url
-    logger.info("Routing request to %s", target_url)
+    route, sub_path = resolve_route(full_path)  # sub_path may be empty.
 
-    # Forward headers (remove the host header).
-    headers = dict(request.headers)
+    # Forward end-to-end headers only (remove the host header).
+    headers = filter_hop_by_hop(request.headers)
     headers.pop("host", None)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                params=request.query_params,
-                content=await request.body()
-            )
-        except httpx.HTTPError as exc:
-            logger.error("Error forwarding request: %s", exc)
-            raise HTTPException(status_code=502, detail="Bad Gateway")
-    return Response(
-        content=response.content,
-        status_code=response.status_code,
-        headers=dict(response.headers)
+    if request.method == "GET":
+        scope = "" if route.public else str(current_user.get("username") or "")
+        fetch = lambda h: open_upstream(route, "GET", sub_path, h, request.query_params, None)
+        if not (route.public or scope):
+            # A token without a username has no scope of its own: sharing its responses
+            # under the empty scope would hand them to every caller of a public route.
+            return await relay_upstream(await fetch(headers))
+        buffer_limit = SINGLE_FLIGHT_MAX_BYTES if SINGLE_FLIGHT_ENABLED else 0
+
+        async def produce() -> Response:
+            if RESPONSE_CACHE_ENABLED:
+                return await serve_cached_get(full_path, request, headers, scope, fetch, buffer_limit, route.cache_ttl)
+            return await relay_upstream(await fetch(headers), buffer_limit)
+
+        if SINGLE_FLIGHT_ENABLED:
+            return await single_flight.do(single_flight_key(full_path, request, scope), produce)
+        return await produce()
+    call = await open_upstream(
+        route, request.method, sub_path, headers, request.query_params, upstream_body(request)
     )
+    return stream_upstream_response(call)
+
+async def open_upstream(route: Route, method: str, sub_path: str, headers, params, content) -> UpstreamCall:
+    """Open a streamed request to the route's backend, retrying or hedging idempotent calls."""
+    retries = route.retries if route.retries is not None else UPSTREAM_RETRIES
+    return await with_retries(
+        route.name, method, content,
+        lambda: open_upstream_attempt(route, method, sub_path, headers, params, content),
+        budget=retry_budget,
+        tracker=latency_tracker,
+        retries=retries,
+        hedge=HEDGE_ENABLED,
+        backoff_base=RETRY_BACKOFF_BASE,
+        backoff_max=RETRY_BACKOFF_MAX,
+    )
+
+async def open_upstream_attempt(route: Route, method: str, sub_path: str, headers, params, content) -> UpstreamCall:
+    """Pass the service guard and open a streamed request to the route's backend."""
+    target_key = route.name
+    target_url = f"{route.url}/{sub_path}" if sub_path else route.url
+    logger.info("Routing request to %s", target_url)
+    guard = admit(target_key)
+    options = {"timeout": route.timeout} if route.timeout is not None else {}
+    try:
+        response = await upstream_pool.stream(
+            target_key, method, target_url, headers=headers, params=params, content=content, **options
+        )
+    except httpx.HTTPError as exc:
+        guard.release()
+        guard.record_failure()
+        logger.error("Error forwarding request: %s", exc)
+        raise HTTPException(status_code=502, detail="Bad Gateway")
+    except BaseException:
+        # Cancelled (e.g. a /batch deadline or a losing hedge) or unexpected: give back the
+        # bulkhead slot, including a half-open trial that now has no outcome to report.
+        guard.release()
+        guard.abandon()
+        raise
+    if response.status_code >= 500:
+        guard.record_failure()
+    else:
+        guard.record_success()
+    return UpstreamCall(target_key, response, on_close=guard.release)
 
 # -----------------------------------------------------------------------------
 # Run the Application
@@ -4,7 +4,8 @@ import httpx
 from jose import jwt
 
 # Import from our application.
-from main import app, service_map, SECRET_KEY, get_current_user
+import main
+from main import app, SECRET_KEY, get_current_user, upstream_pool, filter_hop_by_hop, health_checker, service_guards, ServiceGuard, ResponseCache, AuthService
 
 client = TestClient(app)
 
@@ -18,10 +19,17 @@ def generate_dummy_token():
 app.dependency_overrides[get_current_user] = lambda: {"username": "testuser", "roles": "user"}
 
 # For proxy tests, we override httpx.AsyncClient using monkeypatch.
+backend_calls = []
+RealAsyncClient = httpx.AsyncClient
+
 def dummy_backend(request: httpx.Request) -> httpx.Response:
     # Simulate a backend response.
+    backend_calls.append(request.url.path)
     return httpx.Response(200, json={"dummy": "ok"})
 
+def use_dummy_route():
+    main.set_routing_table(main.compile_routes({"dummy": "http://dummy_backend"}))
+
 @pytest.fixture(autouse=True)
 def override_async_client(monkeypatch):
     original_client = httpx.AsyncClient
@@ -43,10 +51,366 @@ def test_health_check():
     assert "healthy" in data["status"]
 
 def test_proxy_dummy_get():
-    # Override service_map to include a dummy service.
-    service_map["dummy"] = "http://dummy_backend"
+    # Route a dummy service through the gateway.
+    use_dummy_route()
     # No Authorization header is needed because the dependency override provides a dummy user.
     response = client.get("/dummy/test")
     assert response.status_code == 200
     data = response.json()
     assert data["dummy"] == "ok"
+
+def test_proxy_reuses_pooled_client():
+    use_dummy_route()
+    client.get("/dummy/first")
+    pooled = upstream_pool.client_for("dummy")
+    response = client.get("/dummy/second")
+    assert response.status_code == 200
+    assert upstream_pool.client_for("dummy") is pooled
+
+def test_filter_hop_by_hop_headers():
+    headers = {"Connection": "close, X-Session", "X-Session": "abc", "TE": "trailers", "X-Request-Id": "42"}
+    assert filter_hop_by_hop(headers) == {"X-Request-Id": "42"}
+
+def test_proxy_fails_fast_for_ejected_backend():
+    use_dummy_route()
+    for _ in range(health_checker.unhealthy_threshold):
+        health_checker.record("dummy", "http://dummy_backend", ok=False)
+    try:
+        response = client.get("/dummy/test")
+        assert response.status_code == 503
+    finally:
+        for _ in range(health_checker.healthy_threshold):
+            health_checker.record("dummy", "http://dummy_backend", ok=True)
+    assert client.get("/dummy/test").status_code == 200
+
+def test_health_probes_do_not_queue_behind_proxied_traffic(monkeypatch):
+    import asyncio
+    pool = main.UpstreamPool(max_connections=1)
+    monkeypatch.setattr(main, "upstream_pool", pool)
+    pool.client_for("dummy")
+    asyncio.run(pool._acquire("dummy"))  # every pooled connection is busy
+
+    checker = main.HealthChecker(unhealthy_threshold=1)
+    asyncio.run(asyncio.wait_for(checker.run_once([("dummy", "http://dummy_backend")]), timeout=1))
+    assert checker.is_healthy("dummy", "http://dummy_backend")
+
+def test_bulkhead_and_open_circuit_fail_fast():
+    use_dummy_route()
+    service_guards["dummy"] = ServiceGuard("dummy", max_in_flight=0)
+    assert client.get("/dummy/test").status_code == 503
+
+    service_guards["dummy"] = ServiceGuard("dummy", failure_threshold=1)
+    service_guards["dummy"].record_failure()
+    response = client.get("/dummy/test")
+    assert response.status_code == 503
+    assert "circuit" in response.json()["detail"].lower()
+    del service_guards["dummy"]
+
+def test_cancelled_half_open_trial_frees_its_slot(monkeypatch):
+    import asyncio
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    use_dummy_route()
+    guard = service_guards["dummy"] = ServiceGuard("dummy", failure_threshold=1, reset_timeout=0, half_open_max_calls=1)
+    guard.record_failure()
+    monkeypatch.setattr(main.upstream_pool, "stream", hang)
+
+    async def cancel_trial():
+        route, _ = main.resolve_route("dummy/slow")
+        attempt = asyncio.ensure_future(main.open_upstream_attempt(route, "GET", "slow", {}, {}, None))
+        await asyncio.sleep(0.05)
+        assert (guard.state, guard.trial_calls) == (ServiceGuard.HALF_OPEN, 1)
+        attempt.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await attempt
+
+    try:
+        asyncio.run(cancel_trial())
+        assert guard.try_acquire() is None
+        assert (guard.state, guard.trial_calls) == (ServiceGuard.HALF_OPEN, 1)
+    finally:
+        del service_guards["dummy"]
+
+def test_get_responses_are_cached_per_route(monkeypatch):
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache(route_ttls={"dummy/characters": 60}))
+    use_dummy_route()
+    backend_calls.clear()
+
+    first = client.get("/dummy/characters?b=2&a=1")
+    second = client.get("/dummy/characters?a=1&b=2")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == {"dummy": "ok"}
+    assert backend_calls == ["/characters"]
+
+    # Routes without a TTL (and no upstream max-age) are not stored.
+    client.get("/dummy/stories")
+    client.get("/dummy/stories")
+    assert backend_calls.count("/stories") == 2
+
+    # A token without a username is never answered from, or stored in, the cache.
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: {"roles": "user"})
+    assert "x-cache" not in client.get("/dummy/characters?a=1&b=2").headers
+    assert backend_calls.count("/characters") == 2
+
+def test_concurrent_gets_are_coalesced_per_user_and_across_users_on_public_routes(monkeypatch):
+    import asyncio
+    from fastapi import Request
+    hosts = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    def user_from_header(request: Request):
+        return {"username": request.headers.get("x-user", "testuser"), "roles": "user"}
+
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, user_from_header)
+    main.set_routing_table(main.compile_routes({"routes": [
+        {"prefix": "drafts", "url": "http://drafts"},
+        {"prefix": "stories", "url": "http://stories", "public": True},
+    ]}))
+
+    async def burst(path):
+        async with RealAsyncClient(app=app, base_url="http://gateway") as gateway:
+            return await asyncio.gather(*(
+                gateway.get(path, headers={"x-user": user}) for user in ("ann", "ann", "bob", "bob")
+            ))
+
+    for path in ("/drafts/1", "/stories/1"):
+        assert [r.json() for r in asyncio.run(burst(path))] == [{"path": "/1"}] * 4
+    # One upstream call per user for a private route, one shared call for a public one.
+    assert sorted(hosts) == ["drafts", "drafts", "stories"]
+
+def test_idempotent_requests_retry_within_budget(monkeypatch):
+    attempts = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.method)
+        if len(attempts) % 2:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "retry_budget", main.RetryBudget(ratio=0, min_per_second=0.1))
+    monkeypatch.setattr(main, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(main, "service_guards", {})
+    use_dummy_route()
+    assert client.get("/dummy/retry").status_code == 200
+    assert attempts == ["GET", "GET"]
+
+    # POST bodies are not replayed.
+    attempts.clear()
+    assert client.post("/dummy/retry", json={}).status_code == 502
+    assert attempts == ["POST"]
+
+    # The single budget token is spent, so the next failure is not retried.
+    attempts.clear()
+    assert client.get("/dummy/retry").status_code == 502
+    assert attempts == ["GET"]
+
+    # A route can opt out of retries altogether.
+    monkeypatch.setattr(main, "retry_budget", main.RetryBudget(ratio=0, min_per_second=10))
+    main.set_routing_table(main.compile_routes({"routes": [{"prefix": "dummy", "url": "http://dummy_backend", "retries": 0}]}))
+    attempts.clear()
+    assert client.get("/dummy/retry").status_code == 502
+    assert attempts == ["GET"]
+
+def test_slow_get_is_hedged_after_recent_p95(monkeypatch):
+    import asyncio, time
+    calls = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"attempt": len(calls)})
+
+    tracker = main.LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.observe("dummy", 0.02)
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "latency_tracker", tracker)
+    monkeypatch.setattr(main, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(main, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(main, "service_guards", {})
+    use_dummy_route()
+
+    async def call():
+        async with RealAsyncClient(app=app, base_url="http://gateway") as gateway:
+            started = time.perf_counter()
+            response = await gateway.get("/dummy/hedge")
+            return response, time.perf_counter() - started
+
+    response, elapsed = asyncio.run(call())
+    assert response.json() == {"attempt": 2}
+    assert elapsed < 0.5
+    assert calls == ["/hedge", "/hedge"]
+
+def test_compression_negotiation_thresholds_and_passthrough(monkeypatch):
+    import gzip
+    story = {"lines": ["It was a dark and stormy night."] * 200}
+    def backend(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/precompressed":
+            async def body():
+                yield gzip.compress(b'{"pre": true}')
+            return httpx.Response(200, content=body(), headers={"content-type": "application/json", "content-encoding": "gzip"})
+        if request.url.path == "/small":
+            return httpx.Response(200, json={"ok": True})
+        return httpx.Response(200, json=story, headers={"etag": '"v1"'})
+
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    use_dummy_route()
+    response = client.get("/dummy/story", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json() == story
+    assert int(response.headers["content-length"]) < len(response.content) / 10
+
+    small = client.get("/dummy/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    raw = client.get("/dummy/precompressed", headers={"Accept-Encoding": "identity"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert raw.json() == {"pre": True}
+
+def test_gzip_client_revalidates_cached_entry_with_weak_etag(monkeypatch):
+    story = {"lines": ["It was a dark and stormy night."] * 200}
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=story, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    use_dummy_route()
+
+    first = client.get("/dummy/story", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["etag"] == 'W/"v1"'
+    again = client.get("/dummy/story", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert (again.status_code, again.headers["x-cache"]) == (304, "HIT")
+
+def test_verified_tokens_are_cached_until_expiry(monkeypatch):
+    import time
+    service = AuthService()
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw))
+
+    token = jwt.encode({"sub": "writer", "roles": "user", "exp": int(time.time()) + 60}, SECRET_KEY, algorithm="HS256")
+    assert service.verify_token(token, SECRET_KEY) == {"username": "writer", "roles": "user"}
+    assert service.verify_token(token, SECRET_KEY) == {"username": "writer", "roles": "user"}
+    assert len(decodes) == 1
+
+    # A different verifying key never reuses the cached result.
+    with pytest.raises(main.HTTPException):
+        service.verify_token(token, "another_secret")
+
+def test_batch_returns_per_request_results():
+    use_dummy_route()
+    payload = {"requests": [
+        {"id": "ok", "path": "dummy/batched"},
+        {"id": "unknown", "path": "nope/x"},
+    ]}
+    response = client.post("/batch", json=payload)
+    assert response.status_code == 200, response.text
+    results = {r["id"]: r for r in response.json()["responses"]}
+    assert results["ok"]["status"] == 200
+    assert results["ok"]["body"] == {"dummy": "ok"}
+    assert results["unknown"]["status"] == 404
+    assert "/batched" in backend_calls
+
+def test_batch_sub_requests_cannot_override_credentials_or_hop_headers(monkeypatch):
+    seen = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers)
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool(transport=httpx.MockTransport(backend)))
+    use_dummy_route()
+    payload = {"requests": [{
+        "id": "sneaky",
+        "path": "dummy/batched",
+        "headers": {"Authorization": "Bearer someone-else", "Connection": "x-debug", "X-Debug": "1", "X-Request-Tag": "kept"},
+    }]}
+    response = client.post("/batch", json=payload, headers={"Authorization": "Bearer caller"})
+    assert response.json()["responses"][0]["status"] == 200
+    assert seen[0]["authorization"] == "Bearer caller"
+    assert "x-debug" not in seen[0]
+    assert seen[0]["x-request-tag"] == "kept"
+
+def test_routing_table_matches_longest_multi_segment_prefix():
+    table = main.compile_routes({"routes": [
+        {"prefix": "stories", "url": "http://stories:8000"},
+        {"prefix": "stories/drafts", "url": "http://drafts:8000/", "name": "drafts", "timeout": 2, "cache_ttl": 30},
+    ]})
+    route, sub_path = table.match("stories/drafts/7/lines")
+    assert (route.name, route.url, sub_path, route.timeout, route.cache_ttl) == ("drafts", "http://drafts:8000", "7/lines", 2.0, 30.0)
+    route, sub_path = table.match("stories/draftsman")
+    assert (route.name, sub_path) == ("stories", "draftsman")
+    assert table.match("stories")[0].name == "stories"
+    assert table.match("unknown/path") == (None, "")
+    with pytest.raises(ValueError):
+        main.compile_routes({"routes": [{"prefix": "a", "url": "http://a"}, {"prefix": "/a/", "url": "http://b"}]})
+
+def test_route_watcher_swaps_table_on_file_change_and_keeps_it_on_errors(tmp_path, monkeypatch):
+    import asyncio, json, os
+    monkeypatch.setattr(main, "routing_table", main.routing_table)
+    routes_file = tmp_path / "routes.json"
+    routes_file.write_text(json.dumps({"dummy": "http://dummy_backend"}))
+    watcher = main.RouteWatcher(source="file", path=str(routes_file))
+    assert asyncio.run(watcher.reload_once()) is True
+    assert asyncio.run(watcher.reload_once()) is False
+    assert client.get("/dummy/watched").status_code == 200
+
+    routes_file.write_text("{not json")
+    os.utime(routes_file, ns=(1, 1))
+    assert asyncio.run(watcher.reload_once()) is False
+    assert main.routing_table.match("dummy/x")[0].url == "http://dummy_backend"
+
+    routes_file.write_text(json.dumps({"routes": [{"prefix": "other", "url": "http://other"}]}))
+    os.utime(routes_file, ns=(2, 2))
+    assert asyncio.run(watcher.reload_once()) is True
+    assert client.get("/dummy/watched").status_code == 404
+
+def test_proxy_continues_incoming_trace(monkeypatch):
+    forwarded = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        forwarded.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={})
+
+    use_dummy_route()
+    monkeypatch.setitem(globals(), "dummy_backend", backend)  # picked up by DummyAsyncClient
+    monkeypatch.setattr(main, "upstream_pool", main.UpstreamPool())
+    incoming = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    response = client.get("/dummy/traced", headers={"traceparent": incoming})
+    assert response.status_code == 200
+    _, trace_id, parent_id, _ = forwarded[0].split("-")
+    assert trace_id == "0af7651916cd43dd8448eb211c80319c"
+    # The upstream sees the gateway's client span, not the caller's span, as its parent.
+    assert parent_id not in ("b7ad6b7169203331", response.headers["traceresponse"].split("-")[2])
+    assert response.headers["traceresponse"].split("-")[1] == trace_id
+
+def test_revoked_token_is_rejected_even_when_cached(monkeypatch):
+    import time
+    from fastapi import HTTPException
+
+    assert main.jwks_verifier.revocations is main.revocation_list
+    revocations = main.RevocationList(url="")
+    monkeypatch.setattr(main, "revocation_list", revocations)
+    monkeypatch.setattr(main.jwks_verifier, "revocations", revocations)
+    auth = AuthService()
+    token = jwt.encode({"sub": "alice", "roles": "user", "jti": "jti-1", "exp": int(time.time()) + 60}, SECRET_KEY, algorithm="HS256")
+    assert auth.verify_token(token, SECRET_KEY) == {"username": "alice", "roles": "user"}
+    assert auth.verify_token(token, SECRET_KEY) == {"username": "alice", "roles": "user"}
+    revocations.apply({"version": 1, "changes": [{"version": 1, "jti": "jti-1", "expires": time.time() + 60}]})
+    with pytest.raises(HTTPException) as exc:
+        auth.verify_token(token, SECRET_KEY)
+    assert exc.value.status_code == 401
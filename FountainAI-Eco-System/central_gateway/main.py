@@ -4,10 +4,19 @@ FountainAI API Gateway with Persistent Service Registry and RBAC
 
 This API Gateway is the central entry point for all client requests in the FountainAI ecosystem.
 It provides:
-  - JWT/API key authentication.
+  - JWT/API key authentication, with an LRU cache of already-verified tokens.
   - Dynamic service discovery via a lookup endpoint.
-  - A persistent (SQLite) service registry with CRUD operations.
-  - Request proxying/routing to backend services.
+  - A persistent (SQLite) service registry with CRUD operations and weighted,
+    load-balanced instances per service.
+  - A versioned registry watch API (long-poll or SSE) so clients can cache lookups.
+  - Active health checking that ejects failing or slow instances from rotation.
+  - Per-service circuit breakers and bulkhead concurrency limits that fail fast with 503.
+  - Budgeted, jittered retries of idempotent calls and optional hedging of slow GETs.
+  - An optional, memory-bounded GET response cache honouring Cache-Control and ETag.
+  - Single-flight coalescing so identical concurrent GETs share one upstream call.
+  - A POST /batch fan-out endpoint that runs sub-requests concurrently under one deadline.
+  - gzip/brotli/zstd response compression negotiated via Accept-Encoding.
+  - Streaming request proxying/routing to backend services over a shared, pooled upstream client.
   - Centralized logging.
   - Prometheus metrics instrumentation.
   - A health check endpoint.
@@ -19,23 +28,42 @@ Rate limiting is assumed to be handled by Caddy.
 import os
 import sys
 import time
+import random
+import json
+import hashlib
+import asyncio
 import logging
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import FastAPI, HTTPException, Request, Response, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Counter, Gauge
 from dotenv import load_dotenv
 import httpx
-from jose import JWTError, jwt
+from jose import JWTError
 
 # SQLAlchemy imports for persistent service registry
 from sqlalchemy import create_engine, Column, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine
+from fountainai_common.auth import JWKSVerifier, RevocationList
+from fountainai_common.changefeed import ChangeFeed
+from fountainai_common.compression import CompressionMiddleware, available_encodings
+from fountainai_common.upstream import UpstreamPool, HealthChecker
+from fountainai_common.resilience import ServiceGuard, RetryBudget, LatencyTracker, with_retries
+from fountainai_common.http_cache import (
+    CachedResponse, ResponseCache, SingleFlight, parse_cache_control, parse_route_ttls, single_flight_key
+)
+
 # -----------------------------------------------------------------------------
 # Load Environment Variables
 # -----------------------------------------------------------------------------
@@ -43,7 +71,76 @@ load_dotenv()  # Load .env file
 GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "8000"))
 JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret_key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWKS_URL = os.getenv("JWKS_URL", "")  # e.g. http://fountainai-rbac:8001/.well-known/jwks.json
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "300"))
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "2"))
+JWT_ACCEPT_HMAC = os.getenv("JWT_ACCEPT_HMAC", "true").lower() == "true"
+REVOCATIONS_URL = os.getenv("REVOCATIONS_URL", "")  # e.g. http://fountainai-rbac:8001/token/revocations
+REVOCATIONS_POLL_TIMEOUT = float(os.getenv("REVOCATIONS_POLL_TIMEOUT", "30"))
+REVOCATIONS_RETRY_INTERVAL = float(os.getenv("REVOCATIONS_RETRY_INTERVAL", "5"))
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./registry.db")
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "30"))
+LOAD_BALANCING_POLICY = os.getenv("LOAD_BALANCING_POLICY", "round_robin")
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+BULKHEAD_MAX_IN_FLIGHT = int(os.getenv("BULKHEAD_MAX_IN_FLIGHT", "50"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+RESPONSE_CACHE_DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "0"))
+RESPONSE_CACHE_ROUTE_TTLS = os.getenv("RESPONSE_CACHE_ROUTE_TTLS", "")
+RESPONSE_CACHE_PUBLIC_ROUTES = os.getenv("RESPONSE_CACHE_PUBLIC_ROUTES", "")
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_MAX_BYTES = int(os.getenv("SINGLE_FLIGHT_MAX_BYTES", str(1024 * 1024)))
+HEALTH_CHECK_ENABLED = os.getenv("HEALTH_CHECK_ENABLED", "true").lower() == "true"
+HEALTH_CHECK_PATH = os.getenv("HEALTH_CHECK_PATH", "/health")
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_CHECK_MAX_LATENCY = float(os.getenv("HEALTH_CHECK_MAX_LATENCY", "1.0"))
+HEALTH_CHECK_UNHEALTHY_THRESHOLD = int(os.getenv("HEALTH_CHECK_UNHEALTHY_THRESHOLD", "3"))
+HEALTH_CHECK_HEALTHY_THRESHOLD = int(os.getenv("HEALTH_CHECK_HEALTHY_THRESHOLD", "2"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "1.0"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "10"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.01"))
+REGISTRY_WATCH_TIMEOUT = float(os.getenv("REGISTRY_WATCH_TIMEOUT", "30"))
+REGISTRY_WATCH_KEEPALIVE = float(os.getenv("REGISTRY_WATCH_KEEPALIVE", "15"))
+REGISTRY_WATCH_MAX_CHANGES = int(os.getenv("REGISTRY_WATCH_MAX_CHANGES", "1000"))
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip")
+COMPRESSION_CONTENT_TYPES = os.getenv(
+    "COMPRESSION_CONTENT_TYPES", "application/json,application/javascript,application/xml,text/"
+)
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+BATCH_DEFAULT_TIMEOUT = float(os.getenv("BATCH_DEFAULT_TIMEOUT", "10"))
+BATCH_MAX_TIMEOUT = float(os.getenv("BATCH_MAX_TIMEOUT", "30"))
+BATCH_MAX_RESPONSE_BYTES = int(os.getenv("BATCH_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "central_gateway")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.getenv("TRACE_STATEMENT_MAX_LENGTH", "1024"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -55,6 +152,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger("fountainai_gateway")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # SQLAlchemy Setup for Persistent Service Registry
 # -----------------------------------------------------------------------------
@@ -62,6 +174,7 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 )
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -71,7 +184,18 @@ class ServiceRegistry(Base):
     service_name = Column(String, unique=True, index=True, nullable=False)
     url = Column(String, nullable=False)
 
-# Create the table if it doesn't exist
+class ServiceInstance(Base):
+    """
+    Additional backend instances for a registered service. The registry entry's own
+    url is always an instance (weight 1); a row with the same url overrides its weight.
+    """
+    __tablename__ = "service_instances"
+    id = Column(Integer, primary_key=True, index=True)
+    service_name = Column(String, index=True, nullable=False)
+    url = Column(String, nullable=False)
+    weight = Column(Integer, nullable=False, default=1)
+
+# Create the tables if they don't exist
 Base.metadata.create_all(bind=engine)
 
 def get_db():
@@ -81,19 +205,99 @@ def get_db():
     finally:
         db.close()
 
+# -----------------------------------------------------------------------------
+# Token Revocation (Change Stream from fountainai-rbac)
+# -----------------------------------------------------------------------------
+revocation_list = RevocationList(
+    url=REVOCATIONS_URL, poll_timeout=REVOCATIONS_POLL_TIMEOUT, retry_interval=REVOCATIONS_RETRY_INTERVAL
+)
+
+# -----------------------------------------------------------------------------
+# JWKS Verification (Asymmetric Tokens from fountainai-rbac)
+# -----------------------------------------------------------------------------
+jwks_verifier = JWKSVerifier(
+    url=JWKS_URL,
+    refresh_interval=JWKS_REFRESH_INTERVAL,
+    min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+    timeout=JWKS_TIMEOUT,
+    accept_hmac=JWT_ACCEPT_HMAC,
+    revocations=revocation_list,
+)
+
 # -----------------------------------------------------------------------------
 # Authentication Schemes (RBAC)
 # -----------------------------------------------------------------------------
 http_bearer = HTTPBearer()
 api_key_header = APIKeyHeader(name="X-API-KEY", auto_error=False)
 
+JWT_CACHE_LOOKUPS = Counter(
+    "gateway_jwt_cache_requests_total", "Token verifications answered from (hit) or added to (miss) the cache", ["result"]
+)
+JWT_CACHE_HIT_RATIO = Gauge("gateway_jwt_cache_hit_ratio", "Share of token verifications served from the cache")
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified tokens, keyed by a SHA-256 digest of the token.
+    Entries live until the token's `exp` (capped at `max_ttl` seconds), so a hot
+    token costs a hash lookup instead of a signature check.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_MAX_ENTRIES, max_ttl: float = JWT_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._hits = 0
+        self._lookups = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _record(self, hit: bool):
+        self._lookups += 1
+        self._hits += hit
+        JWT_CACHE_LOOKUPS.labels(result="hit" if hit else "miss").inc()
+        JWT_CACHE_HIT_RATIO.set(self._hits / self._lookups)
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() < entry[0]:
+            self._entries.move_to_end(key)
+            self._record(True)
+            return dict(entry[1])
+        if entry is not None:
+            del self._entries[key]
+        self._record(False)
+        return None
+
+    def put(self, key: str, claims: dict, exp: Optional[float]):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        self._entries[key] = (expires_at, dict(claims))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+jwt_cache = VerifiedTokenCache()
+
 def verify_jwt(token: str) -> dict:
+    key = VerifiedTokenCache.digest(token)
+    cached = jwt_cache.get(key)
+    if cached is not None:
+        if cached.get("jti") in revocation_list:
+            logger.error("JWT validation failed: token has been revoked")
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return cached
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
+        payload = jwks_verifier.decode(token, JWT_SECRET, JWT_ALGORITHM)
     except JWTError as e:
         logger.error(f"JWT validation failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
+    jwt_cache.put(key, payload, payload.get("exp"))
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(http_bearer)):
     return verify_jwt(credentials.credentials)
@@ -117,6 +321,38 @@ class RegistryEntry(BaseModel):
 class RegistryUpdate(BaseModel):
     url: str
 
+class InstanceCreate(BaseModel):
+    url: str
+    weight: int = Field(1, ge=1, description="Relative share of traffic for this instance")
+
+class InstanceResponse(BaseModel):
+    id: Optional[int] = Field(None, description="Instance row id; null for the registry entry's primary url")
+    url: str
+    weight: int
+    in_flight: int
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = Field(None, description="Client-chosen identifier echoed back in the result")
+    method: str = Field("GET", regex="^(GET|POST|PUT|DELETE|PATCH)$", description="HTTP method")
+    path: str = Field(..., description="Proxied path: '<service>/<subpath>', e.g. 'character/characters/1'")
+    query: Dict[str, str] = Field(default_factory=dict, description="Query string parameters")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Extra headers for this sub-request")
+    body: Optional[Any] = Field(None, description="JSON body sent upstream")
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_items=1, description="Sub-requests, executed concurrently")
+    timeout: Optional[float] = Field(None, gt=0, description="Deadline in seconds for the whole batch")
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str]
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Optional[Any] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
 # -----------------------------------------------------------------------------
 # FastAPI Application Initialization
 # -----------------------------------------------------------------------------
@@ -133,13 +369,512 @@ app = FastAPI(
 # Instrument the application with Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
+# -----------------------------------------------------------------------------
+# Response Compression (Accept-Encoding Negotiation)
+# -----------------------------------------------------------------------------
+def compression_route_label(path: str) -> str:
+    """Metric label: the proxied service for /proxy/<service>/..., else the first path segment."""
+    first, _, rest = path.strip("/").partition("/")
+    if first == "proxy":
+        service_name = rest.partition("/")[0]
+        # Only services that have been routed to, so arbitrary paths cannot inflate label cardinality.
+        return service_name if service_name in service_guards else "proxy"
+    return first or "root"
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        route_label=compression_route_label,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        encodings=available_encodings(COMPRESSION_ENCODINGS),
+        content_types=COMPRESSION_CONTENT_TYPES,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY,
+        zstd_level=COMPRESSION_ZSTD_LEVEL,
+    )
+
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+@app.on_event("startup")
+async def start_jwks_refresh():
+    jwks_verifier.start()
+
+@app.on_event("shutdown")
+async def stop_jwks_refresh():
+    jwks_verifier.stop()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    revocation_list.stop()
+
+# -----------------------------------------------------------------------------
+# Shared Upstream Connection Pool
+# -----------------------------------------------------------------------------
+upstream_pool = UpstreamPool(
+    max_connections=UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive=UPSTREAM_MAX_KEEPALIVE,
+    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    http2=UPSTREAM_HTTP2,
+    timeout=UPSTREAM_TIMEOUT,
+)
+
+@app.on_event("shutdown")
+async def close_upstream_pool():
+    await upstream_pool.aclose()
+
+# -----------------------------------------------------------------------------
+# Streaming Pass-Through Helpers
+# -----------------------------------------------------------------------------
+# Connection-level headers that must not be forwarded by a proxy (RFC 7230, section 6.1).
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+})
+
+def filter_hop_by_hop(headers) -> Dict[str, str]:
+    """Drop hop-by-hop headers, including any named in the Connection header."""
+    dropped = set(HOP_BY_HOP_HEADERS)
+    connection = next((v for k, v in headers.items() if k.lower() == "connection"), "")
+    for token in connection.split(","):
+        dropped.add(token.strip().lower())
+    return {k: v for k, v in headers.items() if k.lower() not in dropped}
+
+def upstream_body(request: Request):
+    """Return the incoming body as an async iterator, or None when the request carries no body."""
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
+        return request.stream()
+    return None
+
+class UpstreamCall:
+    """An open, streamed upstream response plus the bookkeeping to release once it is consumed."""
+
+    def __init__(self, backend: str, response: httpx.Response, on_close: Optional[Callable[[], None]] = None):
+        self.backend = backend
+        self.response = response
+        self.on_close = on_close
+        self._closed = False
+
+    async def aiter_raw(self):
+        if self.response.is_stream_consumed:
+            # Transports that pre-read the body (e.g. httpx.MockTransport) leave nothing to stream.
+            yield self.response.content
+        else:
+            async for chunk in self.response.aiter_raw():
+                yield chunk
+
+    async def read(self) -> bytes:
+        try:
+            return b"".join([chunk async for chunk in self.aiter_raw()])
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await upstream_pool.close_stream(self.backend, self.response)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+def stream_upstream_response(call: UpstreamCall) -> StreamingResponse:
+    """Relay raw upstream bytes (still encoded) and release the connection once done."""
+    async def relay():
+        try:
+            async for chunk in call.aiter_raw():
+                yield chunk
+        finally:
+            await call.aclose()
+
+    return StreamingResponse(
+        relay(),
+        status_code=call.response.status_code,
+        headers=filter_hop_by_hop(call.response.headers),
+    )
+
+async def relay_upstream(call: UpstreamCall, buffer_limit: int = 0) -> Response:
+    """Stream the upstream response, or buffer it when it is known to fit in `buffer_limit` bytes."""
+    length = call.response.headers.get("content-length", "")
+    if buffer_limit and length.isdigit() and int(length) <= buffer_limit:
+        body = await call.read()
+        return Response(
+            content=body,
+            status_code=call.response.status_code,
+            headers=filter_hop_by_hop(call.response.headers),
+        )
+    return stream_upstream_response(call)
+
+# -----------------------------------------------------------------------------
+# Load Balancing Across Service Instances
+# -----------------------------------------------------------------------------
+BACKEND_IN_FLIGHT = Gauge(
+    "gateway_backend_in_flight", "Proxied requests currently outstanding per instance", ["service", "instance"]
+)
+
+class LoadBalancer:
+    """
+    Picks one of a service's weighted instances per request.
+
+    Policies:
+      - round_robin: smooth weighted round-robin (the nginx algorithm).
+      - least_outstanding: fewest in-flight requests relative to weight.
+      - power_of_two: sample two instances by weight, keep the less loaded one.
+    """
+
+    POLICIES = ("round_robin", "least_outstanding", "power_of_two")
+
+    def __init__(self, policy: str = LOAD_BALANCING_POLICY):
+        if policy not in self.POLICIES:
+            logger.warning(f"Unknown load balancing policy '{policy}', using round_robin")
+            policy = "round_robin"
+        self.policy = policy
+        self._current_weights: Dict[Tuple[str, str], int] = {}
+        self._in_flight: Dict[Tuple[str, str], int] = {}
+
+    def in_flight(self, service_name: str, url: str) -> int:
+        return self._in_flight.get((service_name, url), 0)
+
+    def _load(self, service_name: str, instance: Tuple[str, int]) -> float:
+        url, weight = instance
+        return self.in_flight(service_name, url) / weight
+
+    def select(self, service_name: str, instances: List[Tuple[str, int]]) -> str:
+        if len(instances) == 1:
+            return instances[0][0]
+        if self.policy == "least_outstanding":
+            return min(instances, key=lambda i: self._load(service_name, i))[0]
+        if self.policy == "power_of_two":
+            weights = [weight for _, weight in instances]
+            first, second = random.choices(instances, weights=weights, k=2)
+            return min((first, second), key=lambda i: self._load(service_name, i))[0]
+        total = 0
+        best = None
+        for url, weight in instances:
+            key = (service_name, url)
+            self._current_weights[key] = self._current_weights.get(key, 0) + weight
+            total += weight
+            if best is None or self._current_weights[key] > self._current_weights[best]:
+                best = key
+        self._current_weights[best] -= total
+        return best[1]
+
+    def acquire(self, service_name: str, url: str):
+        key = (service_name, url)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        BACKEND_IN_FLIGHT.labels(service=service_name, instance=url).inc()
+
+    def release(self, service_name: str, url: str):
+        key = (service_name, url)
+        self._in_flight[key] = max(self._in_flight.get(key, 0) - 1, 0)
+        BACKEND_IN_FLIGHT.labels(service=service_name, instance=url).dec()
+
+load_balancer = LoadBalancer()
+
+def get_instances(db: Session, service_name: str) -> List[Tuple[str, int]]:
+    """Return (url, weight) for every instance of a service; empty if it is not registered."""
+    entry = db.query(ServiceRegistry).filter(ServiceRegistry.service_name == service_name).first()
+    if not entry:
+        return []
+    instances = {entry.url: 1}
+    for row in db.query(ServiceInstance).filter(ServiceInstance.service_name == service_name).all():
+        instances[row.url] = row.weight
+    return list(instances.items())
+
+def load_instances(service_name: str) -> List[Tuple[str, int]]:
+    db = SessionLocal()
+    try:
+        return get_instances(db, service_name)
+    finally:
+        db.close()
+
+# -----------------------------------------------------------------------------
+# Active Health Checking and Outlier Ejection
+# -----------------------------------------------------------------------------
+health_checker = HealthChecker(
+    path=HEALTH_CHECK_PATH,
+    interval=HEALTH_CHECK_INTERVAL,
+    timeout=HEALTH_CHECK_TIMEOUT,
+    max_latency=HEALTH_CHECK_MAX_LATENCY,
+    unhealthy_threshold=HEALTH_CHECK_UNHEALTHY_THRESHOLD,
+    healthy_threshold=HEALTH_CHECK_HEALTHY_THRESHOLD,
+)
+
+async def load_health_check_targets() -> List[Tuple[str, str]]:
+    def query():
+        db = SessionLocal()
+        try:
+            targets = []
+            for entry in db.query(ServiceRegistry).all():
+                targets.extend((entry.service_name, url) for url, _ in get_instances(db, entry.service_name))
+            return targets
+        finally:
+            db.close()
+    return await run_in_threadpool(query)
+
+def healthy_instances(service_name: str, instances: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    return [(url, weight) for url, weight in instances if health_checker.is_healthy(service_name, url)]
+
+@app.on_event("startup")
+async def start_health_checker():
+    if HEALTH_CHECK_ENABLED:
+        health_checker.start(load_health_check_targets)
+
+@app.on_event("shutdown")
+async def stop_health_checker():
+    await health_checker.stop()
+
+# -----------------------------------------------------------------------------
+# Circuit Breakers and Bulkheads (per backend service)
+# -----------------------------------------------------------------------------
+service_guards: Dict[str, ServiceGuard] = {}
+
+def guard_for(service_name: str) -> ServiceGuard:
+    guard = service_guards.get(service_name)
+    if guard is None:
+        guard = service_guards[service_name] = ServiceGuard(
+            service_name,
+            failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT,
+            half_open_max_calls=CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+            max_in_flight=BULKHEAD_MAX_IN_FLIGHT,
+        )
+    return guard
+
+def admit(service_name: str) -> ServiceGuard:
+    """Return the service's guard with a slot taken, or fail fast with 503."""
+    guard = guard_for(service_name)
+    reason = guard.try_acquire()
+    if reason == "circuit_open":
+        raise HTTPException(status_code=503, detail=f"Circuit open for '{service_name}'")
+    if reason == "bulkhead_full":
+        raise HTTPException(status_code=503, detail=f"Too many requests in flight to '{service_name}'")
+    return guard
+
+# -----------------------------------------------------------------------------
+# GET Response Cache (ETag / Cache-Control aware, LRU-bounded)
+# -----------------------------------------------------------------------------
+response_cache = ResponseCache(
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    max_entry_bytes=RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    default_ttl=RESPONSE_CACHE_DEFAULT_TTL,
+    route_ttls=parse_route_ttls(RESPONSE_CACHE_ROUTE_TTLS),
+    public_routes=[p for p in RESPONSE_CACHE_PUBLIC_ROUTES.split(",") if p.strip()],
+)
+
+async def serve_cached_get(
+    route: str,
+    request: Request,
+    headers: Dict[str, str],
+    scope: str,
+    fetch: Callable[[Dict[str, str]], Awaitable[UpstreamCall]],
+    buffer_limit: int = 0,
+) -> Response:
+    """Answer a GET from the response cache, revalidating or refilling it from `fetch` as needed."""
+    request_directives = parse_cache_control(request.headers.get("cache-control", ""))
+    if "no-store" in request_directives:
+        response_cache.record("bypass")
+        return await relay_upstream(await fetch(headers), buffer_limit)
+
+    key = response_cache.key(route, request, scope)
+    entry = response_cache.get(key)
+    if entry is not None and entry.is_fresh() and "no-cache" not in request_directives:
+        response_cache.record("hit")
+        return entry.to_response(request, "HIT")
+
+    client_conditional = "if-none-match" in headers or "if-modified-since" in headers
+    if entry is not None and not client_conditional:
+        headers = {**headers, **entry.validators()}
+    call = await fetch(headers)
+    upstream = call.response
+
+    if upstream.status_code == 304 and entry is not None and (
+        not client_conditional or entry.confirmed_by(headers, upstream.headers.get("etag"))
+    ):
+        await call.aclose()
+        ttl = response_cache.ttl_for(route, upstream.headers, shared=not scope)
+        entry.refresh(ttl if ttl is not None else 0.0)
+        response_cache.record("revalidated")
+        return entry.to_response(request, "REVALIDATED")
+
+    response_cache.record("miss")
+    ttl = response_cache.ttl_for(route, upstream.headers, shared=not scope)
+    length = upstream.headers.get("content-length", "")
+    storable = (
+        upstream.status_code == 200
+        and ttl is not None
+        and (ttl > 0 or "etag" in upstream.headers or "last-modified" in upstream.headers)
+        and length.isdigit()
+        and int(length) <= response_cache.max_entry_bytes
+    )
+    if not storable:
+        if entry is not None:
+            response_cache.discard(key)
+        return await relay_upstream(call, buffer_limit)
+
+    body = await call.read()
+    cached = CachedResponse(upstream.status_code, filter_hop_by_hop(upstream.headers), body, ttl)
+    response_cache.put(key, cached)
+    return cached.to_response(request, "MISS")
+
+# -----------------------------------------------------------------------------
+# Request Coalescing (single-flight) for Identical Concurrent GETs
+# -----------------------------------------------------------------------------
+single_flight = SingleFlight()
+
+# -----------------------------------------------------------------------------
+# Retries (with a Global Budget) and Hedged GETs
+# -----------------------------------------------------------------------------
+retry_budget = RetryBudget(ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND)
+latency_tracker = LatencyTracker(quantile=HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY)
+
+# -----------------------------------------------------------------------------
+# Registry Change Feed (for GET /registry?watch=true)
+# -----------------------------------------------------------------------------
+REGISTRY_WATCHERS = Gauge("gateway_registry_watchers", "Clients currently watching the registry", ["mode"])
+
+registry_feed = ChangeFeed(REGISTRY_WATCH_MAX_CHANGES)
+
+def instance_states(service_name: str, instances: List[Tuple[str, int]]) -> List[Dict[str, object]]:
+    return [
+        {"url": url, "weight": weight, "healthy": health_checker.is_healthy(service_name, url)}
+        for url, weight in instances
+    ]
+
+def publish_service(service_name: str):
+    """
+    Record a service's current primary url and instances in the change feed; url is None
+    and instances empty once it is deleted. Called after every registry or instance write
+    and whenever the health checker ejects or re-admits one of its instances.
+    """
+    instances = load_instances(service_name)
+    registry_feed.publish({
+        "service_name": service_name,
+        "url": instances[0][0] if instances else None,
+        "instances": instance_states(service_name, instances),
+    })
+
+# The event loop keeps only weak references to tasks; hold publishes until they finish.
+health_publish_tasks: Set[asyncio.Task] = set()
+
+def publish_health_change(service_name: str):
+    # Called on the event loop by the health checker; the instance query runs in the threadpool.
+    task = asyncio.get_running_loop().create_task(run_in_threadpool(publish_service, service_name))
+    health_publish_tasks.add(task)
+    task.add_done_callback(health_publish_tasks.discard)
+
+health_checker.on_change = publish_health_change
+
+def registry_snapshot() -> Tuple[str, Dict[str, Dict[str, object]]]:
+    """Every service's primary url and instances, plus the feed version it is at least as new as."""
+    version = registry_feed.version
+    db = SessionLocal()
+    try:
+        instances: Dict[str, Dict[str, int]] = {
+            entry.service_name: {entry.url: 1} for entry in db.query(ServiceRegistry).all()
+        }
+        for row in db.query(ServiceInstance).all():
+            if row.service_name in instances:
+                instances[row.service_name][row.url] = row.weight
+    finally:
+        db.close()
+    return version, {
+        service_name: {"url": next(iter(urls)), "instances": instance_states(service_name, list(urls.items()))}
+        for service_name, urls in instances.items()
+    }
+
+async def registry_delta(since: Optional[str]) -> Dict[str, object]:
+    """{"version", "changes"} when deltas since `since` are available, else {"version", "snapshot"}."""
+    changes = registry_feed.changes_since(since)
+    if changes is not None:
+        return {"version": changes[-1]["version"] if changes else since, "changes": changes}
+    version, snapshot = await run_in_threadpool(registry_snapshot)
+    return {"version": version, "snapshot": snapshot}
+
+def sse_event(event: str, version: str, data) -> str:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def registry_event_stream(request: Request, since: Optional[str]):
+    REGISTRY_WATCHERS.labels(mode="sse").inc()
+    try:
+        while True:
+            delta = await registry_delta(since)
+            if "snapshot" in delta:
+                yield sse_event("snapshot", delta["version"], delta["snapshot"])
+            for change in delta.get("changes", []):
+                yield sse_event("change", change["version"], change)
+            since = delta["version"]
+            while not await registry_feed.wait(since, REGISTRY_WATCH_KEEPALIVE):
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+    finally:
+        REGISTRY_WATCHERS.labels(mode="sse").dec()
+
 # -----------------------------------------------------------------------------
 # CRUD Endpoints for Persistent Service Registry
 # -----------------------------------------------------------------------------
 @app.get("/registry", tags=["Service Registry"])
-def list_registry(db: Session = Depends(get_db)):
-    entries = db.query(ServiceRegistry).all()
-    return {entry.service_name: entry.url for entry in entries}
+async def list_registry(
+    request: Request,
+    watch: bool = False,
+    since: Optional[str] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    Without `watch`, returns {service_name: url} with the version in X-Registry-Version.
+
+    With `watch=true`, long-polls: answers as soon as the registry is newer than `since`
+    (or after `timeout` seconds, capped by REGISTRY_WATCH_TIMEOUT, with no changes) with
+    {"version", "changes": [{"version", "service_name", "url", "instances"}]}, where
+    instances lists {"url", "weight", "healthy"} and url is the primary url (null, with no
+    instances, for a deleted service). A full {"version", "snapshot": {service_name:
+    {"url", "instances"}}} is returned instead when `since` is omitted, too old or from a
+    previous gateway process. Versions are opaque tokens; send back the last one seen.
+    Clients sending `Accept: text/event-stream` get the same data as a Server-Sent Events
+    stream (snapshot/change events, resumable via Last-Event-ID).
+    """
+    if not watch:
+        version, snapshot = await run_in_threadpool(registry_snapshot)
+        return JSONResponse(
+            {service_name: state["url"] for service_name, state in snapshot.items()},
+            headers={"X-Registry-Version": version},
+        )
+    if "text/event-stream" in request.headers.get("accept", ""):
+        if since is None:
+            since = request.headers.get("last-event-id") or None
+        return StreamingResponse(
+            registry_event_stream(request, since),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    if since is not None and registry_feed.version == since:
+        wait = min(timeout or REGISTRY_WATCH_TIMEOUT, REGISTRY_WATCH_TIMEOUT)
+        REGISTRY_WATCHERS.labels(mode="long_poll").inc()
+        try:
+            await registry_feed.wait(since, wait)
+        finally:
+            REGISTRY_WATCHERS.labels(mode="long_poll").dec()
+    return await registry_delta(since)
 
 @app.get("/registry/{service_name}", response_model=RegistryEntry, tags=["Service Registry"])
 def get_registry_entry(service_name: str, db: Session = Depends(get_db)):
@@ -156,6 +891,7 @@ def create_registry_entry(entry: RegistryEntry, db: Session = Depends(get_db)):
     db.add(new_entry)
     db.commit()
     db.refresh(new_entry)
+    publish_service(new_entry.service_name)
     logger.info(f"Created registry entry: {new_entry.service_name} -> {new_entry.url}")
     return RegistryEntry(service_name=new_entry.service_name, url=new_entry.url)
 
@@ -167,6 +903,7 @@ def update_registry_entry(service_name: str, update: RegistryUpdate, db: Session
     entry.url = update.url
     db.commit()
     db.refresh(entry)
+    publish_service(entry.service_name)
     logger.info(f"Updated registry entry: {service_name} -> {entry.url}")
     return RegistryEntry(service_name=entry.service_name, url=entry.url)
 
@@ -176,21 +913,79 @@ def delete_registry_entry(service_name: str, db: Session = Depends(get_db)):
     if not entry:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     db.delete(entry)
+    db.query(ServiceInstance).filter(ServiceInstance.service_name == service_name).delete()
     db.commit()
+    publish_service(service_name)
     logger.info(f"Deleted registry entry: {service_name}")
     return {"detail": f"Service '{service_name}' deleted from registry"}
 
+# -----------------------------------------------------------------------------
+# Instance Endpoints for Multi-Instance Services
+# -----------------------------------------------------------------------------
+@app.get("/registry/{service_name}/instances", response_model=List[InstanceResponse], tags=["Service Registry"])
+def list_instances(service_name: str, db: Session = Depends(get_db)):
+    instances = get_instances(db, service_name)
+    if not instances:
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
+    rows = {
+        row.url: row.id
+        for row in db.query(ServiceInstance).filter(ServiceInstance.service_name == service_name).all()
+    }
+    return [
+        InstanceResponse(id=rows.get(url), url=url, weight=weight, in_flight=load_balancer.in_flight(service_name, url))
+        for url, weight in instances
+    ]
+
+@app.post("/registry/{service_name}/instances", response_model=InstanceResponse, tags=["Service Registry"], dependencies=[Depends(admin_required)])
+def add_instance(service_name: str, instance: InstanceCreate, db: Session = Depends(get_db)):
+    if not db.query(ServiceRegistry).filter(ServiceRegistry.service_name == service_name).first():
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
+    row = (
+        db.query(ServiceInstance)
+        .filter(ServiceInstance.service_name == service_name, ServiceInstance.url == instance.url)
+        .first()
+    )
+    if row:
+        row.weight = instance.weight
+    else:
+        row = ServiceInstance(service_name=service_name, url=instance.url, weight=instance.weight)
+        db.add(row)
+    db.commit()
+    db.refresh(row)
+    publish_service(service_name)
+    logger.info(f"Registered instance for {service_name}: {row.url} (weight {row.weight})")
+    return InstanceResponse(id=row.id, url=row.url, weight=row.weight, in_flight=load_balancer.in_flight(service_name, row.url))
+
+@app.delete("/registry/{service_name}/instances/{instance_id}", tags=["Service Registry"], dependencies=[Depends(admin_required)])
+def remove_instance(service_name: str, instance_id: int, db: Session = Depends(get_db)):
+    row = (
+        db.query(ServiceInstance)
+        .filter(ServiceInstance.service_name == service_name, ServiceInstance.id == instance_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Instance {instance_id} of '{service_name}' not found")
+    db.delete(row)
+    db.commit()
+    publish_service(service_name)
+    logger.info(f"Removed instance for {service_name}: {row.url}")
+    return {"detail": f"Instance {instance_id} removed from '{service_name}'"}
+
 # -----------------------------------------------------------------------------
 # Lookup Endpoint for Service Discovery (Reads from DB)
 # -----------------------------------------------------------------------------
 @app.get("/lookup/{service_name}", response_model=LookupResponse, tags=["Service Discovery"])
 def lookup_service(service_name: str, db: Session = Depends(get_db)):
-    entry = db.query(ServiceRegistry).filter(ServiceRegistry.service_name == service_name).first()
-    if not entry:
+    instances = get_instances(db, service_name)
+    if not instances:
         logger.error(f"Service '{service_name}' not found in registry.")
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
-    logger.info(f"Lookup for '{service_name}': returning URL {entry.url}")
-    return LookupResponse(url=entry.url)
+    instances = healthy_instances(service_name, instances)
+    if not instances:
+        raise HTTPException(status_code=503, detail=f"No healthy instances of '{service_name}'")
+    url = load_balancer.select(service_name, instances)
+    logger.info(f"Lookup for '{service_name}': returning URL {url}")
+    return LookupResponse(url=url)
 
 # -----------------------------------------------------------------------------
 # Proxy Endpoint (Example of Routing)
@@ -206,27 +1001,193 @@ async def proxy(full_path: str, request: Request, current_user: dict = Depends(g
         raise HTTPException(status_code=400, detail="Path must include service and subpath")
     service_name = path_parts[0]
     sub_path = "/".join(path_parts[1:])
-    # Lookup service URL from DB
-    async with httpx.AsyncClient() as client:
-        lookup_response = await client.get(f"http://localhost:{GATEWAY_PORT}/lookup/{service_name}")
-    if lookup_response.status_code != 200:
+    headers = filter_hop_by_hop(request.headers)
+    headers.pop("host", None)
+    if request.method == "GET":
+        public = response_cache.is_public(full_path)
+        scope = "" if public else str(current_user.get("sub") or "")
+        fetch = lambda h: open_upstream(service_name, "GET", sub_path, h, request.query_params, None)
+        if not (public or scope):
+            # A token without a subject has no scope of its own: sharing its responses
+            # under the empty scope would hand them to every caller of a public route.
+            return await relay_upstream(await fetch(headers))
+        buffer_limit = SINGLE_FLIGHT_MAX_BYTES if SINGLE_FLIGHT_ENABLED else 0
+
+        async def produce() -> Response:
+            if RESPONSE_CACHE_ENABLED:
+                return await serve_cached_get(full_path, request, headers, scope, fetch, buffer_limit)
+            return await relay_upstream(await fetch(headers), buffer_limit)
+
+        if SINGLE_FLIGHT_ENABLED:
+            return await single_flight.do(single_flight_key(full_path, request, scope), produce)
+        return await produce()
+    call = await open_upstream(
+        service_name, request.method, sub_path, headers, request.query_params, upstream_body(request)
+    )
+    return stream_upstream_response(call)
+
+async def open_upstream(service_name: str, method: str, sub_path: str, headers, params, content) -> UpstreamCall:
+    """Open a streamed upstream request, retrying or hedging idempotent calls (see with_retries)."""
+    return await with_retries(
+        service_name, method, content,
+        lambda: open_upstream_attempt(service_name, method, sub_path, headers, params, content),
+        budget=retry_budget,
+        tracker=latency_tracker,
+        retries=UPSTREAM_RETRIES,
+        hedge=HEDGE_ENABLED,
+        backoff_base=RETRY_BACKOFF_BASE,
+        backoff_max=RETRY_BACKOFF_MAX,
+    )
+
+async def open_upstream_attempt(service_name: str, method: str, sub_path: str, headers, params, content) -> UpstreamCall:
+    """Pick a healthy instance, pass the service guard and open a streamed upstream request."""
+    instances = await run_in_threadpool(load_instances, service_name)
+    if not instances:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
-    target_url = lookup_response.json()["url"]
+    instances = healthy_instances(service_name, instances)
+    if not instances:
+        raise HTTPException(status_code=503, detail=f"No healthy instances of '{service_name}'")
+    target_url = load_balancer.select(service_name, instances)
     url = f"{target_url}/{sub_path}"
     logger.info(f"Proxying request to: {url}")
+    guard = admit(service_name)
+    load_balancer.acquire(service_name, target_url)
+
+    def finish():
+        load_balancer.release(service_name, target_url)
+        guard.release()
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method=request.method,
-                url=url,
-                headers=dict(request.headers),
-                params=request.query_params,
-                content=await request.body()
-            )
+        response = await upstream_pool.stream(
+            service_name, method, url, headers=headers, params=params, content=content
+        )
     except Exception as e:
+        finish()
+        guard.record_failure()
         logger.error(f"Proxy request failed: {e}")
         raise HTTPException(status_code=502, detail="Bad gateway")
-    return Response(content=response.content, status_code=response.status_code, headers=dict(response.headers))
+    except BaseException:
+        # Cancelled (e.g. a /batch deadline or a losing hedge): give back the balancer and
+        # guard slots, including a half-open trial that now has no outcome to report.
+        finish()
+        guard.abandon()
+        raise
+    if response.status_code >= 500:
+        guard.record_failure()
+    else:
+        guard.record_success()
+    return UpstreamCall(service_name, response, on_close=finish)
+
+# -----------------------------------------------------------------------------
+# Fan-out Aggregation (POST /batch)
+# -----------------------------------------------------------------------------
+BATCH_SUBREQUESTS = Counter(
+    "gateway_batch_subrequests_total", "Sub-requests executed through /batch", ["outcome"]
+)
+
+# Taken from the /batch request itself; a sub-request may not replace them.
+BATCH_OUTER_HEADERS = frozenset({"host", "content-length", "content-encoding", "authorization", "cookie"})
+
+def batch_headers(request: Request, sub: BatchSubRequest) -> Dict[str, str]:
+    """
+    Headers for a sub-request: the caller's end-to-end headers plus the sub-request's own.
+    Sub-requests cannot set hop-by-hop headers or swap the caller's credentials, so a
+    batch never reaches a backend as anyone other than the user who sent it.
+    """
+    headers = filter_hop_by_hop(request.headers)
+    for name in ("host", "content-length", "content-type", "content-encoding"):
+        headers.pop(name, None)
+    for name, value in filter_hop_by_hop(sub.headers).items():
+        if name.lower() not in BATCH_OUTER_HEADERS:
+            headers[name.lower()] = value
+    # Results are embedded in a JSON document, so ask for bodies we can decode.
+    headers["accept-encoding"] = "identity"
+    return headers
+
+async def run_subrequest(
+    request: Request,
+    sub: BatchSubRequest,
+    open_call: Callable[[BatchSubRequest, Dict[str, str], Optional[bytes]], Awaitable[UpstreamCall]],
+) -> BatchSubResponse:
+    headers = batch_headers(request, sub)
+    content = None
+    if sub.body is not None:
+        content = json.dumps(sub.body).encode()
+        headers["content-type"] = "application/json"
+    try:
+        call = await open_call(sub, headers, content)
+    except HTTPException as e:
+        return BatchSubResponse(id=sub.id, status=e.status_code, error=str(e.detail))
+
+    chunks, size = [], 0
+    try:
+        async for chunk in call.aiter_raw():
+            size += len(chunk)
+            if size > BATCH_MAX_RESPONSE_BYTES:
+                return BatchSubResponse(id=sub.id, status=502, error="Sub-response exceeds BATCH_MAX_RESPONSE_BYTES")
+            chunks.append(chunk)
+    finally:
+        await call.aclose()
+
+    raw = b"".join(chunks)
+    upstream = call.response
+    if "json" in upstream.headers.get("content-type", "") and raw:
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = raw.decode("utf-8", errors="replace")
+    else:
+        body = raw.decode("utf-8", errors="replace") if raw else None
+    return BatchSubResponse(
+        id=sub.id,
+        status=upstream.status_code,
+        headers=filter_hop_by_hop(upstream.headers),
+        body=body,
+    )
+
+async def execute_batch(
+    request: Request,
+    batch: BatchRequest,
+    open_call: Callable[[BatchSubRequest, Dict[str, str], Optional[bytes]], Awaitable[UpstreamCall]],
+) -> BatchResponse:
+    """Run all sub-requests concurrently under one deadline; failures are reported per sub-request."""
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_REQUESTS} requests")
+    timeout = min(batch.timeout or BATCH_DEFAULT_TIMEOUT, BATCH_MAX_TIMEOUT)
+    tasks = [asyncio.ensure_future(run_subrequest(request, sub, open_call)) for sub in batch.requests]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    responses = []
+    for sub, task in zip(batch.requests, tasks):
+        if task in pending:
+            result = BatchSubResponse(id=sub.id, status=504, error="Batch deadline exceeded")
+            outcome = "timeout"
+        elif task.exception() is not None:
+            result = BatchSubResponse(id=sub.id, status=502, error=str(task.exception()))
+            outcome = "error"
+        else:
+            result = task.result()
+            outcome = "ok" if result.error is None and result.status < 500 else "error"
+        BATCH_SUBREQUESTS.labels(outcome=outcome).inc()
+        responses.append(result)
+    return BatchResponse(responses=responses)
+
+@app.post("/batch", response_model=BatchResponse, tags=["Proxy"])
+async def batch(payload: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Executes several proxied requests concurrently and returns all results in one response.
+    Each sub-request has its own status; a failing or timed-out backend does not fail the batch.
+    """
+    async def open_call(sub: BatchSubRequest, headers: Dict[str, str], content: Optional[bytes]) -> UpstreamCall:
+        service_name, _, sub_path = sub.path.strip("/").partition("/")
+        if not service_name or not sub_path:
+            raise HTTPException(status_code=400, detail="Path must include service and subpath")
+        return await open_upstream(service_name, sub.method, sub_path, headers, sub.query, content)
+
+    return await execute_batch(request, payload, open_call)
 
 # -----------------------------------------------------------------------------
 # Health Check Endpoint
@@ -1,7 +1,11 @@
 import time
+import asyncio
 import pytest
+import httpx
 from fastapi.testclient import TestClient
-from main import app, SessionLocal, ServiceRegistry
+import main
+from main import app, SessionLocal, ServiceRegistry, UpstreamPool, LoadBalancer, HealthChecker, ServiceGuard, ResponseCache, CachedResponse, VerifiedTokenCache
+from fountainai_common import tracing
 
 @pytest.fixture(scope="module")
 def client():
@@ -81,3 +85,534 @@ def test_registry_crud(client: TestClient, admin_headers):
 def test_lookup_nonexistent_service(client: TestClient):
     response = client.get("/lookup/nonexistent_service")
     assert response.status_code == 404
+
+def test_proxy_reuses_pooled_client(client: TestClient, admin_headers, monkeypatch):
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"path": request.url.path})
+
+    pool = UpstreamPool(transport=httpx.MockTransport(backend))
+    monkeypatch.setattr(main, "upstream_pool", pool)
+    for _ in range(3):
+        response = client.get("/proxy/central_sequence/sequence", headers=admin_headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["path"] == "/sequence"
+    # One long-lived client per backend, regardless of request count.
+    assert set(pool._clients) == {"central_sequence"}
+
+def test_proxy_streams_body_and_filters_hop_by_hop_headers(client: TestClient, admin_headers, monkeypatch):
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            201,
+            content=request.content[::-1],
+            headers={"Keep-Alive": "timeout=5", "X-Backend": "sequence"},
+        )
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    payload = b"x" * 65536 + b"end"
+    response = client.post("/proxy/central_sequence/upload", content=payload, headers=admin_headers)
+    assert response.status_code == 201
+    assert response.content == payload[::-1]
+    assert response.headers["x-backend"] == "sequence"
+    assert "keep-alive" not in response.headers
+
+def test_proxy_balances_across_weighted_instances(client: TestClient, admin_headers, monkeypatch):
+    response = client.post(
+        "/registry/central_sequence/instances",
+        json={"url": "http://central_sequence_replica:8000", "weight": 2},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    instance_id = response.json()["id"]
+
+    hosts = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "load_balancer", LoadBalancer("round_robin"))
+    for _ in range(6):
+        assert client.get("/proxy/central_sequence/sequence", headers=admin_headers).status_code == 200
+    assert hosts.count("central_sequence_replica") == 4
+    assert hosts.count("central_sequence_service") == 2
+
+    instances = client.get("/registry/central_sequence/instances").json()
+    assert {i["url"] for i in instances} == {"http://central_sequence_service:8000", "http://central_sequence_replica:8000"}
+    assert all(i["in_flight"] == 0 for i in instances)
+
+    response = client.delete(f"/registry/central_sequence/instances/{instance_id}", headers=admin_headers)
+    assert response.status_code == 200
+
+def test_least_outstanding_prefers_idle_instance():
+    balancer = LoadBalancer("least_outstanding")
+    instances = [("http://a:8000", 1), ("http://b:8000", 1)]
+    balancer.acquire("svc", "http://a:8000")
+    assert balancer.select("svc", instances) == "http://b:8000"
+    balancer.release("svc", "http://a:8000")
+
+def test_health_checker_ejects_and_readmits(client: TestClient, admin_headers, monkeypatch):
+    status = {"code": 503}
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status["code"] if request.url.path == "/health" else 200, json={})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    checker = HealthChecker(unhealthy_threshold=2, healthy_threshold=1, transport=httpx.MockTransport(backend))
+    monkeypatch.setattr(main, "health_checker", checker)
+    targets = [("central_sequence", "http://central_sequence_service:8000")]
+
+    asyncio.run(checker.run_once(targets))
+    assert checker.is_healthy(*targets[0])
+    asyncio.run(checker.run_once(targets))
+    assert not checker.is_healthy(*targets[0])
+    response = client.get("/proxy/central_sequence/sequence", headers=admin_headers)
+    assert response.status_code == 503
+
+    status["code"] = 200
+    asyncio.run(checker.run_once(targets))
+    assert checker.is_healthy(*targets[0])
+    assert client.get("/proxy/central_sequence/sequence", headers=admin_headers).status_code == 200
+
+def test_health_probes_do_not_queue_behind_proxied_traffic(monkeypatch):
+    ok = httpx.MockTransport(lambda request: httpx.Response(200))
+    pool = UpstreamPool(max_connections=1, transport=ok)
+    monkeypatch.setattr(main, "upstream_pool", pool)
+    pool.client_for("central_sequence")
+    asyncio.run(pool._acquire("central_sequence"))  # every pooled connection is busy
+
+    checker = HealthChecker(unhealthy_threshold=1, transport=ok)
+    target = ("central_sequence", "http://central_sequence_service:8000")
+    asyncio.run(asyncio.wait_for(checker.run_once([target]), timeout=1))
+    assert checker.is_healthy(*target)
+
+def test_circuit_breaker_opens_and_recovers_through_half_open():
+    guard = ServiceGuard("flaky", failure_threshold=2, reset_timeout=10, half_open_max_calls=1)
+    for _ in range(2):
+        assert guard.try_acquire() is None
+        guard.release()
+        guard.record_failure()
+    assert guard.state == ServiceGuard.OPEN
+    assert guard.try_acquire() == "circuit_open"
+
+    guard.opened_at -= 10  # let the reset timeout elapse
+    assert guard.try_acquire() is None
+    assert guard.state == ServiceGuard.HALF_OPEN
+    assert guard.try_acquire() == "circuit_open"
+    guard.release()
+    guard.record_success()
+    assert guard.state == ServiceGuard.CLOSED
+
+def test_cancelled_half_open_trial_frees_its_slot(monkeypatch):
+    async def backend(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    guard = ServiceGuard("central_sequence", failure_threshold=1, reset_timeout=0, half_open_max_calls=1)
+    guard.record_failure()
+    monkeypatch.setattr(main, "service_guards", {"central_sequence": guard})
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+
+    async def cancel_trial():
+        attempt = asyncio.ensure_future(main.open_upstream_attempt("central_sequence", "GET", "slow", {}, {}, None))
+        await asyncio.sleep(0.05)
+        assert (guard.state, guard.trial_calls) == (ServiceGuard.HALF_OPEN, 1)
+        attempt.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await attempt
+
+    asyncio.run(cancel_trial())
+    # The next request is admitted as the new trial instead of being rejected forever.
+    assert guard.try_acquire() is None
+    assert (guard.state, guard.trial_calls, guard.in_flight) == (ServiceGuard.HALF_OPEN, 1, 1)
+
+def test_cache_revalidates_stale_entries_with_etag(client: TestClient, admin_headers, monkeypatch):
+    seen = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"', "Cache-Control": "max-age=0"})
+        return httpx.Response(200, json={"id": 7}, headers={"ETag": '"v1"', "Cache-Control": "max-age=0"})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+
+    first = client.get("/proxy/central_sequence/scripts/7", headers=admin_headers)
+    second = client.get("/proxy/central_sequence/scripts/7", headers=admin_headers)
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "REVALIDATED"
+    assert second.json() == {"id": 7}
+    assert seen == [None, '"v1"']
+
+def test_client_conditional_304_refreshes_the_cached_entry(client: TestClient, admin_headers, monkeypatch):
+    def backend(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+        return httpx.Response(200, json={"id": 7}, headers={"ETag": '"v1"', "Cache-Control": "max-age=0"})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+
+    client.get("/proxy/central_sequence/scripts/7", headers=admin_headers)
+    conditional = client.get(
+        "/proxy/central_sequence/scripts/7", headers={**admin_headers, "If-None-Match": '"v1"'}
+    )
+    assert conditional.status_code == 304
+    assert conditional.headers["x-cache"] == "REVALIDATED"
+    # The entry survived the client's own revalidation and is fresh again.
+    plain = client.get("/proxy/central_sequence/scripts/7", headers=admin_headers)
+    assert plain.headers["x-cache"] == "HIT"
+    assert plain.json() == {"id": 7}
+
+def test_cache_evicts_least_recently_used_entries():
+    cache = ResponseCache(max_bytes=250, max_entry_bytes=200)
+    entry = lambda: CachedResponse(200, {}, b"x" * 100, ttl=60)
+    cache.put("a", entry())
+    cache.put("b", entry())
+    cache.get("a")
+    cache.put("c", entry())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_concurrent_identical_gets_share_one_upstream_call(admin_headers, monkeypatch):
+    calls = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"stories": ["one"]})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+
+    async def burst():
+        async with httpx.AsyncClient(app=app, base_url="http://gateway") as gateway:
+            return await asyncio.gather(*(
+                gateway.get("/proxy/central_sequence/stories", headers=admin_headers) for _ in range(5)
+            ))
+
+    responses = asyncio.run(burst())
+    assert [r.status_code for r in responses] == [200] * 5
+    assert all(r.json() == {"stories": ["one"]} for r in responses)
+    assert calls == ["/stories"]
+
+def test_public_route_gets_share_one_upstream_call_across_users(monkeypatch):
+    calls = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "response_cache", ResponseCache(public_routes=["central_sequence/stories"]))
+    tokens = [pyjwt.encode({"sub": user, "role": "admin"}, "your_jwt_secret_key", algorithm="HS256") for user in ("ann", "bob")]
+
+    async def burst(path):
+        async with httpx.AsyncClient(app=app, base_url="http://gateway") as gateway:
+            return await asyncio.gather(*(
+                gateway.get(path, headers={"Authorization": f"Bearer {token}"}) for token in tokens * 2
+            ))
+
+    for path in ("/proxy/central_sequence/drafts", "/proxy/central_sequence/stories"):
+        assert all(r.status_code == 200 for r in asyncio.run(burst(path)))
+    # One upstream call per user for a private route, one shared call for a public one.
+    assert sorted(calls) == ["/drafts", "/drafts", "/stories"]
+
+def test_gets_with_a_token_without_subject_are_neither_cached_nor_coalesced(monkeypatch):
+    calls = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"path": request.url.path}, headers={"Cache-Control": "max-age=60"})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    headers = {"Authorization": f"Bearer {pyjwt.encode({'role': 'admin'}, 'your_jwt_secret_key', algorithm='HS256')}"}
+
+    async def burst():
+        async with httpx.AsyncClient(app=app, base_url="http://gateway") as gateway:
+            return await asyncio.gather(*(gateway.get("/proxy/central_sequence/drafts", headers=headers) for _ in range(2)))
+
+    for _ in range(2):
+        assert all(r.status_code == 200 and "x-cache" not in r.headers for r in asyncio.run(burst()))
+    assert calls == ["/drafts"] * 4
+
+def test_verified_token_cache_expires_with_token_and_stays_bounded():
+    cache = VerifiedTokenCache(max_entries=2, max_ttl=300)
+    cache.put("expired", {"sub": "a"}, exp=time.time() - 1)
+    assert cache.get("expired") is None
+    cache.put("a", {"sub": "a"}, exp=None)
+    cache.put("b", {"sub": "b"}, exp=time.time() + 60)
+    cache.put("c", {"sub": "c"}, exp=time.time() + 60)
+    assert cache.get("a") is None
+    assert cache.get("c") == {"sub": "c"}
+
+def test_batch_fans_out_with_partial_failures_and_deadline(client: TestClient, admin_headers, monkeypatch):
+    async def backend(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/slow":
+            await asyncio.sleep(1)
+        if request.method == "POST":
+            return httpx.Response(201, json={"received": request.content.decode()})
+        return httpx.Response(200, json={"path": request.url.path, "q": request.url.params.get("q")})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "load_balancer", LoadBalancer("round_robin"))
+    payload = {
+        "timeout": 0.3,
+        "requests": [
+            {"id": "get", "path": "central_sequence/sequence", "query": {"q": "1"}},
+            {"id": "post", "method": "POST", "path": "central_sequence/sequence", "body": {"n": 1}},
+            {"id": "slow", "path": "central_sequence/slow"},
+            {"id": "missing", "path": "no_such_service/x"},
+        ],
+    }
+    response = client.post("/batch", json=payload, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    results = {r["id"]: r for r in response.json()["responses"]}
+    assert results["get"]["status"] == 200
+    assert results["get"]["body"] == {"path": "/sequence", "q": "1"}
+    assert results["post"]["status"] == 201
+    assert results["post"]["body"] == {"received": '{"n": 1}'}
+    assert results["slow"]["status"] == 504
+    assert results["missing"]["status"] == 404
+    # The cancelled sub-request gave its balancer slot back.
+    assert main.load_balancer.in_flight("central_sequence", "http://central_sequence_service:8000") == 0
+
+def test_batch_sub_requests_cannot_override_credentials_or_hop_headers(client: TestClient, admin_headers, monkeypatch):
+    seen = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers)
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    payload = {"requests": [{
+        "id": "sneaky",
+        "path": "central_sequence/sequence",
+        "headers": {"Authorization": "Bearer someone-else", "Cookie": "session=x", "Connection": "x-debug",
+                    "X-Debug": "1", "Transfer-Encoding": "chunked", "X-Request-Tag": "kept"},
+    }]}
+    response = client.post("/batch", json=payload, headers=admin_headers)
+    assert response.json()["responses"][0]["status"] == 200
+    headers = seen[0]
+    assert headers["authorization"] == admin_headers["Authorization"]
+    assert "cookie" not in headers and "x-debug" not in headers
+    assert headers.get("transfer-encoding") != "chunked"
+    assert headers["x-request-tag"] == "kept"
+
+def test_idempotent_requests_retry_within_budget(client: TestClient, admin_headers, monkeypatch):
+    attempts = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.method)
+        if len(attempts) % 2:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "retry_budget", main.RetryBudget(ratio=0, min_per_second=0.1))
+    monkeypatch.setattr(main, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(main, "service_guards", {})
+    assert client.get("/proxy/central_sequence/retry", headers=admin_headers).status_code == 200
+    assert attempts == ["GET", "GET"]
+
+    # POST bodies are not replayed.
+    attempts.clear()
+    assert client.post("/proxy/central_sequence/retry", json={}, headers=admin_headers).status_code == 502
+    assert attempts == ["POST"]
+
+    # The single budget token is spent, so the next failure is not retried.
+    attempts.clear()
+    assert client.get("/proxy/central_sequence/retry", headers=admin_headers).status_code == 502
+    assert attempts == ["GET"]
+
+def test_slow_get_is_hedged_after_recent_p95(admin_headers, monkeypatch):
+    hosts = []
+    async def backend(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if len(hosts) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"attempt": len(hosts)})
+
+    tracker = main.LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.observe("central_sequence", 0.02)
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "latency_tracker", tracker)
+    monkeypatch.setattr(main, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(main, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(main, "load_balancer", LoadBalancer("round_robin"))
+
+    async def call():
+        async with httpx.AsyncClient(app=app, base_url="http://gateway") as gateway:
+            started = time.perf_counter()
+            response = await gateway.get("/proxy/central_sequence/hedge", headers=admin_headers)
+            return response, time.perf_counter() - started
+
+    response, elapsed = asyncio.run(call())
+    assert response.json() == {"attempt": 2}
+    assert elapsed < 0.5
+    assert main.load_balancer.in_flight("central_sequence", "http://central_sequence_service:8000") == 0
+
+def test_compression_negotiation_thresholds_and_passthrough(client: TestClient, admin_headers, monkeypatch):
+    import gzip
+    story = {"lines": ["It was a dark and stormy night."] * 200}
+    def backend(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/precompressed":
+            async def body():
+                yield gzip.compress(b'{"pre": true}')
+            return httpx.Response(200, content=body(), headers={"content-type": "application/json", "content-encoding": "gzip"})
+        if request.url.path == "/small":
+            return httpx.Response(200, json={"ok": True})
+        return httpx.Response(200, json=story, headers={"etag": '"v1"'})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    headers = {**admin_headers, "Accept-Encoding": "gzip"}
+    response = client.get("/proxy/central_sequence/story", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json() == story
+    assert int(response.headers["content-length"]) < len(response.content) / 10
+
+    small = client.get("/proxy/central_sequence/small", headers=headers)
+    assert "content-encoding" not in small.headers
+
+    raw = client.get("/proxy/central_sequence/precompressed", headers={**headers, "Accept-Encoding": "identity"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert raw.json() == {"pre": True}
+
+def test_gzip_client_revalidates_cached_entry_with_weak_etag(client: TestClient, admin_headers, monkeypatch):
+    story = {"lines": ["It was a dark and stormy night."] * 200}
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=story, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    headers = {**admin_headers, "Accept-Encoding": "gzip"}
+
+    first = client.get("/proxy/central_sequence/story", headers=headers)
+    assert first.headers["etag"] == 'W/"v1"'
+    again = client.get("/proxy/central_sequence/story", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert (again.status_code, again.headers["x-cache"]) == (304, "HIT")
+    assert again.content == b""
+
+def test_registry_watch_long_poll_returns_deltas(admin_headers, monkeypatch):
+    from fountainai_common.changefeed import ChangeFeed
+
+    async def scenario():
+        async with httpx.AsyncClient(app=app, base_url="http://gateway") as gateway:
+            current = await gateway.get("/registry")
+            version = current.headers["x-registry-version"]
+            assert current.json()["central_sequence"] == "http://central_sequence_service:8000"
+
+            async def change():
+                await asyncio.sleep(0.05)
+                await gateway.post("/registry", json={"service_name": "watched", "url": "http://watched:8000"}, headers=admin_headers)
+
+            watch, _ = await asyncio.gather(
+                gateway.get("/registry", params={"watch": "true", "since": version, "timeout": 5}),
+                change(),
+            )
+            delta = watch.json()
+            assert delta["version"] != version
+            assert delta["changes"] == [{
+                "version": delta["version"], "service_name": "watched", "url": "http://watched:8000",
+                "instances": [{"url": "http://watched:8000", "weight": 1, "healthy": True}],
+            }]
+
+            # Instance changes are published with the service's full instance list.
+            added = await gateway.post("/registry/watched/instances", json={"url": "http://watched-2:8000", "weight": 3}, headers=admin_headers)
+            delta = (await gateway.get("/registry", params={"watch": "true", "since": delta["version"]})).json()
+            assert [i["url"] for i in delta["changes"][0]["instances"]] == ["http://watched:8000", "http://watched-2:8000"]
+            snapshot = (await gateway.get("/registry", params={"watch": "true"})).json()["snapshot"]
+            assert snapshot["watched"] == {"url": "http://watched:8000", "instances": delta["changes"][0]["instances"]}
+            await gateway.delete(f"/registry/watched/instances/{added.json()['id']}", headers=admin_headers)
+            delta = (await gateway.get("/registry", params={"watch": "true", "since": delta["version"]})).json()
+            assert [i["url"] for i in delta["changes"][0]["instances"]] == ["http://watched:8000"]
+
+            await gateway.delete("/registry/watched", headers=admin_headers)
+            delta = (await gateway.get("/registry", params={"watch": "true", "since": delta["version"]})).json()
+            assert (delta["changes"][0]["url"], delta["changes"][0]["instances"]) == (None, [])
+
+            # Nothing new: the poll times out with no changes.
+            idle = (await gateway.get("/registry", params={"watch": "true", "since": delta["version"], "timeout": 0.05})).json()
+            assert idle == {"version": delta["version"], "changes": []}
+
+            # After a restart the sequence starts over, but the old token's epoch no longer
+            # matches: the watcher gets a snapshot rather than skipping the new changes.
+            monkeypatch.setattr(main, "registry_feed", ChangeFeed())
+            for n in range(5):
+                main.registry_feed.publish({"service_name": f"after-restart-{n}", "url": None, "instances": []})
+            stale = (await gateway.get("/registry", params={"watch": "true", "since": delta["version"]})).json()
+            assert "watched" not in stale["snapshot"] and stale["version"] == main.registry_feed.version
+
+    asyncio.run(scenario())
+
+def test_health_ejection_is_published_to_registry_watchers(monkeypatch):
+    from fountainai_common.changefeed import ChangeFeed
+
+    monkeypatch.setattr(main, "registry_feed", ChangeFeed())
+    checker = HealthChecker(unhealthy_threshold=1, on_change=main.publish_health_change)
+    monkeypatch.setattr(main, "health_checker", checker)
+
+    async def scenario():
+        since = main.registry_feed.version
+        checker.record("central_sequence", "http://central_sequence_service:8000", ok=False)
+        [task] = main.health_publish_tasks  # Held until it finishes, not left to the garbage collector.
+        assert await main.registry_feed.wait(since, 5)
+        await task
+        await asyncio.sleep(0)
+        assert not main.health_publish_tasks
+        return main.registry_feed.changes_since(since)
+
+    [change] = asyncio.run(scenario())
+    assert change["service_name"] == "central_sequence"
+    assert change["instances"][0] == {"url": "http://central_sequence_service:8000", "weight": 1, "healthy": False}
+
+def test_proxy_propagates_traceparent_through_client_span(client: TestClient, admin_headers, monkeypatch, tmp_path):
+    import json
+
+    forwarded = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        forwarded.append(request.headers["traceparent"])
+        return httpx.Response(200, json={})
+
+    exporter = tracing.SpanExporter(mode="file", path=str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "span_exporter", exporter)
+    monkeypatch.setattr(main, "upstream_pool", UpstreamPool(transport=httpx.MockTransport(backend)))
+    incoming = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    response = client.get("/proxy/central_sequence/sequence", headers={**admin_headers, "traceparent": incoming})
+    assert response.status_code == 200, response.text
+
+    _, trace_id, parent_id, flags = forwarded[0].split("-")
+    assert (trace_id, flags) == ("0af7651916cd43dd8448eb211c80319c", "01")
+    exporter.flush()
+    spans = {
+        span["spanId"]: span
+        for line in (tmp_path / "traces.jsonl").read_text().splitlines()
+        for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    }
+    # The backend's parent is the gateway's client span, itself a child of the server span.
+    outbound = spans[parent_id]
+    server = spans[outbound["parentSpanId"]]
+    assert server["name"] == "GET /proxy/{full_path:path}"
+    assert server["parentSpanId"] == "b7ad6b7169203331"
+
+    metrics = client.get("/metrics", headers={"Accept": "application/openmetrics-text"})
+    assert metrics.headers["content-type"].startswith("application/openmetrics-text")
+    assert f'# {{trace_id="{trace_id}"}}' in metrics.text
+
+def test_revoked_token_is_rejected_even_when_cached(monkeypatch):
+    from fastapi import HTTPException
+    from jose import jwt
+
+    assert main.jwks_verifier.revocations is main.revocation_list
+    revocations = main.RevocationList(url="")
+    monkeypatch.setattr(main, "revocation_list", revocations)
+    monkeypatch.setattr(main.jwks_verifier, "revocations", revocations)
+    monkeypatch.setattr(main, "jwt_cache", VerifiedTokenCache())
+    token = jwt.encode({"sub": "alice", "jti": "jti-1", "exp": int(time.time()) + 60}, main.JWT_SECRET, algorithm=main.JWT_ALGORITHM)
+    assert main.verify_jwt(token)["sub"] == "alice"
+    revocations.apply({"version": 1, "changes": [{"version": 1, "jti": "jti-1", "expires": time.time() + 60}]})
+    with pytest.raises(HTTPException) as exc:
+        main.verify_jwt(token)
+    assert exc.value.status_code == 401
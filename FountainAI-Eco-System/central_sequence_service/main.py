@@ -11,7 +11,7 @@ schema exists. The generated OpenAPI spec is forced to version 3.0.3 for Swagger
 import os
 import sys
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Any, Optional
 from enum import Enum
 
 from fastapi import FastAPI, HTTPException, Depends
@@ -24,6 +24,9 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, func
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine, start_client_span, end_client_span
+
 # -----------------------------------------------------------------------------
 # Configuration and Environment
 # -----------------------------------------------------------------------------
@@ -35,6 +38,15 @@ TYPESENSE_SERVICE_API_KEY = os.getenv("TYPESENSE_SERVICE_API_KEY", "your_secure_
 SERVICE_NAME = os.getenv("SERVICE_NAME", "central_sequence_service")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "your_admin_jwt_token")
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "central_sequence_service")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.getenv("TRACE_STATEMENT_MAX_LENGTH", "1024"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -46,6 +58,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger("central_sequence_service")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # Database Setup (SQLAlchemy)
 # -----------------------------------------------------------------------------
@@ -53,6 +80,7 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 )
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -142,7 +170,8 @@ class SyncService:
             import httpx
             self.client = httpx.Client(
                 base_url=TYPESENSE_CLIENT_URL,
-                timeout=5.0
+                timeout=5.0,
+                event_hooks={"request": [start_client_span], "response": [end_client_span]},
             )
             self.api_key = TYPESENSE_SERVICE_API_KEY
         else:
@@ -220,6 +249,16 @@ app.openapi = custom_openapi
 
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
 # -----------------------------------------------------------------------------
 # Startup: Enforce Mandatory Collection Creation
 # -----------------------------------------------------------------------------
@@ -8,6 +8,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from main import app, Base, Element, get_db
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 # Use an in-memory SQLite database with StaticPool.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(
@@ -72,3 +74,7 @@ def test_create_version():
     assert response.status_code == 201, response.text
     data = response.json()
     assert data["versionNumber"] >= 1
+
+def test_requests_are_traced():
+    response = client.get("/health", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
@@ -28,6 +28,7 @@ import yaml  # PyYAML must be installed
 # Default values
 DEFAULT_INTERNAL_PORT = 8000  # If a service’s .env does not define SERVICE_PORT
 HOST_PORT_START = 9000          # Starting host port for mapping
+SHARED_PACKAGE = "fountainai_common"  # Shared code copied into images via an additional build context
 
 def get_service_directories(root_dir):
     """
@@ -65,6 +66,14 @@ def extract_service_port(service_dir):
     print(f"In {service_dir}, SERVICE_PORT not found; using default {DEFAULT_INTERNAL_PORT}")
     return DEFAULT_INTERNAL_PORT
 
+def uses_shared_package(service_dir):
+    """
+    True if the service's Dockerfile copies the shared package from its build context
+    (`COPY --from=fountainai_common ...`).
+    """
+    with open(os.path.join(service_dir, "Dockerfile"), "r") as f:
+        return f"--from={SHARED_PACKAGE}" in f.read()
+
 def generate_docker_compose_config(root_dir):
     """
     Scans the specified root directory for service folders and generates a docker-compose configuration dictionary.
@@ -77,8 +86,11 @@ def generate_docker_compose_config(root_dir):
     for service in service_dirs:
         service_path = os.path.join(root_dir, service)
         internal_port = extract_service_port(service_path)
+        build = f"./{service}"
+        if uses_shared_package(service_path):
+            build = {"context": build, "additional_contexts": {SHARED_PACKAGE: f"./{SHARED_PACKAGE}"}}
         services[service] = {
-            "build": f"./{service}",
+            "build": build,
             "container_name": service,
             "ports": [f"{host_port}:{internal_port}"],
             "environment": [
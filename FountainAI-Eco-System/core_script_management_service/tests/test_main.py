@@ -1,8 +1,13 @@
 import os
+import time
 import pytest
 from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+import main
 from main import app, SessionLocal, Script, Base
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 @pytest.fixture(scope="module")
 def client():
     # Use a test client for the app
@@ -67,3 +72,12 @@ def test_patch_script(client: TestClient):
     data = patch_response.json()
     assert data["title"] == "Patched Script Title"
     assert data["author"] == "Robert"
+
+def test_requests_are_traced_and_tokens_checked_against_the_shared_revocation_list(client: TestClient):
+    response = client.get("/health", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
+
+    main.revocation_list.apply({"version": "test.1", "snapshot": [{"jti": "revoked-jti", "expires": time.time() + 60}]})
+    with pytest.raises(JWTError):
+        main.jwks_verifier.decode(jwt.encode({"jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
+    main.revocation_list.apply({"version": "test.2", "snapshot": []})
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Bulk User Provisioning Benchmark
+--------------------------------
+
+Runs the RBAC service in-process against a scratch SQLite database and creates N
+users twice: once with N sequential POST /register calls, once with a single
+POST /users/bulk. Reports wall time, users per second and, for the bulk call, the
+time to the first streamed line. bcrypt dominates both; the bulk path wins by
+hashing on all HASH_WORKERS at once and committing once, so run it on a machine
+with several cores for representative numbers.
+
+Usage Examples:
+  # 1000 users at the production bcrypt cost (slow: ~0.25 s of CPU per hash):
+  python bench_bulk_users.py --users 1000
+
+  # Quick run with a cheap bcrypt cost and 8 hashing threads:
+  HASH_WORKERS=8 python bench_bulk_users.py --users 1000 --rounds 4
+
+Options:
+  --users   Users created by each method (default: 1000).
+  --rounds  bcrypt cost factor (default: passlib's default, 12).
+  --json    Print the result as JSON instead of a table.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import httpx
+
+def load_service(workdir: str):
+    """Import main.py against a scratch database, with request logging kept off stdout."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    # main.py imports the shared fountainai_common package from the ecosystem root.
+    for path in (os.path.dirname(service_dir), service_dir):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    import main
+    return main
+
+async def run(users: int, rounds: int = None) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        main = load_service(workdir)
+        if rounds:
+            main.pwd_context.update(bcrypt__rounds=rounds)
+        db = main.SessionLocal()
+        db.add(main.User(username="bench-admin", hashed_password=main.hash_password("bench"), roles="admin"))
+        db.commit()
+        db.close()
+        headers = {"Authorization": f"Bearer {main.create_access_token('bench-admin', 'admin')}"}
+
+        async with httpx.AsyncClient(app=main.app, base_url="http://rbac", timeout=None) as client:
+            started = time.perf_counter()
+            for i in range(users):
+                resp = await client.post("/register", json={"username": f"seq-{i}", "password": f"pw-{i}", "roles": "user"})
+                resp.raise_for_status()
+            sequential = time.perf_counter() - started
+
+            payload = {"users": [{"username": f"bulk-{i}", "password": f"pw-{i}", "roles": "user"} for i in range(users)]}
+            first_line = None
+            started = time.perf_counter()
+            async with client.stream("POST", "/users/bulk", json=payload, headers=headers) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if first_line is None:
+                        first_line = time.perf_counter() - started
+                    if line:
+                        last = json.loads(line)
+            bulk = time.perf_counter() - started
+        main.password_hasher.shutdown()
+
+    return {
+        "users": users,
+        "hash_workers": main.password_hasher.workers,
+        "bcrypt_rounds": main.pwd_context.handler("bcrypt").default_rounds,
+        "sequential_s": round(sequential, 3),
+        "sequential_users_per_s": round(users / sequential, 1),
+        "bulk_s": round(bulk, 3),
+        "bulk_users_per_s": round(users / bulk, 1),
+        "bulk_first_line_s": round(first_line, 3),
+        "speedup": round(sequential / bulk, 2),
+        "bulk_summary": last["summary"],
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark POST /users/bulk against sequential /register calls.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.users, args.rounds))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for key, value in result.items():
+        print(f"{key:<24} {value}")
+
+if __name__ == "__main__":
+    main_cli()
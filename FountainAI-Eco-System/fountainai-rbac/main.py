@@ -6,8 +6,10 @@ Production-Grade FastAPI Application for Authentication & RBAC Service API
 Features:
     - Secure user registration and login with SQLite persistent storage.
     - JWT-based access and refresh tokens with token revocation.
+    - Background sweeping of expired/revoked refresh tokens and an optional per-user cap.
+    - Optional RS256/ES256 signing with a JWKS endpoint and kid-based key rotation.
     - Role-based access control.
-    - Password hashing using PassLib.
+    - Password hashing using PassLib, offloaded to a bounded worker pool.
     - Environment configuration via .env.
     - Health check endpoint at the root.
     - Detailed logging and Prometheus-based monitoring.
@@ -18,7 +20,13 @@ Endpoints:
     POST /register         - Register a new user.
     POST /login            - User login (returns access and refresh tokens).
     POST /token/refresh    - Refresh an access token using a refresh token.
-    GET  /users            - List all users (admin only).
+    POST /token/introspect - Check validity, claims and revocation of many tokens at once.
+    POST /token/revoke     - Revoke an access or refresh token before it expires.
+    GET  /token/revocations - Change stream (long-poll) of revoked token ids.
+    GET  /.well-known/jwks.json - Public token signing keys (RS256/ES256 mode).
+    POST /keys/rotate      - Publish a new signing key (admin only).
+    POST /users/bulk       - Create many users in one transaction, streaming results (admin only).
+    GET  /users            - List users, paginated and filterable by role/prefix (admin only).
     GET  /users/{username} - Retrieve a specific user's details.
     PATCH /users/{username} - Update user information.
     DELETE /users/{username} - Delete a user (admin only).
@@ -30,9 +38,18 @@ Notes:
 
 import os
 import uuid
+import asyncio
+import base64
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import (
     FastAPI,
@@ -40,22 +57,36 @@ from fastapi import (
     Depends,
     status,
     Path,
-    Body
+    Query,
+    Body,
+    Request,
+    Response
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.openapi.utils import get_openapi
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
 from passlib.context import CryptContext
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 # SQLAlchemy imports
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, case, delete, func, or_, select
 from sqlalchemy.orm import declarative_base, sessionmaker, Session, relationship
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
 
 # Prometheus Instrumentator for monitoring
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Counter, Gauge, Histogram
+
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine, trace_exemplar
+from fountainai_common.changefeed import ChangeFeed
+from fountainai_common.http_cache import etag_matches
 
 # -----------------------------------------------------------------------------
 # Load Environment Variables
@@ -63,6 +94,32 @@ from prometheus_fastapi_instrumentator import Instrumentator
 load_dotenv()  # Loads the .env file
 SECRET_KEY = os.environ.get("SECRET_KEY", "fallback_secret_key")
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./app.db")
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "fountainai-rbac")
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.environ.get("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.environ.get("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.environ.get("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.environ.get("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.environ.get("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.environ.get("TRACE_STATEMENT_MAX_LENGTH", "1024"))
+HASH_EXECUTOR = os.environ.get("HASH_EXECUTOR", "thread")  # thread | process
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", "64"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000"))
+JWT_SIGNING_ALG = os.environ.get("JWT_SIGNING_ALG", "HS256")  # HS256 | RS256 | ES256
+JWT_KEYS_DIR = os.environ.get("JWT_KEYS_DIR", "./jwt_keys")
+JWT_KEY_PUBLISH_AHEAD = float(os.environ.get("JWT_KEY_PUBLISH_AHEAD", "600"))
+JWKS_MAX_AGE = int(os.environ.get("JWKS_MAX_AGE", "300"))
+REFRESH_TOKEN_SWEEP_INTERVAL = float(os.environ.get("REFRESH_TOKEN_SWEEP_INTERVAL", "300"))
+REFRESH_TOKEN_SWEEP_BATCH = int(os.environ.get("REFRESH_TOKEN_SWEEP_BATCH", "1000"))
+MAX_REFRESH_TOKENS_PER_USER = int(os.environ.get("MAX_REFRESH_TOKENS_PER_USER", "0"))  # 0 = unlimited
+BULK_USERS_MAX = int(os.environ.get("BULK_USERS_MAX", "5000"))
+INTROSPECT_MAX_TOKENS = int(os.environ.get("INTROSPECT_MAX_TOKENS", "1000"))
+INTROSPECT_ROLES = os.environ.get("INTROSPECT_ROLES", "admin,service")
+REVOCATION_FEED_MAX_CHANGES = int(os.environ.get("REVOCATION_FEED_MAX_CHANGES", "10000"))
+REVOCATION_WATCH_TIMEOUT = float(os.environ.get("REVOCATION_WATCH_TIMEOUT", "30"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -70,10 +127,26 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./app.db")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # Database Setup with SQLAlchemy
 # -----------------------------------------------------------------------------
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -90,6 +163,18 @@ class User(Base):
     roles = Column(String, nullable=False)
     
     refresh_tokens = relationship("RefreshToken", back_populates="owner", cascade="all, delete-orphan")
+    role_rows = relationship("UserRole", back_populates="user", cascade="all, delete-orphan")
+
+
+class UserRole(Base):
+    """One row per (user, role); the normalized, indexed form of `User.roles`."""
+    __tablename__ = "user_roles"
+    __table_args__ = (Index("ix_user_roles_role_user_id", "role", "user_id"),)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    role = Column(String, primary_key=True)
+
+    user = relationship("User", back_populates="role_rows")
 
 
 class RefreshToken(Base):
@@ -97,15 +182,47 @@ class RefreshToken(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     token_id = Column(String, unique=True, index=True, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     revoked = Column(Boolean, default=False)
-    expires = Column(DateTime, nullable=False)
+    expires = Column(DateTime, nullable=False, index=True)
     
     owner = relationship("User", back_populates="refresh_tokens")
 
 
+def parse_roles(roles: Optional[str]) -> List[str]:
+    """Split a comma-separated roles string into distinct, lower-cased role names."""
+    return list(dict.fromkeys(r.strip().lower() for r in (roles or "").split(",") if r.strip()))
+
+@event.listens_for(User.roles, "set")
+def sync_role_rows(user, value, oldvalue, initiator):
+    """Keep `user_roles` in step with every assignment to `User.roles`."""
+    existing = {row.role: row for row in user.role_rows}
+    user.role_rows = [existing.get(role) or UserRole(role=role) for role in parse_roles(value)]
+
+def backfill_user_roles(db: Session) -> int:
+    """Create `user_roles` rows for users stored before the table existed."""
+    users = db.query(User).filter(~User.role_rows.any()).all()
+    for user in users:
+        sync_role_rows(user, user.roles, None, None)
+    db.commit()
+    return len(users)
+
+class RevokedAccessToken(Base):
+    """
+    Access tokens revoked before their expiry, by jti; swept once they expire. Revoked
+    refresh tokens land here too when their row is deleted before it expires.
+    """
+    __tablename__ = "revoked_access_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires = Column(DateTime, nullable=False, index=True)
+
+
 # Create tables if they don't exist
 Base.metadata.create_all(bind=engine)
+# create_all leaves existing tables alone, so indexes added later are created here.
+for index in RefreshToken.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 # -----------------------------------------------------------------------------
 # Dependency to Get DB Session
@@ -131,18 +248,259 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain-text password against a hashed version."""
     return pwd_context.verify(plain_password, hashed_password)
 
+PASSWORD_HASH_SECONDS = Histogram(
+    "rbac_password_hash_seconds",
+    "Time from submitting a bcrypt call to its result, queueing included",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2, 5, 10),
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "rbac_password_hash_in_flight", "bcrypt calls running or queued on the hashing pool"
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "rbac_password_hash_queued", "bcrypt calls waiting for a free hashing worker"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "rbac_password_hash_rejected_total", "bcrypt calls refused with 503 because the queue was full", ["operation"]
+)
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a dedicated pool of `workers` threads (bcrypt releases
+    the GIL, so they use separate cores) or processes. At most `queue_limit` calls wait for a
+    free worker; further calls are refused with 503 straight away instead of queueing behind
+    seconds of hashing.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT, kind: str = HASH_EXECUTOR):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, operation: str, fn, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            PASSWORD_HASH_REJECTED.labels(operation=operation).inc()
+            logger.warning("Password hashing pool saturated; rejecting %s", operation)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing capacity exhausted, retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        self._report()
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self._pending -= 1
+            self._report()
+            PASSWORD_HASH_SECONDS.labels(operation=operation).observe(
+                time.perf_counter() - started, exemplar=trace_exemplar()
+            )
+
+    def _report(self):
+        PASSWORD_HASH_IN_FLIGHT.set(self._pending)
+        PASSWORD_HASH_QUEUED.set(max(0, self._pending - self.workers))
+
+    async def hash(self, password: str) -> str:
+        return await self.run("hash", hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run("verify", verify_password, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]):
+        """
+        Hash `passwords` in parallel, yielding (index, hash) in completion order; the hash is
+        None when the pool refused the call. At most `workers` of them are submitted at a
+        time, so a bulk job queues interactive logins behind it but never crowds them out.
+        """
+        window = asyncio.Semaphore(self.workers)
+
+        async def hash_one(index: int, password: str):
+            async with window:
+                try:
+                    return index, await self.run("bulk_hash", hash_password, password)
+                except HTTPException:
+                    return index, None
+
+        tasks = [asyncio.ensure_future(hash_one(i, p)) for i, p in enumerate(passwords)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
+
 # -----------------------------------------------------------------------------
 # JWT Token Utilities
 # -----------------------------------------------------------------------------
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+class SigningKeyRing:
+    """
+    Asymmetric signing keys stored as `<kid>.pem` files in `directory`, so all workers and
+    restarts share them. A kid starts with the Unix time at which the key becomes active.
+    rotate() publishes a new key `publish_ahead` seconds before it signs anything, which
+    gives JWKS caches time to pick it up. Until then the previous key keeps signing; a key
+    is never used before its activation time. A retired key stays published for
+    `retain_for` seconds after its successor activates (the longest lifetime of a token it
+    may have signed), so the signing key itself is never removed.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = JWT_SIGNING_ALG,
+        directory: str = JWT_KEYS_DIR,
+        publish_ahead: float = JWT_KEY_PUBLISH_AHEAD,
+        retain_for: float = REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+    ):
+        self.algorithm = algorithm
+        self.directory = directory
+        self.publish_ahead = publish_ahead
+        self.retain_for = retain_for
+        self._keys: Dict[str, str] = {}
+        self._public: Dict[str, dict] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def activation(kid: str) -> int:
+        return int(kid.split("-", 1)[0])
+
+    def _load(self, force: bool = False):
+        """Re-read the key files when the directory changed (another worker may have rotated)."""
+        os.makedirs(self.directory, exist_ok=True)
+        mtime = os.stat(self.directory).st_mtime
+        if mtime == self._mtime and not force:
+            return
+        keys = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".pem"):
+                with open(os.path.join(self.directory, name)) as f:
+                    keys[name[:-4]] = f.read()
+        self._keys = dict(sorted(keys.items(), key=lambda item: self.activation(item[0])))
+        self._public = {kid: jwk for kid, jwk in self._public.items() if kid in self._keys}
+        self._mtime = mtime
+
+    def _generate(self, activates_at: int) -> str:
+        if self.algorithm == "ES256":
+            key = ec.generate_private_key(ec.SECP256R1())
+        else:
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        kid = f"{activates_at}-{secrets.token_hex(4)}"
+        path = os.path.join(self.directory, f"{kid}.pem")
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+            f.write(pem)
+        self._load(force=True)
+        return kid
+
+    def _prune(self):
+        """Delete keys whose successor has been signing for longer than `retain_for` seconds."""
+        kids = list(self._keys)
+        cutoff = time.time() - self.retain_for
+        retired = [kid for kid, successor in zip(kids, kids[1:]) if self.activation(successor) <= cutoff]
+        for kid in retired:
+            os.remove(os.path.join(self.directory, f"{kid}.pem"))
+        if retired:
+            self._load(force=True)
+
+    def _usable(self) -> List[str]:
+        now = time.time()
+        return [kid for kid in self._keys if self.activation(kid) <= now]
+
+    def rotate(self, publish_ahead: Optional[float] = None) -> str:
+        """
+        Publish a key that starts signing after `publish_ahead` seconds; returns its kid.
+        Refused while no key is active yet, since nothing could sign until the new one does.
+        """
+        ahead = self.publish_ahead if publish_ahead is None else publish_ahead
+        with self._lock:
+            self._load()
+            activates_at = int(time.time() + ahead)
+            if activates_at > time.time() and not self._usable():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="No signing key is active yet; rotate once the pending key has taken over.",
+                )
+            kid = self._generate(activates_at)
+            self._prune()
+        logger.info("Signing key %s published; active from %s", kid, self.activation(kid))
+        return kid
+
+    def active(self) -> Tuple[str, str]:
+        """(kid, private PEM) of the newest key whose activation time has passed."""
+        with self._lock:
+            self._load()
+            usable = self._usable()
+            if not usable:
+                # Only reached on first use, or if a key directory was copied in with only
+                # not-yet-active keys: never sign with a key before its activation time.
+                usable = [self._generate(int(time.time()))]
+            kid = usable[-1]
+            return kid, self._keys[kid]
+
+    def public_jwk(self, kid: Optional[str]) -> Optional[dict]:
+        with self._lock:
+            self._load()
+            if kid not in self._keys:
+                return None
+            if kid not in self._public:
+                public = jwk.construct(self._keys[kid], self.algorithm).public_key().to_dict()
+                self._public[kid] = {**public, "kid": kid, "use": "sig", "alg": self.algorithm}
+            return self._public[kid]
+
+    def jwks(self) -> dict:
+        with self._lock:
+            self._load()
+            kids = list(self._keys)
+        return {"keys": [self.public_jwk(kid) for kid in kids]}
+
+signing_keys = SigningKeyRing()
+
+def sign_token(claims: Dict) -> str:
+    """Sign `claims` with the active asymmetric key (kid in the header) or the shared secret."""
+    if JWT_SIGNING_ALG in ASYMMETRIC_ALGORITHMS:
+        kid, pem = signing_keys.active()
+        return jwt.encode(claims, pem, algorithm=JWT_SIGNING_ALG, headers={"kid": kid})
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_token_signature(token: str) -> Dict:
+    """Decode a token issued by sign_token. Raises JWTError if it is invalid or expired."""
+    if JWT_SIGNING_ALG in ASYMMETRIC_ALGORITHMS:
+        public = signing_keys.public_jwk(jwt.get_unverified_header(token).get("kid"))
+        if public is None:
+            raise JWTError("Unknown signing key.")
+        return jwt.decode(token, public, algorithms=[JWT_SIGNING_ALG])
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
 def create_access_token(subject: str, roles: str, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode = {"sub": subject, "roles": roles, "exp": expire, "type": "access"}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode = {"sub": subject, "roles": roles, "exp": expire, "type": "access", "jti": uuid.uuid4().hex}
+    encoded_jwt = sign_token(to_encode)
     return encoded_jwt
 
 def create_refresh_token(subject: str, db: Session, expires_delta: Optional[timedelta] = None) -> str:
@@ -152,7 +510,7 @@ def create_refresh_token(subject: str, db: Session, expires_delta: Optional[time
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
     jti = str(uuid.uuid4())
     to_encode = {"sub": subject, "exp": expire, "type": "refresh", "jti": jti}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = sign_token(to_encode)
     
     # Retrieve the user to store refresh token; assume user exists.
     user = db.query(User).filter(User.username == subject).first()
@@ -166,6 +524,8 @@ def create_refresh_token(subject: str, db: Session, expires_delta: Optional[time
         expires=expire
     )
     db.add(new_refresh_token)
+    db.flush()
+    enforce_refresh_token_cap(db, user.id)
     db.commit()
     db.refresh(new_refresh_token)
     logger.info("Refresh token created with jti %s for user %s", jti, subject)
@@ -174,7 +534,7 @@ def create_refresh_token(subject: str, db: Session, expires_delta: Optional[time
 def decode_token(token: str) -> Dict:
     """Decode a JWT token. Raises HTTPException if token is invalid or expired."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_token_signature(token)
         return payload
     except JWTError as e:
         logger.error("JWT decoding failed: %s", e)
@@ -184,6 +544,228 @@ def decode_token(token: str) -> Dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+# -----------------------------------------------------------------------------
+# Refresh Token Store Maintenance
+# -----------------------------------------------------------------------------
+REFRESH_TOKENS_SWEPT = Counter(
+    "rbac_refresh_tokens_swept_total", "Expired or revoked refresh tokens deleted by the sweeper"
+)
+REFRESH_TOKENS_EVICTED = Counter(
+    "rbac_refresh_tokens_evicted_total", "Active refresh tokens revoked to enforce MAX_REFRESH_TOKENS_PER_USER"
+)
+REFRESH_TOKEN_ROWS = Gauge(
+    "rbac_refresh_tokens", "Rows in the refresh_tokens table as of the last sweep", ["state"]
+)
+REVOKED_TOKENS = Gauge(
+    "rbac_revoked_tokens", "Unexpired revoked token ids held in memory for introspection"
+)
+
+def epoch_seconds(moment: datetime) -> int:
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+class RevocationSet:
+    """
+    In-memory set of revoked, not yet expired token ids (jti), each kept until its token
+    would have expired anyway, so introspection and get_current_user never need the
+    database. It is loaded from refresh_tokens and revoked_access_tokens at startup and on
+    every sweep (before revoked rows are deleted), and revocations in this process add to
+    it directly.
+
+    It is also a change feed for the services mirroring it: every newly revoked id is
+    published to a ChangeFeed, and `delta` returns the ids added after a given version,
+    or a snapshot when the caller is too far behind or holds a version from before a
+    restart (a different epoch).
+    """
+
+    def __init__(self, max_changes: int = REVOCATION_FEED_MAX_CHANGES):
+        self._expires: Dict[str, datetime] = {}
+        self.feed = ChangeFeed(max_changes)
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        return self.feed.version
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._expires
+
+    def add(self, jti: str, expires: datetime):
+        self.add_many([(jti, expires)])
+
+    def add_many(self, entries) -> int:
+        added = []
+        with self._lock:
+            for jti, expires in entries:
+                if jti not in self._expires:
+                    added.append({"jti": jti, "expires": epoch_seconds(expires)})
+                self._expires[jti] = expires
+            # Published under the lock, so a snapshot never holds an id its version lacks.
+            self.feed.publish(*added)
+        REVOKED_TOKENS.set(len(self._expires))
+        return len(added)
+
+    def load(self, db: Session) -> int:
+        now = datetime.utcnow()
+        rows = db.execute(
+            select(RefreshToken.token_id, RefreshToken.expires)
+            .where(RefreshToken.revoked.is_(True), RefreshToken.expires > now)
+        ).all()
+        rows += db.execute(
+            select(RevokedAccessToken.jti, RevokedAccessToken.expires).where(RevokedAccessToken.expires > now)
+        ).all()
+        return self.add_many(rows)
+
+    def prune(self):
+        now = datetime.utcnow()
+        with self._lock:
+            self._expires = {jti: expires for jti, expires in self._expires.items() if expires > now}
+        REVOKED_TOKENS.set(len(self._expires))
+
+    def delta(self, since: Optional[str]) -> Dict[str, object]:
+        """{"version", "changes"} after `since` when still in the log, else {"version", "snapshot"}."""
+        changes = self.feed.changes_since(since)
+        if changes is not None:
+            return {"version": changes[-1]["version"] if changes else since, "changes": changes}
+        now = datetime.utcnow()
+        with self._lock:
+            return {"version": self.feed.version, "snapshot": [
+                {"jti": jti, "expires": epoch_seconds(expires)}
+                for jti, expires in self._expires.items()
+                if expires > now
+            ]}
+
+    async def wait(self, since: str, timeout: float) -> bool:
+        """Wait until the version moves past `since`; False on timeout."""
+        return await self.feed.wait(since, timeout)
+
+revoked_tokens = RevocationSet()
+
+def enforce_refresh_token_cap(db: Session, user_id: int):
+    """Revoke the user's oldest active refresh tokens beyond MAX_REFRESH_TOKENS_PER_USER."""
+    if MAX_REFRESH_TOKENS_PER_USER <= 0:
+        return
+    surplus = (
+        db.query(RefreshToken)
+        .filter(
+            RefreshToken.user_id == user_id,
+            RefreshToken.revoked.is_(False),
+            RefreshToken.expires > datetime.utcnow(),
+        )
+        .order_by(RefreshToken.expires.desc(), RefreshToken.id.desc())
+        .offset(MAX_REFRESH_TOKENS_PER_USER)
+        .all()
+    )
+    for token in surplus:
+        token.revoked = True
+        revoked_tokens.add(token.token_id, token.expires)
+    if surplus:
+        REFRESH_TOKENS_EVICTED.inc(len(surplus))
+        logger.info("Revoked %d refresh tokens over the per-user cap for user id %s", len(surplus), user_id)
+
+def retain_revocations(db: Session, rows) -> None:
+    """
+    Record (jti, expires) of refresh tokens whose rows are about to be deleted in
+    revoked_access_tokens, so the revocation outlives the row (and a restart) until
+    the token expires. Commits with the caller's transaction.
+    """
+    for jti, expires in rows:
+        db.merge(RevokedAccessToken(jti=jti, expires=expires))
+
+class RefreshTokenSweeper:
+    """
+    Deletes expired and revoked refresh tokens, and expired access-token revocations, from
+    a background thread every `interval` seconds. Rows go `batch_size` per transaction, so the table is never locked for long,
+    and each sweep updates the `rbac_refresh_tokens` gauge. A revoked token that has not
+    expired yet moves to revoked_access_tokens in the same transaction that deletes its row.
+    /token/refresh answers a swept token with the same 401 it gave while the row was
+    revoked or expired.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        interval: float = REFRESH_TOKEN_SWEEP_INTERVAL,
+        batch_size: int = REFRESH_TOKEN_SWEEP_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        """Delete every dead token, one batch per transaction. Returns the number deleted."""
+        db = self.session_factory()
+        try:
+            revoked_tokens.load(db)
+            now = datetime.utcnow()
+            deleted = self._delete_in_batches(
+                db, RefreshToken.id, or_(RefreshToken.revoked.is_(True), RefreshToken.expires < now),
+                before_delete=lambda ids: retain_revocations(db, db.execute(
+                    select(RefreshToken.token_id, RefreshToken.expires)
+                    .where(RefreshToken.id.in_(ids), RefreshToken.revoked.is_(True), RefreshToken.expires >= now)
+                ).all()),
+            )
+            self._delete_in_batches(db, RevokedAccessToken.jti, RevokedAccessToken.expires < now)
+            self.record_size(db)
+        finally:
+            db.close()
+        revoked_tokens.prune()
+        if deleted:
+            REFRESH_TOKENS_SWEPT.inc(deleted)
+            logger.info("Swept %d expired or revoked refresh tokens", deleted)
+        return deleted
+
+    def _delete_in_batches(self, db: Session, key, condition, before_delete=None) -> int:
+        deleted = 0
+        while not self._stop.is_set():
+            ids = db.scalars(select(key).where(condition).limit(self.batch_size)).all()
+            if ids:
+                if before_delete is not None:
+                    before_delete(ids)
+                db.execute(delete(key.table).where(key.in_(ids)))
+                db.commit()
+                deleted += len(ids)
+            if len(ids) < self.batch_size:
+                break
+        return deleted
+
+    def record_size(self, db: Session):
+        total, revoked, expired = db.execute(
+            select(
+                func.count(),
+                func.sum(case((RefreshToken.revoked.is_(True), 1), else_=0)),
+                func.sum(case((RefreshToken.revoked.is_(False) & (RefreshToken.expires < datetime.utcnow()), 1), else_=0)),
+            ).select_from(RefreshToken)
+        ).one()
+        revoked, expired = revoked or 0, expired or 0
+        REFRESH_TOKEN_ROWS.labels(state="active").set(total - revoked - expired)
+        REFRESH_TOKEN_ROWS.labels(state="revoked").set(revoked)
+        REFRESH_TOKEN_ROWS.labels(state="expired").set(expired)
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except SQLAlchemyError as e:
+                logger.error("Refresh token sweep failed: %s", e)
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="refresh-token-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+refresh_token_sweeper = RefreshTokenSweeper()
+
 # -----------------------------------------------------------------------------
 # Pydantic Models for Request and Response Schemas
 # -----------------------------------------------------------------------------
@@ -197,6 +779,9 @@ class UserResponse(BaseModel):
     username: str = Field(..., description="The user's username.")
     roles: str = Field(..., description="Comma-separated roles assigned to the user.")
 
+class BulkUserCreate(BaseModel):
+    users: List[UserCreate] = Field(..., description="The users to create.")
+
 class UserLogin(BaseModel):
     username: str = Field(..., description="The user's username.")
     password: str = Field(..., description="The user's password.")
@@ -217,11 +802,84 @@ class TokenResponse(BaseModel):
 class TokenRefresh(BaseModel):
     refresh_token: str = Field(..., description="Refresh token to obtain a new access token.")
 
+class TokenIntrospectRequest(BaseModel):
+    tokens: List[str] = Field(..., description="The tokens to check.")
+
+class TokenRevoke(BaseModel):
+    token: str = Field(..., description="The access or refresh token to revoke.")
+
+class TokenIntrospection(BaseModel):
+    active: bool = Field(..., description="Whether the token is valid, unexpired and not revoked.")
+    revoked: bool = Field(False, description="Whether the token's jti has been revoked.")
+    claims: Optional[Dict] = Field(None, description="The token's claims, if its signature is valid.")
+    error: Optional[str] = Field(None, description="Why the token failed verification.")
+
+class TokenIntrospectResponse(BaseModel):
+    results: List[TokenIntrospection] = Field(..., description="One result per token, in request order.")
+
+class KeyRotationResponse(BaseModel):
+    kid: str = Field(..., description="Key ID of the newly published signing key.")
+    active_from: datetime = Field(..., description="When the key starts signing tokens (UTC).")
+
 # -----------------------------------------------------------------------------
 # Security Dependencies
 # -----------------------------------------------------------------------------
 security = HTTPBearer()
 
+USER_CACHE_LOOKUPS = Counter(
+    "rbac_user_cache_lookups_total", "User-existence checks in get_current_user by cache outcome", ["result"]
+)
+
+class UserExistenceCache:
+    """
+    Bounded LRU of usernames recently confirmed to exist, each trusted for `ttl` seconds, so
+    authorised requests skip the users-table lookup. update_user/delete_user invalidate the
+    entry; a lookup that raced with an invalidation is not cached. Other workers notice a
+    deletion within `ttl`.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def contains(self, username: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(username)
+            if expires_at is not None and time.monotonic() < expires_at:
+                self._entries.move_to_end(username)
+                hit = True
+            else:
+                self._entries.pop(username, None)
+                hit = False
+        USER_CACHE_LOOKUPS.labels(result="hit" if hit else "miss").inc()
+        return hit
+
+    def add(self, username: str, generation: int):
+        """Remember `username` unless the cache was invalidated since `generation` was read."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[username] = time.monotonic() + self.ttl
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(username, None)
+
+user_cache = UserExistenceCache()
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -238,6 +896,13 @@ def get_current_user(
             detail="Invalid token type.",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if payload.get("jti") in revoked_tokens:
+        logger.warning("Revoked access token presented: %s", payload.get("jti"))
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     username: str = payload.get("sub")
     if username is None:
         logger.error("Token payload missing 'sub'.")
@@ -246,18 +911,34 @@ def get_current_user(
             detail="Invalid token payload.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        logger.error("User not found: %s", username)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    if not user_cache.contains(username):
+        generation = user_cache.generation
+        user = db.query(User).filter(User.username == username).first()
+        if not user:
+            logger.error("User not found: %s", username)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+        user_cache.add(username, generation)
     return {"username": username, "roles": payload.get("roles", "")}
 
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    The smallest string greater than every string starting with `prefix`, or None when
+    there is none (the prefix is all U+10FFFF) and the range is open-ended.
+    """
+    stripped = prefix.rstrip("\U0010ffff")
+    if not stripped:
+        return None
+    following = ord(stripped[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        # Surrogates cannot be stored as text; the next encodable code point follows them.
+        following = 0xE000
+    return stripped[:-1] + chr(following)
+
 def require_admin(current_user: Dict = Depends(get_current_user)) -> Dict:
     """
     Ensure the current user has admin privileges.
     """
-    roles = current_user.get("roles", "")
-    if "admin" not in [r.strip().lower() for r in roles.split(",")]:
+    if "admin" not in parse_roles(current_user.get("roles", "")):
         logger.warning("User %s attempted admin-only action.", current_user.get("username"))
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -301,6 +982,53 @@ app.openapi = custom_openapi
 # -----------------------------------------------------------------------------
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("startup")
+async def ensure_signing_key():
+    if JWT_SIGNING_ALG in ASYMMETRIC_ALGORITHMS:
+        kid, _ = await run_in_threadpool(signing_keys.active)
+        logger.info("Signing tokens with %s key %s", JWT_SIGNING_ALG, kid)
+
+@app.on_event("startup")
+async def backfill_role_rows():
+    db = SessionLocal()
+    try:
+        backfilled = await run_in_threadpool(backfill_user_roles, db)
+    finally:
+        db.close()
+    if backfilled:
+        logger.info("Backfilled user_roles for %d users", backfilled)
+
+@app.on_event("startup")
+async def load_revoked_tokens():
+    db = SessionLocal()
+    try:
+        loaded = await run_in_threadpool(revoked_tokens.load, db)
+    finally:
+        db.close()
+    logger.info("Loaded %d revoked token ids", loaded)
+
+@app.on_event("startup")
+async def start_refresh_token_sweeper():
+    refresh_token_sweeper.start()
+
+@app.on_event("shutdown")
+async def stop_refresh_token_sweeper():
+    refresh_token_sweeper.stop()
+
 # -----------------------------------------------------------------------------
 # Health Check Endpoint
 # -----------------------------------------------------------------------------
@@ -329,7 +1057,7 @@ async def register_user(user: UserCreate = Body(...), db: Session = Depends(get_
         logger.info("Attempted to register an existing user: %s", user.username)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists.")
     
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await password_hasher.hash(user.password)
     new_user = User(username=user.username, hashed_password=hashed_pw, roles=user.roles)
     db.add(new_user)
     db.commit()
@@ -346,7 +1074,7 @@ async def login_user(user: UserLogin = Body(...), db: Session = Depends(get_db))
     Returns an access token and a refresh token if credentials are valid.
     """
     stored_user = db.query(User).filter(User.username == user.username).first()
-    if not stored_user or not verify_password(user.password, stored_user.hashed_password):
+    if not stored_user or not await password_hasher.verify(user.password, stored_user.hashed_password):
         logger.warning("Invalid login attempt for user: %s", user.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
     
@@ -365,7 +1093,7 @@ async def refresh_token(token_refresh: TokenRefresh = Body(...), db: Session = D
     Implements token revocation to prevent reuse.
     """
     try:
-        payload = jwt.decode(token_refresh.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_token_signature(token_refresh.refresh_token)
     except JWTError as e:
         logger.error("Refresh token invalid: %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token.")
@@ -395,6 +1123,7 @@ async def refresh_token(token_refresh: TokenRefresh = Body(...), db: Session = D
     # Mark the refresh token as revoked to prevent reuse.
     token_record.revoked = True
     db.commit()
+    revoked_tokens.add(jti, token_record.expires)
     
     # Generate a new access token.
     user = db.query(User).filter(User.username == username).first()
@@ -406,18 +1135,259 @@ async def refresh_token(token_refresh: TokenRefresh = Body(...), db: Session = D
     logger.info("Access token refreshed for user: %s", username)
     return TokenResponse(access_token=new_access_token, token_type="bearer")
 
+def introspect(token: str) -> TokenIntrospection:
+    try:
+        claims = verify_token_signature(token)
+    except JWTError as e:
+        return TokenIntrospection(active=False, error=str(e))
+    revoked = claims.get("jti") in revoked_tokens
+    return TokenIntrospection(active=not revoked, revoked=revoked, claims=claims)
+
+def drop_unknown_refresh_tokens(db: Session, results: List[TokenIntrospection]) -> None:
+    """Mark active refresh tokens whose row no longer exists as inactive, in one query."""
+    pending = {
+        r.claims.get("jti"): r for r in results
+        if r.active and r.claims.get("type") == "refresh"
+    }
+    if not pending:
+        return
+    known = set(db.scalars(select(RefreshToken.token_id).where(RefreshToken.token_id.in_(list(pending)))).all())
+    for jti, result in pending.items():
+        if jti not in known:
+            result.active = False
+            result.error = "Refresh token is no longer on record."
+
+@app.post("/token/introspect", response_model=TokenIntrospectResponse, tags=["Users"], operation_id="introspect_tokens")
+async def introspect_tokens(
+    request: TokenIntrospectRequest = Body(...),
+    current_user: Dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Introspect many tokens at once.
+
+    For each token, returns whether it is active, whether its jti has been
+    revoked, and its claims when the signature is valid. Claims of tokens issued
+    to someone else are only returned to callers holding one of INTROSPECT_ROLES.
+    Revocation is checked against an in-memory set; refresh tokens must also still
+    have a row (one query per batch), so a deleted one is never reported active.
+    """
+    if len(request.tokens) > INTROSPECT_MAX_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {INTROSPECT_MAX_TOKENS} tokens per request.",
+        )
+    privileged = not set(parse_roles(current_user.get("roles"))).isdisjoint(parse_roles(INTROSPECT_ROLES))
+
+    def introspect_all() -> List[TokenIntrospection]:
+        results = [introspect(token) for token in request.tokens]
+        drop_unknown_refresh_tokens(db, results)
+        for result in results:
+            if result.claims is not None and not privileged and result.claims.get("sub") != current_user["username"]:
+                result.claims = None
+        return results
+
+    results = await run_in_threadpool(introspect_all)
+    return TokenIntrospectResponse(results=results)
+
+@app.post("/token/revoke", tags=["Users"], operation_id="revoke_token")
+async def revoke_token(
+    request: TokenRevoke = Body(...),
+    current_user: Dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Revoke a token before it expires.
+
+    Users may revoke their own tokens; admins may revoke anyone's. The token's
+    jti is published on GET /token/revocations, so services mirroring that
+    stream reject it within moments.
+    """
+    try:
+        claims = verify_token_signature(request.token)
+    except JWTError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid token: {e}")
+    jti = claims.get("jti")
+    if not jti:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token has no jti and cannot be revoked.")
+    if claims.get("sub") != current_user["username"] and "admin" not in parse_roles(current_user.get("roles")):
+        logger.warning("User %s attempted to revoke a token of %s", current_user["username"], claims.get("sub"))
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot revoke another user's token.")
+
+    expires = datetime.utcfromtimestamp(claims["exp"])
+    if claims.get("type") == "refresh":
+        db.query(RefreshToken).filter(RefreshToken.token_id == jti).update({"revoked": True})
+    else:
+        db.merge(RevokedAccessToken(jti=jti, expires=expires))
+    db.commit()
+    revoked_tokens.add(jti, expires)
+    logger.info("Token %s of %s revoked by %s", jti, claims.get("sub"), current_user["username"])
+    return {"detail": "Token revoked.", "jti": jti}
+
+@app.get("/token/revocations", tags=["Users"], operation_id="watch_revocations")
+async def watch_revocations(watch: bool = False, since: Optional[str] = None, timeout: Optional[float] = None):
+    """
+    Change stream of revoked token ids.
+
+    Returns {"version", "changes": [{"version", "jti", "expires"}]} with the ids
+    revoked after `since`, or {"version", "snapshot": [{"jti", "expires"}]} with
+    every unexpired revoked id when `since` is omitted, too old or from before a
+    restart. Versions are opaque tokens; send back the last one seen. `expires` is
+    in epoch seconds. With `watch=true` the call long-polls until something
+    changes after `since` or `timeout` seconds (capped by REVOCATION_WATCH_TIMEOUT)
+    pass.
+    """
+    if watch and since is not None and revoked_tokens.version == since:
+        await revoked_tokens.wait(since, min(timeout or REVOCATION_WATCH_TIMEOUT, REVOCATION_WATCH_TIMEOUT))
+    return revoked_tokens.delta(since)
+
+@app.get("/.well-known/jwks.json", tags=["Keys"], operation_id="get_jwks")
+async def get_jwks(request: Request):
+    """
+    Public keys for verifying tokens, identified by `kid`.
+
+    Empty while tokens are signed with the shared HMAC secret. Clients may cache the
+    document for JWKS_MAX_AGE seconds and revalidate it with If-None-Match.
+    """
+    jwks = signing_keys.jwks() if JWT_SIGNING_ALG in ASYMMETRIC_ALGORITHMS else {"keys": []}
+    body = json.dumps(jwks, sort_keys=True)
+    etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+    headers = {"Cache-Control": f"public, max-age={JWKS_MAX_AGE}", "ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/keys/rotate", response_model=KeyRotationResponse, tags=["Keys"], operation_id="rotate_signing_key")
+async def rotate_signing_key(admin: Dict = Depends(require_admin)):
+    """
+    Rotate the token signing key.
+
+    Requires admin privileges and an asymmetric JWT_SIGNING_ALG. The new key is published
+    in the JWKS immediately and signs tokens after JWT_KEY_PUBLISH_AHEAD seconds.
+    """
+    if JWT_SIGNING_ALG not in ASYMMETRIC_ALGORITHMS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Key rotation requires JWT_SIGNING_ALG to be RS256 or ES256.",
+        )
+    kid = await run_in_threadpool(signing_keys.rotate)
+    logger.info("Signing key rotated to %s by admin: %s", kid, admin.get("username"))
+    return KeyRotationResponse(kid=kid, active_from=datetime.utcfromtimestamp(SigningKeyRing.activation(kid)))
+
+def encode_cursor(username: str) -> str:
+    return base64.urlsafe_b64encode(username.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
 @app.get("/users", response_model=List[UserResponse], tags=["Users"], operation_id="list_users")
-async def list_users(admin: Dict = Depends(require_admin), db: Session = Depends(get_db)):
+async def list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of users to return."),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header."),
+    role: Optional[str] = Query(None, description="Only users holding this role."),
+    prefix: Optional[str] = Query(None, description="Only usernames starting with this prefix."),
+    admin: Dict = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """
-    List all users.
+    List users, ordered by username.
 
     Requires admin privileges.
-    Returns a list of all registered users.
+    Pages are keyset-based: when more users follow, the response carries an
+    X-Next-Cursor header to pass back as `cursor`.
     """
-    users = db.query(User).all()
+    query = db.query(User)
+    if role:
+        query = query.join(UserRole).filter(UserRole.role == role.strip().lower())
+    if prefix:
+        # A range rather than LIKE, so the username index is used on every backend.
+        query = query.filter(User.username >= prefix)
+        upper = prefix_upper_bound(prefix)
+        if upper is not None:
+            query = query.filter(User.username < upper)
+    if cursor:
+        query = query.filter(User.username > decode_cursor(cursor))
+    users = query.order_by(User.username).limit(limit + 1).all()
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(users[-1].username)
     logger.info("Admin %s retrieved user list.", admin.get("username"))
     return [UserResponse(username=user.username, roles=user.roles) for user in users]
 
+@app.post(
+    "/users/bulk",
+    tags=["Users"],
+    operation_id="bulk_create_users",
+    responses={200: {"description": "One JSON line per user, then a summary line.", "content": {"application/x-ndjson": {}}}},
+)
+async def bulk_create_users(
+    bulk: BulkUserCreate = Body(...),
+    admin: Dict = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many users at once.
+
+    Requires admin privileges.
+    Passwords are hashed in parallel on the hashing pool and the new users are
+    inserted in a single transaction. The response is streamed as NDJSON: one
+    line per user (`created`, `rejected` or `failed`) as soon as its outcome is
+    known, followed by a line with the totals.
+    """
+    if len(bulk.users) > BULK_USERS_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_USERS_MAX} users per request.",
+        )
+    names = [user.username for user in bulk.users]
+    existing = set()
+    for i in range(0, len(names), 500):  # Stay below SQLite's bound-parameter limit.
+        existing.update(db.scalars(select(User.username).where(User.username.in_(names[i:i + 500]))))
+
+    def line(username: Optional[str], outcome: str, detail: Optional[str] = None) -> str:
+        return json.dumps({"username": username, "status": outcome, "detail": detail}) + "\n"
+
+    async def results():
+        totals = {"created": 0, "rejected": 0, "failed": 0}
+        accepted: List[UserCreate] = []
+        for user in bulk.users:
+            if user.username in existing:
+                totals["rejected"] += 1
+                yield line(user.username, "rejected", "User already exists.")
+            else:
+                existing.add(user.username)
+                accepted.append(user)
+
+        created: List[str] = []
+        async for index, hashed_pw in password_hasher.hash_many([user.password for user in accepted]):
+            user = accepted[index]
+            if hashed_pw is None:
+                totals["failed"] += 1
+                yield line(user.username, "failed", "Password hashing capacity exhausted, retry shortly.")
+            else:
+                db.add(User(username=user.username, hashed_password=hashed_pw, roles=user.roles))
+                created.append(user.username)
+        try:
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error("Bulk user creation rolled back: %s", e)
+            totals["failed"] += len(created)
+            for username in created:
+                yield line(username, "failed", "Transaction rolled back.")
+        else:
+            totals["created"] += len(created)
+            for username in created:
+                yield line(username, "created")
+        logger.info("Admin %s bulk-created users: %s", admin.get("username"), totals)
+        yield json.dumps({"summary": totals}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.get("/users/{username}", response_model=UserResponse, tags=["Users"], operation_id="get_user")
 async def get_user(
     username: str = Path(..., description="The username of the user to retrieve."),
@@ -454,10 +1424,11 @@ async def update_user(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
     
     if update.password is not None:
-        user.hashed_password = hash_password(update.password)
+        user.hashed_password = await password_hasher.hash(update.password)
     if update.roles is not None:
         user.roles = update.roles
     db.commit()
+    user_cache.invalidate(username)
     logger.info("User updated: %s", username)
     return {"detail": "User updated."}
 
@@ -477,8 +1448,13 @@ async def delete_user(
     if not user:
         logger.warning("Attempt to delete non-existent user: %s", username)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    live_tokens = [(t.token_id, t.expires) for t in user.refresh_tokens if t.expires > datetime.utcnow()]
+    retain_revocations(db, live_tokens)
     db.delete(user)
     db.commit()
+    for jti, expires in live_tokens:
+        revoked_tokens.add(jti, expires)
+    user_cache.invalidate(username)
     logger.info("User deleted: %s by admin: %s", username, admin.get("username"))
     return  # Returns 204 No Content
 
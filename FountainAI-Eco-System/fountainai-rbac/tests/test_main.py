@@ -1,10 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 # Import objects from your app
-from main import app, Base, get_db, User, hash_password
+from main import app, Base, get_db, User, hash_password, prefix_upper_bound
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
 
 # Use an in-memory SQLite database.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -202,3 +204,334 @@ def test_get_update_and_delete_user():
     # Confirm deletion by trying to retrieve the user.
     get_after_del = client.get("/users/modifyuser", headers=headers)
     assert get_after_del.status_code == 404
+
+def test_password_hasher_offloads_and_rejects_when_saturated():
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from main import PasswordHasher
+
+    release = threading.Event()
+    async def scenario():
+        hasher = PasswordHasher(workers=1, queue_limit=1, kind="thread")
+        running = asyncio.ensure_future(hasher.run("hash", release.wait))
+        queued = asyncio.ensure_future(hasher.run("hash", release.wait))
+        await asyncio.sleep(0.05)
+        # The event loop stays free while both calls occupy the pool...
+        assert not running.done() and not queued.done()
+        # ...and a third call is refused instead of waiting.
+        try:
+            await hasher.run("hash", release.wait)
+            assert False, "expected 503"
+        except HTTPException as e:
+            assert e.status_code == 503
+            assert e.headers["Retry-After"] == "1"
+        release.set()
+        assert await asyncio.gather(running, queued) == [True, True]
+        assert await hasher.verify("secret", await hasher.hash("secret"))
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+def test_get_current_user_caches_existence_until_invalidated():
+    from sqlalchemy import event
+    from main import user_cache
+
+    register_user("cacheduser", "cachepass")
+    headers = {"Authorization": f"Bearer {login_user('cacheduser', 'cachepass').json()['access_token']}"}
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        def user_queries_for_read():
+            statements.clear()
+            assert client.get("/users/cacheduser", headers=headers).status_code == 200
+            return sum("FROM users" in s for s in statements)
+
+        user_queries_for_read()
+        # Warm cache: only the handler's own query remains, the auth check is free.
+        assert user_queries_for_read() == 1
+        user_cache.invalidate("cacheduser")
+        assert user_queries_for_read() == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def test_asymmetric_signing_publishes_jwks_and_rotates_by_kid(tmp_path, monkeypatch):
+    import main
+    from jose import jwt as jose_jwt
+
+    monkeypatch.setattr(main, "JWT_SIGNING_ALG", "ES256")
+    keys = main.SigningKeyRing(algorithm="ES256", directory=str(tmp_path / "keys"), publish_ahead=600)
+    monkeypatch.setattr(main, "signing_keys", keys)
+    keys.rotate(publish_ahead=-3600)
+
+    register_user("jwksuser", "jwkspass")
+    old_token = login_user("jwksuser", "jwkspass").json()["access_token"]
+    old_kid = jose_jwt.get_unverified_header(old_token)["kid"]
+    jwks = client.get("/.well-known/jwks.json")
+    assert jwks.headers["cache-control"] == f"public, max-age={main.JWKS_MAX_AGE}"
+    assert [k["kid"] for k in jwks.json()["keys"]] == [old_kid]
+    assert client.get("/.well-known/jwks.json", headers={"If-None-Match": jwks.headers["etag"]}).status_code == 304
+    assert client.get("/.well-known/jwks.json", headers={"If-None-Match": f'"stale", W/{jwks.headers["etag"]}'}).status_code == 304
+
+    # A rotated key is published ahead of use; the current key keeps signing meanwhile.
+    next_kid = keys.rotate()
+    assert {k["kid"] for k in client.get("/.well-known/jwks.json").json()["keys"]} == {old_kid, next_kid}
+    assert keys.active()[0] == old_kid
+
+    current_kid = keys.rotate(publish_ahead=-1)
+    new_token = login_user("jwksuser", "jwkspass").json()["access_token"]
+    assert jose_jwt.get_unverified_header(new_token)["kid"] == current_kid
+    for token in (old_token, new_token):
+        response = client.get("/users/jwksuser", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200, response.text
+    # A retired key stays published while tokens it signed may still be valid, i.e. for
+    # retain_for seconds after its successor took over. The signing key is never removed.
+    keys.retain_for = 3600
+    keys.rotate()
+    assert old_kid in {k["kid"] for k in keys.jwks()["keys"]}
+    keys.retain_for = 0
+    keys.rotate()
+    published = {k["kid"] for k in keys.jwks()["keys"]}
+    assert old_kid not in published and current_kid in published and next_kid in published
+    assert keys.active()[0] == current_kid
+
+def test_signing_key_ring_never_signs_with_a_future_key(tmp_path):
+    import time
+    import main
+    from fastapi import HTTPException
+
+    keys = main.SigningKeyRing(algorithm="ES256", directory=str(tmp_path / "keys"), publish_ahead=600)
+    # Nothing could sign until a key published ahead takes over, so the rotation is refused.
+    with pytest.raises(HTTPException) as exc:
+        keys.rotate()
+    assert exc.value.status_code == 409 and keys.jwks() == {"keys": []}
+
+    # A directory holding only a not-yet-active key gets a key that is active now.
+    keys._load()
+    pending = keys._generate(int(time.time()) + 600)
+    kid, _ = keys.active()
+    assert kid != pending and main.SigningKeyRing.activation(kid) <= time.time()
+    assert keys.rotate() not in (kid, pending)
+
+def test_refresh_token_cap_and_sweeper(monkeypatch):
+    import main
+    from datetime import datetime, timedelta
+    from prometheus_client import REGISTRY
+
+    monkeypatch.setattr(main, "MAX_REFRESH_TOKENS_PER_USER", 2)
+    register_user("sweepuser", "sweeppass")
+    tokens = [login_user("sweepuser", "sweeppass").json()["refresh_token"] for _ in range(3)]
+
+    # Only the two newest refresh tokens of the user stay usable.
+    assert refresh_access_token(tokens[0]).status_code == 401
+    assert refresh_access_token(tokens[2]).status_code == 200
+
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.username == "sweepuser").first()
+    db.add(main.RefreshToken(token_id="expired-jti", user_id=user.id, expires=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    rows = lambda: db.query(main.RefreshToken).filter(main.RefreshToken.user_id == user.id).count()
+    assert rows() == 4
+
+    sweeper = main.RefreshTokenSweeper(session_factory=TestingSessionLocal, interval=0, batch_size=1)
+    swept = sweeper.sweep()
+    assert swept >= 3  # two revoked, one expired, plus leftovers of other tests
+    assert rows() == 1
+    assert sweeper.sweep() == 0
+    assert REGISTRY.get_sample_value("rbac_refresh_tokens", {"state": "revoked"}) == 0
+    assert REGISTRY.get_sample_value("rbac_refresh_tokens", {"state": "active"}) >= 1
+    assert refresh_access_token(tokens[1]).status_code == 200
+
+    # A swept revocation survives a restart: the new process rebuilds it from the database.
+    restarted = type(main.revoked_tokens)()
+    restarted.load(db)
+    for token in tokens[:2]:
+        jti = main.verify_token_signature(token)["jti"]
+        assert jti in restarted
+    monkeypatch.setattr(main, "revoked_tokens", restarted)
+    access = login_user("sweepuser", "sweeppass").json()["access_token"]
+    resp = client.post("/token/introspect", json={"tokens": [tokens[0]]}, headers={"Authorization": f"Bearer {access}"})
+    assert resp.json()["results"][0]["active"] is False and resp.json()["results"][0]["revoked"] is True
+    db.close()
+
+def test_deleted_users_refresh_tokens_stay_revoked_after_restart(monkeypatch):
+    import main
+
+    register_user("doomed", "pw")
+    refresh = login_user("doomed", "pw").json()["refresh_token"]
+    db = TestingSessionLocal()
+    db.add(User(username="doom-admin", hashed_password=hash_password("pw"), roles="admin"))
+    db.commit()
+    headers = {"Authorization": f"Bearer {login_user('doom-admin', 'pw').json()['access_token']}"}
+    assert client.delete("/users/doomed", headers=headers).status_code == 204
+
+    restarted = type(main.revoked_tokens)()
+    restarted.load(db)
+    db.close()
+    assert main.verify_token_signature(refresh)["jti"] in restarted
+    # Even without the revocation, a refresh token whose row is gone is not active.
+    monkeypatch.setattr(main, "revoked_tokens", type(main.revoked_tokens)())
+    result = client.post("/token/introspect", json={"tokens": [refresh]}, headers=headers).json()["results"][0]
+    assert result["active"] is False and result["error"]
+
+def test_list_users_pages_by_cursor_and_filters_by_role_and_prefix():
+    db = TestingSessionLocal()
+    for name, roles in [("pg-admin", "admin"), ("pg-a", "User, editor"), ("pg-b", "user"), ("pg-c", "editor"), ("pgx", "user")]:
+        db.add(User(username=name, hashed_password=hash_password("pgpass"), roles=roles))
+    db.commit()
+    headers = {"Authorization": f"Bearer {login_user('pg-admin', 'pgpass').json()['access_token']}"}
+
+    def pages(**params):
+        names, cursor = [], None
+        while True:
+            resp = client.get("/users", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+            assert resp.status_code == 200
+            names.append([user["username"] for user in resp.json()])
+            cursor = resp.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return names
+
+    assert pages(prefix="pg-", limit=2) == [["pg-a", "pg-admin"], ["pg-b", "pg-c"]]
+    assert pages(prefix="pg", role="user", limit=2) == [["pg-a", "pg-b"], ["pgx"]]
+    assert pages(prefix="pg", role="EDITOR") == [["pg-a", "pg-c"]]
+
+    # Role rows follow updates to the roles string.
+    assert client.patch("/users/pg-c", json={"roles": "user"}, headers=headers).status_code == 200
+    assert pages(prefix="pg", role="editor") == [["pg-a"]]
+    assert client.get("/users", params={"cursor": "%%%"}, headers=headers).status_code == 400
+    assert client.get("/users", params={"prefix": "pg\U0010ffff"}, headers=headers).status_code == 200
+    assert prefix_upper_bound("pg-") == "pg."
+    assert prefix_upper_bound("p\U0010ffff") == "q"
+    assert prefix_upper_bound("\U0010ffff") is None
+    assert prefix_upper_bound("\ud7ff") == "\ue000"
+
+    plan = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN SELECT user_id FROM user_roles WHERE role = 'admin'"
+    ).fetchall()
+    assert "ix_user_roles_role_user_id" in str(plan)
+    db.close()
+
+def test_bulk_create_users_streams_results_and_commits_once():
+    import json
+
+    register_user("bulk-taken", "pw")
+    register_user("bulk-admin", "adminpw", roles="admin")
+    headers = {"Authorization": f"Bearer {login_user('bulk-admin', 'adminpw').json()['access_token']}"}
+    users = [
+        {"username": "bulk-1", "password": "pw1", "roles": "user"},
+        {"username": "bulk-taken", "password": "pw", "roles": "user"},
+        {"username": "bulk-2", "password": "pw2", "roles": "user,editor"},
+        {"username": "bulk-1", "password": "again", "roles": "user"},
+    ]
+    commits = []
+    listen = lambda session: commits.append(session)
+    event.listen(TestingSessionLocal, "after_commit", listen)
+    try:
+        resp = client.post("/users/bulk", json={"users": users}, headers=headers)
+    finally:
+        event.remove(TestingSessionLocal, "after_commit", listen)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(l["username"], l["status"]) for l in lines[:2]] == [("bulk-taken", "rejected"), ("bulk-1", "rejected")]
+    assert sorted(l["username"] for l in lines[2:4] if l["status"] == "created") == ["bulk-1", "bulk-2"]
+    assert lines[-1] == {"summary": {"created": 2, "rejected": 2, "failed": 0}}
+    assert len(commits) == 1
+
+    assert login_user("bulk-2", "pw2").status_code == 200
+    assert client.post("/users/bulk", json={"users": users}, headers={}).status_code == 403
+
+def test_token_introspect_reports_revocation_with_one_refresh_token_query():
+    from datetime import timedelta
+    from main import create_access_token
+
+    register_user("introspect-user", "pw")
+    tokens = login_user("introspect-user", "pw").json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert refresh_access_token(tokens["refresh_token"]).status_code == 200
+    fresh = login_user("introspect-user", "pw").json()["refresh_token"]
+    expired = create_access_token("introspect-user", "user", expires_delta=timedelta(minutes=-1))
+
+    statements = []
+    listen = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listen)
+    try:
+        resp = client.post(
+            "/token/introspect",
+            json={"tokens": [tokens["refresh_token"], fresh, tokens["access_token"], expired, "garbage"]},
+            headers=headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", listen)
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [(r["active"], r["revoked"]) for r in results] == [
+        (False, True), (True, False), (True, False), (False, False), (False, False),
+    ]
+    assert results[1]["claims"]["sub"] == "introspect-user"
+    assert results[3]["error"] and results[3]["claims"] is None
+    assert sum("refresh_tokens" in statement for statement in statements) == 1
+
+    assert client.post("/token/introspect", json={"tokens": []}).status_code == 403
+
+    # Claims of someone else's token are withheld unless the caller is privileged.
+    register_user("introspect-other", "pw")
+    other = login_user("introspect-other", "pw").json()["access_token"]
+    resp = client.post("/token/introspect", json={"tokens": [other]}, headers=headers)
+    assert resp.json()["results"][0]["active"] is True
+    assert resp.json()["results"][0]["claims"] is None
+    db = TestingSessionLocal()
+    db.add(User(username="indexer", hashed_password=hash_password("pw"), roles="service"))
+    db.commit()
+    db.close()
+    service_token = login_user("indexer", "pw").json()["access_token"]
+    resp = client.post(
+        "/token/introspect", json={"tokens": [other]}, headers={"Authorization": f"Bearer {service_token}"}
+    )
+    assert resp.json()["results"][0]["claims"]["sub"] == "introspect-other"
+
+def test_access_token_revocation_is_enforced_and_published():
+    from datetime import datetime, timedelta
+    from main import revoked_tokens
+
+    register_user("revoke-user", "pw")
+    register_user("revoke-other", "pw")
+    access = login_user("revoke-user", "pw").json()["access_token"]
+    other = login_user("revoke-other", "pw").json()["access_token"]
+    headers = {"Authorization": f"Bearer {access}"}
+    assert client.get("/users/revoke-user", headers=headers).status_code == 200
+
+    since = client.get("/token/revocations").json()["version"]
+    assert client.post("/token/revoke", json={"token": other}, headers=headers).status_code == 403
+    resp = client.post("/token/revoke", json={"token": access}, headers=headers)
+    assert resp.status_code == 200
+    jti = resp.json()["jti"]
+
+    # The token is rejected at once and the jti shows up on the change stream.
+    assert client.get("/users/revoke-user", headers=headers).status_code == 401
+    delta = client.get("/token/revocations", params={"watch": "true", "since": since, "timeout": 1}).json()
+    assert [change["jti"] for change in delta["changes"]] == [jti]
+    assert delta["version"] == delta["changes"][0]["version"] != since
+    assert client.get("/token/revocations", params={"watch": "true", "since": delta["version"], "timeout": 0.01}).json()["changes"] == []
+    assert jti in {entry["jti"] for entry in client.get("/token/revocations").json()["snapshot"]}
+    assert "snapshot" in client.get("/token/revocations", params={"since": "unknown"}).json()
+
+    # The revocation is persisted, so a restarted process loads it again. Its versions
+    # start over under a new epoch, so a mirror still holding an old one gets a snapshot
+    # rather than the changes after a sequence number the old process already used.
+    db = TestingSessionLocal()
+    fresh = type(revoked_tokens)()
+    fresh.load(db)
+    assert jti in fresh
+    db.close()
+    fresh.add_many((f"later-{n}", datetime.utcnow() + timedelta(minutes=5)) for n in range(50))
+    assert int(fresh.version.split(".")[1]) > int(since.split(".")[1])
+    restarted = fresh.delta(since)
+    assert jti in {entry["jti"] for entry in restarted["snapshot"]} and restarted["version"] == fresh.version
+
+def test_requests_are_traced():
+    response = client.get("/openapi.json", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
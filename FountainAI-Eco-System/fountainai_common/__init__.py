@@ -0,0 +1,18 @@
+"""
+fountainai_common
+
+Code shared by the FountainAI services instead of being pasted into each main.py:
+
+  - tracing:     W3C Trace Context propagation and span export
+  - auth:        JWKS verification and the token revocation mirror
+  - kms_client:  cached client for kms-app keys
+  - changefeed:  versioned change log behind the watch endpoints
+  - http_cache:  ETag comparison, the gateways' GET response cache and single-flight
+  - discovery:   peer resolution from the gateway's registry watch
+  - compression: Accept-Encoding negotiation and the gateways' compression middleware
+  - upstream:    the gateways' pooled upstream clients and active health checker
+  - resilience:  circuit breakers, bulkheads, budgeted retries and hedged GETs
+
+Services import it from the ecosystem root (PYTHONPATH includes the directory holding this
+package); Docker images copy it next to main.py through the `fountainai_common` build context.
+"""
@@ -0,0 +1,216 @@
+"""
+fountainai_common.auth
+
+Local verification of tokens issued by fountainai-rbac.
+
+Features:
+  - JWKSVerifier keeps an in-memory copy of the issuer's JWKS and verifies RS256/ES256
+    tokens without a call per request; HS256 tokens keep using the shared secret. A token
+    signed with a key it has not seen yet is rejected at once while the JWKS is refetched
+    in the background.
+  - RevocationList mirrors the issuer's revoked token ids from GET /token/revocations,
+    so checking revocation is one set lookup.
+
+Usage:
+    revocation_list = RevocationList(url=REVOCATIONS_URL)
+    jwks_verifier = JWKSVerifier(url=JWKS_URL, revocations=revocation_list)
+    claims = jwks_verifier.decode(token, JWT_SECRET, JWT_ALGORITHM)
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Optional
+
+from jose import JWTError, jwt
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNCS = Counter("token_revocation_syncs_total", "Revocation change-stream polls by outcome", ["outcome"])
+REVOKED_TOKENS = Gauge("revoked_tokens", "Unexpired revoked token ids mirrored from the issuer")
+
+class RevocationList:
+    """
+    Mirror of the issuer's revoked token ids (jti). A background thread long-polls
+    /token/revocations for the ids revoked after the version it holds, and replaces
+    everything with the snapshot it gets when it is too far behind or the issuer has
+    restarted since (versions are opaque tokens carrying the issuer's boot epoch). A lookup is one set
+    membership test, so checking revocation adds no I/O to a request. Ids are dropped once
+    their token has expired. With no `url`, nothing is ever revoked.
+    """
+
+    def __init__(
+        self,
+        url: str = "",
+        poll_timeout: float = 30.0,
+        retry_interval: float = 5.0,
+    ):
+        self.url = url
+        self.poll_timeout = poll_timeout
+        self.retry_interval = retry_interval
+        self.version: Optional[str] = None
+        self._expires: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __contains__(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._expires
+
+    def apply(self, delta: dict):
+        expires = {} if "snapshot" in delta else dict(self._expires)
+        for entry in delta.get("snapshot", []) + delta.get("changes", []):
+            expires[entry["jti"]] = entry["expires"]
+        now = time.time()
+        self._expires = {jti: exp for jti, exp in expires.items() if exp > now}
+        self.version = delta["version"]
+        REVOKED_TOKENS.set(len(self._expires))
+
+    def _poll(self) -> dict:
+        query = {"watch": "true", "timeout": self.poll_timeout}
+        if self.version is not None:
+            query["since"] = self.version
+        url = f"{self.url}?{urllib.parse.urlencode(query)}"
+        with urllib.request.urlopen(url, timeout=self.poll_timeout + 5) as r:
+            return json.loads(r.read())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.apply(self._poll())
+                REVOCATION_SYNCS.labels(outcome="ok").inc()
+            except (OSError, ValueError, KeyError) as e:
+                REVOCATION_SYNCS.labels(outcome="error").inc()
+                logger.warning("Revocation sync from %s failed: %s", self.url, e)
+                self._stop.wait(self.retry_interval)
+
+    def start(self):
+        if self.url and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            # A long poll in flight is abandoned rather than waited out; the thread is a daemon.
+            self._thread.join(timeout=1)
+            self._thread = None
+
+JWKS_REFRESHES = Counter("jwks_refresh_total", "JWKS fetches from the token issuer by outcome", ["outcome"])
+
+class JWKSVerifier:
+    """
+    In-memory copy of the issuer's JWKS, refreshed by a background thread every
+    `refresh_interval` seconds, so RS256/ES256 tokens are verified locally instead of with a
+    call per request. A token whose kid is unknown is rejected at once, never waiting on
+    the issuer; it starts one refetch in the background (at most every
+    `min_refetch_interval` seconds), which picks up a rotated key early. The algorithm
+    is taken from the published key, never from the token. HS256 tokens keep using the
+    shared secret unless `accept_hmac` is off. With no `url`, only HS256 is accepted.
+    Tokens whose jti is in `revocations` are rejected either way.
+    """
+
+    def __init__(
+        self,
+        url: str = "",
+        refresh_interval: float = 300.0,
+        min_refetch_interval: float = 10.0,
+        timeout: float = 2.0,
+        accept_hmac: bool = True,
+        revocations: Optional[RevocationList] = None,
+    ):
+        self.url = url
+        self.revocations = revocations
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.accept_hmac = accept_hmac
+        self._keys: Dict[str, dict] = {}
+        self._etag: Optional[str] = None
+        self._last_fetch = float("-inf")
+        self._fetch_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._refetch_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch(self) -> Optional[dict]:
+        """GET the JWKS; None if it is unchanged since the last fetch."""
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url, headers=headers), timeout=self.timeout) as r:
+                self._etag = r.headers.get("ETag")
+                return json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+    def refresh(self) -> bool:
+        with self._fetch_lock:
+            self._last_fetch = time.monotonic()
+            try:
+                jwks = self._fetch()
+            except (OSError, ValueError) as e:
+                JWKS_REFRESHES.labels(outcome="error").inc()
+                logger.warning("JWKS refresh from %s failed; keeping %d cached keys: %s", self.url, len(self._keys), e)
+                return False
+            if jwks is not None:
+                self._keys = {key["kid"]: key for key in jwks.get("keys", []) if key.get("kid")}
+            JWKS_REFRESHES.labels(outcome="unchanged" if jwks is None else "updated").inc()
+            return True
+
+    def key_for(self, kid: Optional[str]) -> Optional[dict]:
+        key = self._keys.get(kid) if kid else None
+        if key is None and kid and self.url:
+            self._refetch_soon()
+        return key
+
+    def _refetch_soon(self):
+        """Refresh from a background thread unless one is running or ran too recently."""
+        with self._lock:
+            if self._refetch_thread is not None and self._refetch_thread.is_alive():
+                return
+            if time.monotonic() - self._last_fetch < self.min_refetch_interval:
+                return
+            self._refetch_thread = threading.Thread(target=self.refresh, name="jwks-refetch", daemon=True)
+            self._refetch_thread.start()
+
+    def decode(self, token: str, secret: str, algorithm: str) -> dict:
+        """Verify `token` and return its claims. Raises JWTError, like jwt.decode."""
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") in ("RS256", "ES256"):
+            key = self.key_for(header.get("kid"))
+            if key is None:
+                raise JWTError(f"Unknown signing key {header.get('kid')!r}")
+            claims = jwt.decode(token, key, algorithms=[key.get("alg", header["alg"])])
+        elif not self.accept_hmac:
+            raise JWTError("Shared-secret tokens are not accepted")
+        else:
+            claims = jwt.decode(token, secret, algorithms=[algorithm])
+        if self.revocations is not None and claims.get("jti") in self.revocations:
+            raise JWTError("Token has been revoked")
+        return claims
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        """Load the keys once (before the service takes traffic), then keep them refreshed."""
+        if self.url and self._thread is None:
+            self.refresh()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
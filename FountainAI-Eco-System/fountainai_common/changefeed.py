@@ -0,0 +1,95 @@
+"""
+fountainai_common.changefeed
+
+Versioned, in-memory change log behind the watch endpoints (GET /registry?watch=true,
+GET /token/revocations, GET /keys/events).
+
+Features:
+  - Version tokens are "<epoch>.<n>": the epoch is a random id drawn when the process
+    starts, so a watcher holding a token from before a restart never mistakes the new
+    process's log for a continuation of the old one; it gets a snapshot instead.
+  - Changes are published from any thread (writes run in the threadpool); long-poll and
+    SSE waiters are woken on the event loop via call_soon_threadsafe.
+
+Usage:
+    feed = ChangeFeed(max_changes=1000)
+    feed.publish({"service_name": "search", "url": "http://search:8000"})
+    changes = feed.changes_since(since)   # None: the caller needs a snapshot
+    await feed.wait(since, timeout=30)
+
+Clients treat the token as opaque and send back the last one they saw as `since`.
+"""
+
+import asyncio
+import secrets
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+class ChangeFeed:
+    """
+    Log of the last `max_changes` changes, each a dict stamped with its version token.
+    `changes_since` answers with the changes after a token when they are all still in
+    the log, or None when the caller needs a snapshot: the token is missing, malformed,
+    from another epoch, ahead of this feed, or older than the log.
+    """
+
+    def __init__(self, max_changes: int = 1000):
+        self.epoch = secrets.token_hex(4)
+        self.sequence = 0
+        self._changes: deque = deque(maxlen=max_changes)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event = asyncio.Event()
+
+    @property
+    def version(self) -> str:
+        return f"{self.epoch}.{self.sequence}"
+
+    def position(self, since: Optional[str]) -> Optional[int]:
+        """The sequence number `since` stands for in this feed; None if it is not one of ours."""
+        epoch, _, sequence = (since or "").partition(".")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, *changes: dict) -> str:
+        """Append `changes` in order and wake waiters; returns the new version."""
+        with self._lock:
+            for change in changes:
+                self.sequence += 1
+                self._changes.append((self.sequence, {"version": self.version, **change}))
+            version = self.version
+        if changes and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+        return version
+
+    def _wake(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def changes_since(self, since: Optional[str]) -> Optional[List[Dict[str, object]]]:
+        """Changes after `since`, or None if the caller needs a snapshot."""
+        position = self.position(since)
+        with self._lock:
+            if position is None or position > self.sequence:
+                return None
+            if position == self.sequence:
+                return []
+            if not self._changes or self._changes[0][0] > position + 1:
+                return None
+            return [change for sequence, change in self._changes if sequence > position]
+
+    async def wait(self, since: Optional[str], timeout: float) -> bool:
+        """Wait until the version moves past `since`; False on timeout."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._event = asyncio.Event()
+        if self.version != since:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,228 @@
+"""
+fountainai_common.compression
+
+Response compression for the gateways, negotiated via Accept-Encoding.
+
+Features:
+  - CompressionMiddleware (pure ASGI) compresses eligible responses with gzip, brotli or
+    zstd, whichever the client weights highest; ties go to the configured order.
+  - Bodies that are already encoded, bodiless statuses, event streams, small bodies and
+    content types outside the allow-list pass through untouched.
+  - Streamed bodies are compressed chunk by chunk once `minimum_size` bytes are seen, so
+    compression never turns a stream into a buffered response.
+  - brotli and zstandard are optional; encodings whose library is missing are skipped.
+
+Usage:
+    app.add_middleware(
+        CompressionMiddleware,
+        route_label=lambda path: path.strip("/").partition("/")[0],
+        encodings=available_encodings("br,zstd,gzip"),
+    )
+"""
+
+import logging
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODINGS = "br,zstd,gzip"
+DEFAULT_CONTENT_TYPES = "application/json,application/javascript,application/xml,text/"
+
+COMPRESSION_BYTES = Counter(
+    "gateway_compression_bytes_total", "Response bytes before (in) and after (out) compression", ["route", "encoding", "direction"]
+)
+COMPRESSION_SECONDS = Counter(
+    "gateway_compression_seconds_total", "Time spent compressing responses", ["route", "encoding"]
+)
+COMPRESSION_SKIPPED = Counter(
+    "gateway_compression_skipped_total", "Responses sent without gateway compression", ["route", "reason"]
+)
+
+class ResponseEncoder:
+    """Incremental gzip, brotli or zstd encoder with a common compress()/finish() interface."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self.compress, self.finish = self._obj.compress, self._obj.flush
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+            self.compress, self.finish = self._obj.process, self._obj.finish
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self.compress, self.finish = self._obj.compress, self._obj.flush
+        else:
+            raise ValueError(f"Unsupported encoding '{encoding}'")
+
+def available_encodings(configured: str = DEFAULT_ENCODINGS) -> List[str]:
+    """Configured encodings in preference order, minus those whose library is missing."""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    encodings = []
+    for encoding in (e.strip().lower() for e in configured.split(",")):
+        if encoding not in installed:
+            continue
+        if not installed[encoding]:
+            logger.warning("Encoding '%s' is configured but its library is not installed; skipping it.", encoding)
+            continue
+        encodings.append(encoding)
+    return encodings
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Pick the client's highest-q supported encoding; ties go to the server's preference order."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compressible(content_type: str, allowed: List[str]) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if not media_type or media_type == "text/event-stream":
+        # Event streams must reach the client as each event is written.
+        return False
+    if media_type.endswith("+json"):
+        return True
+    return any(media_type.startswith(a) if a.endswith("/") else media_type == a for a in allowed)
+
+class CompressionMiddleware:
+    """
+    Compresses eligible responses with the best encoding the client accepts.
+
+    Responses that already carry a Content-Encoding (e.g. compressed by the backend) pass
+    through untouched, as do non-allow-listed content types, bodiless statuses and bodies
+    below `minimum_size`. Streamed bodies are buffered only until `minimum_size` bytes
+    are seen, then compressed chunk by chunk. Bytes and time are reported per route.
+    `levels` (gzip_level, brotli_quality, zstd_level) are passed on to ResponseEncoder.
+    """
+
+    def __init__(
+        self,
+        app,
+        route_label: Callable[[str], str],
+        minimum_size: int = 1024,
+        encodings: Optional[List[str]] = None,
+        content_types: str = DEFAULT_CONTENT_TYPES,
+        **levels: int,
+    ):
+        self.app = app
+        self.route_label = route_label
+        self.minimum_size = minimum_size
+        self.encodings = encodings if encodings is not None else available_encodings()
+        self.content_types = [t.strip().lower() for t in content_types.split(",") if t.strip()]
+        self.levels = levels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        route = self.route_label(scope["path"])
+        start_message = None
+        encoder: Optional[ResponseEncoder] = None
+        passthrough = False
+        buffered = []
+        buffered_size = 0
+
+        async def begin_compressed(body: bytes, more_body: bool):
+            nonlocal encoder
+            encoder = ResponseEncoder(encoding, **self.levels)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["content-encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+            chunk = self._encode(encoder, route, body, finish=not more_body)
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(chunk))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough, buffered_size
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                reason = None
+                if message["status"] < 200 or message["status"] in (204, 304):
+                    reason = "status"
+                elif "content-encoding" in headers:
+                    reason = "already_encoded"
+                elif not compressible(headers.get("content-type", ""), self.content_types):
+                    reason = "content_type"
+                elif headers.get("content-length", "").isdigit() and int(headers["content-length"]) < self.minimum_size:
+                    reason = "too_small"
+                if reason is not None:
+                    passthrough = True
+                    COMPRESSION_SKIPPED.labels(route=route, reason=reason).inc()
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if encoder is not None:
+                chunk = self._encode(encoder, route, body, finish=not more_body)
+                if chunk or not more_body:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+            buffered.append(body)
+            buffered_size += len(body)
+            if buffered_size >= self.minimum_size:
+                await begin_compressed(b"".join(buffered), more_body)
+            elif not more_body:
+                passthrough = True
+                COMPRESSION_SKIPPED.labels(route=route, reason="too_small").inc()
+                await send(start_message)
+                await send({"type": "http.response.body", "body": b"".join(buffered), "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _encode(self, encoder: ResponseEncoder, route: str, body: bytes, finish: bool) -> bytes:
+        started = time.perf_counter()
+        chunk = encoder.compress(body) if body else b""
+        if finish:
+            chunk += encoder.finish()
+        COMPRESSION_SECONDS.labels(route=route, encoding=encoder.encoding).inc(time.perf_counter() - started)
+        COMPRESSION_BYTES.labels(route=route, encoding=encoder.encoding, direction="in").inc(len(body))
+        COMPRESSION_BYTES.labels(route=route, encoding=encoder.encoding, direction="out").inc(len(chunk))
+        return chunk
@@ -0,0 +1,174 @@
+"""
+fountainai_common.discovery
+
+Client-side service discovery against central_gateway's registry watch API
+(GET /registry?watch=true).
+
+Features:
+  - ServiceDiscovery mirrors every service's instance list (url, weight, health) from the
+    gateway's change feed, so resolving a peer never waits on the network.
+  - Each call picks one of the healthy instances by weight, the way the gateway balances
+    proxied traffic, instead of pinning a caller to the single instance one /lookup chose.
+  - While the gateway is unreachable the last known instances keep being served for up to
+    `stale_ttl` seconds; services it does not know fail at once without a lookup.
+
+Usage:
+    discovery = ServiceDiscovery(API_GATEWAY_URL)
+    discovery.start()                       # on startup
+    url = await discovery.resolve("character_service")
+    await discovery.aclose()                # on shutdown
+"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+from fountainai_common.tracing import TRACE_HOOKS
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_LOOKUPS = Counter(
+    "service_discovery_lookups_total", "Service URL resolutions by outcome", ["result"]
+)
+DISCOVERY_SYNCS = Counter(
+    "service_discovery_syncs_total", "Registry watch polls against the gateway by outcome", ["outcome"]
+)
+
+# (url, weight, healthy)
+Instance = Tuple[str, int, bool]
+
+class ServiceDiscovery:
+    """
+    Mirror of the gateway registry, kept current by a long-poll loop on the event loop.
+
+    `resolve` answers from memory: a weighted random pick among the service's healthy
+    instances (503 if it has none or is unknown). Until the first sync completes, callers
+    wait for it for up to `timeout` seconds. Once the mirror has not been confirmed for
+    `stale_ttl` seconds, resolving fails rather than routing to instances that may be gone.
+    """
+
+    def __init__(
+        self,
+        gateway_url: str,
+        poll_timeout: float = 30,
+        retry_interval: float = 5,
+        stale_ttl: float = 300,
+        timeout: float = 2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.gateway_url = gateway_url.rstrip("/")
+        self.poll_timeout = poll_timeout
+        self.retry_interval = retry_interval
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.transport = transport
+        self.version: Optional[str] = None
+        self._services: Dict[str, List[Instance]] = {}
+        self._synced_at = 0.0
+        self._synced: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, transport=self.transport, event_hooks=TRACE_HOOKS
+            )
+        return self._client
+
+    async def _poll(self) -> dict:
+        params = {"watch": "true", "timeout": self.poll_timeout}
+        if self.version is not None:
+            params["since"] = self.version
+        r = await self._http().get(
+            f"{self.gateway_url}/registry", params=params, timeout=self.poll_timeout + self.timeout
+        )
+        r.raise_for_status()
+        return r.json()
+
+    @staticmethod
+    def _instances(state: dict) -> List[Instance]:
+        instances = state.get("instances")
+        if not instances:
+            return [(state["url"], 1, True)] if state.get("url") else []
+        return [(i["url"], i.get("weight", 1), i.get("healthy", True)) for i in instances]
+
+    def apply(self, delta: dict):
+        """Apply a {"version", "snapshot"} or {"version", "changes"} watch response."""
+        if "snapshot" in delta:
+            self._services = {}
+        states = {change["service_name"]: change for change in delta.get("changes", [])}
+        states.update(delta.get("snapshot", {}))
+        for service_name, state in states.items():
+            instances = self._instances(state)
+            if instances:
+                self._services[service_name] = instances
+            else:
+                self._services.pop(service_name, None)
+        self.version = delta["version"]
+        self._synced_at = time.monotonic()
+        if self._synced is not None:
+            self._synced.set()
+
+    async def _run(self):
+        while True:
+            try:
+                self.apply(await self._poll())
+                DISCOVERY_SYNCS.labels(outcome="ok").inc()
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                DISCOVERY_SYNCS.labels(outcome="error").inc()
+                logger.warning("Registry watch on %s failed: %s", self.gateway_url, e)
+                await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        if self._task is None:
+            self._synced = asyncio.Event()
+            if self.version is not None:
+                self._synced.set()
+            # A fresh context, so the watch loop is not traced as part of whichever
+            # request happened to start it.
+            self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+
+    def _unavailable(self, service_name: str, result: str, reason: str) -> HTTPException:
+        DISCOVERY_LOOKUPS.labels(result=result).inc()
+        return HTTPException(status_code=503, detail=f"Service discovery failed for '{service_name}': {reason}")
+
+    async def resolve(self, service_name: str) -> str:
+        """Base URL of one healthy instance of `service_name`, chosen by weight."""
+        self.start()
+        if not self._synced.is_set():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._synced.wait()), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._unavailable(service_name, "unavailable", "registry not loaded yet")
+        if time.monotonic() - self._synced_at > self.stale_ttl:
+            raise self._unavailable(service_name, "unavailable", "registry is stale")
+        instances = self._services.get(service_name)
+        if not instances:
+            raise self._unavailable(service_name, "unknown", "not registered")
+        healthy = [(url, weight) for url, weight, ok in instances if ok]
+        if not healthy:
+            raise self._unavailable(service_name, "unhealthy", "no healthy instances")
+        DISCOVERY_LOOKUPS.labels(result="hit").inc()
+        if len(healthy) == 1:
+            return healthy[0][0]
+        return random.choices([url for url, _ in healthy], weights=[weight for _, weight in healthy])[0]
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,274 @@
+"""
+fountainai_common.http_cache
+
+HTTP caching helpers shared by the gateways and the services that serve validators.
+
+Features:
+  - etag_matches compares an If-None-Match header against an ETag with the weak
+    comparison RFC 9110 prescribes for it: lists and "*" are understood, and W/"x"
+    matches "x". The gateways' CompressionMiddleware weakens ETags of encoded bodies, so
+    a client revalidating a gzip response sends back W/"…" for an entry stored as "…".
+  - ResponseCache holds upstream GET responses in memory, bounded in bytes (LRU), with
+    freshness from Cache-Control or per-route TTLs; stale entries that carry validators
+    are revalidated with a conditional request instead of being refetched.
+  - SingleFlight lets identical concurrent GETs share one upstream call.
+
+Usage:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response_cache = ResponseCache(max_bytes=64 * 1024 * 1024, route_ttls={"search": 30})
+    entry = response_cache.get(response_cache.key(route, request, scope))
+    response = await single_flight.do(single_flight_key(route, request, scope), produce)
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import Counter, Gauge
+from starlette.datastructures import Headers
+
+def opaque_tag(etag: str) -> str:
+    """The quoted part of an entity tag, without a weak indicator."""
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match value (a list of tags or "*") matches `etag`, weakly."""
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or opaque_tag(etag) in {opaque_tag(tag) for tag in candidates if tag}
+
+CACHE_LOOKUPS = Counter(
+    "gateway_cache_requests_total", "GET requests seen by the response cache", ["result"]
+)
+CACHE_HIT_RATIO = Gauge(
+    "gateway_cache_hit_ratio", "Share of cache lookups answered without a full upstream response"
+)
+CACHE_BYTES = Gauge("gateway_cache_bytes", "Bytes held by the response cache")
+CACHE_ENTRIES = Gauge("gateway_cache_entries", "Entries held by the response cache")
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+def parse_route_ttls(value: str) -> Dict[str, float]:
+    ttls = {}
+    for pair in value.split(","):
+        prefix, _, seconds = pair.partition("=")
+        if prefix.strip() and seconds.strip():
+            ttls[prefix.strip().strip("/")] = float(seconds)
+    return ttls
+
+class CachedResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, ttl: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = headers.get("etag")
+        self.last_modified = headers.get("last-modified")
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+        self.refresh(ttl)
+
+    def refresh(self, ttl: float):
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + ttl
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        validators = {}
+        if self.etag:
+            validators["if-none-match"] = self.etag
+        if self.last_modified:
+            validators["if-modified-since"] = self.last_modified
+        return validators
+
+    def confirmed_by(self, validators: Dict[str, str], etag: Optional[str]) -> bool:
+        """Whether an upstream 304 to a request sent with `validators` vouches for this entry."""
+        if etag:
+            return etag_matches(etag, self.etag)
+        if "if-none-match" in validators:
+            return etag_matches(validators["if-none-match"], self.etag)
+        return bool(self.last_modified) and validators.get("if-modified-since") == self.last_modified
+
+    def not_modified_for(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        return bool(self.last_modified) and request.headers.get("if-modified-since") == self.last_modified
+
+    def to_response(self, request: Request, cache_status: str) -> Response:
+        headers = dict(self.headers)
+        headers["age"] = str(int(time.monotonic() - self.stored_at))
+        headers["x-cache"] = cache_status
+        if self.not_modified_for(request):
+            headers.pop("content-length", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, status_code=self.status_code, headers=headers)
+
+class ResponseCache:
+    """
+    In-memory cache of upstream GET responses keyed by path, query, auth scope and
+    Accept-Encoding. Routes under `public_routes` are stored once for every caller (an
+    empty scope) instead of once per user. Freshness comes from the upstream's
+    s-maxage/max-age, falling back to the longest matching per-route TTL. Stale entries
+    carrying an ETag or Last-Modified are revalidated with a conditional request. Total
+    size is bounded by `max_bytes`, evicting least recently used entries first.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        default_ttl: float = 0,
+        route_ttls: Optional[Dict[str, float]] = None,
+        public_routes: Optional[List[str]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self.route_ttls = route_ttls or {}
+        self.public_routes = [prefix.strip().strip("/") for prefix in public_routes or []]
+        self._entries: "OrderedDict[Tuple[str, str, str, str], CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._lookups = 0
+
+    @staticmethod
+    def key(route: str, request: Request, scope: str) -> Tuple[str, str, str, str]:
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        return (route, query, scope, request.headers.get("accept-encoding", ""))
+
+    def route_ttl(self, route: str) -> float:
+        route = route.strip("/")
+        best = None
+        for prefix in self.route_ttls:
+            if route == prefix or route.startswith(prefix + "/"):
+                if best is None or len(prefix) > len(best):
+                    best = prefix
+        return self.route_ttls[best] if best is not None else self.default_ttl
+
+    def is_public(self, route: str) -> bool:
+        """Whether GETs under `route` return the same response to every caller."""
+        route = route.strip("/")
+        return any(route == prefix or route.startswith(prefix + "/") for prefix in self.public_routes)
+
+    def ttl_for(
+        self, route: str, headers, route_ttl: Optional[float] = None, shared: bool = False
+    ) -> Optional[float]:
+        """
+        Seconds the response stays fresh, or None if it must not be stored. `route_ttl`,
+        when given, replaces the per-route / default fallback. A `shared` entry (one
+        stored for every caller) never holds a Cache-Control: private response.
+        """
+        directives = parse_cache_control(headers.get("cache-control", ""))
+        if "no-store" in directives or (shared and "private" in directives) or headers.get("vary", "").strip() == "*":
+            return None
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name) and directives[name].isdigit():
+                return float(directives[name])
+        return route_ttl if route_ttl is not None else self.route_ttl(route)
+
+    def record(self, result: str):
+        CACHE_LOOKUPS.labels(result=result).inc()
+        if result == "bypass":
+            return
+        self._lookups += 1
+        if result in ("hit", "revalidated"):
+            self._hits += 1
+        CACHE_HIT_RATIO.set(self._hits / self._lookups)
+
+    def get(self, key) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry: CachedResponse):
+        self.discard(key)
+        if entry.size > self.max_entry_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+        CACHE_BYTES.set(self._bytes)
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            CACHE_BYTES.set(self._bytes)
+            CACHE_ENTRIES.set(len(self._entries))
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "gateway_single_flight_requests_total",
+    "GET requests that led an upstream call or joined one already in flight",
+    ["role"],
+)
+
+class SingleFlight:
+    """
+    Lets concurrent identical requests share one upstream call. The first caller for
+    a key (the leader) runs `produce`; callers arriving while it is in flight wait for
+    its result and receive a copy. Streamed results cannot be shared, so followers of
+    a leader that ended up streaming (or was cancelled) run their own request.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+
+    async def do(self, key: Tuple, produce: Callable[[], Awaitable[Response]]) -> Response:
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            SINGLE_FLIGHT_REQUESTS.labels(role="follower").inc()
+            shared = await asyncio.shield(pending)
+            if shared is None:
+                return await produce()
+            return Response(
+                content=shared.body,
+                status_code=shared.status_code,
+                headers=Headers(raw=shared.raw_headers),
+            )
+
+        SINGLE_FLIGHT_REQUESTS.labels(role="leader").inc()
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved even when nobody joined, to keep asyncio quiet.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            response = await produce()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        future.set_result(None if isinstance(response, StreamingResponse) else response)
+        return response
+
+def single_flight_key(route: str, request: Request, scope: str) -> Tuple:
+    return (
+        "GET",
+        *ResponseCache.key(route, request, scope),
+        request.headers.get("if-none-match", ""),
+        request.headers.get("if-modified-since", ""),
+        request.headers.get("cache-control", ""),
+    )
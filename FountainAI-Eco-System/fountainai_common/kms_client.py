@@ -0,0 +1,160 @@
+"""
+fountainai_common.kms_client
+
+Client for the Key Management Service (kms-app) with in-memory key caching.
+
+Features:
+  - Keys are served from memory for the max-age kms-app sends in Cache-Control.
+  - Stale keys are revalidated with If-None-Match; an unchanged key costs a 304 without a body.
+  - watch() follows GET /keys/events from a background thread, refreshing cached keys the
+    moment they are rotated (or dropping them when revoked) and notifying on_rotate callbacks.
+
+Usage:
+    kms = KMSClient("http://kms-app:8000", token=ADMIN_TOKEN)
+    api_key = kms.get_key("typesense_client_service")
+    kms.on_rotate(lambda service_name, api_key: reconfigure(api_key))
+    kms.watch()
+    ...
+    kms.close()
+"""
+
+import re
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+class KeyNotFoundError(LookupError):
+    """The service has no active key in kms-app (never created, or revoked)."""
+
+class KMSClient:
+    """
+    Caches API keys fetched from kms-app. Thread-safe; `get_key` may be called from any
+    thread while `watch` keeps the cache in step with rotations.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "",
+        token: str = "",
+        http: Optional[httpx.Client] = None,
+        timeout: float = 5.0,
+        watch_timeout: float = 30.0,
+        retry_interval: float = 5.0,
+    ):
+        self.http = http or httpx.Client(base_url=base_url, timeout=timeout)
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.version: Optional[str] = None
+        # service_name -> (api_key, etag, fresh until [monotonic])
+        self._cache: Dict[str, Tuple[str, str, float]] = {}
+        self._callbacks: List[Callable[[str, Optional[str]], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get_key(self, service_name: str) -> str:
+        """The service's current API key; raises KeyNotFoundError or httpx.HTTPError."""
+        with self._lock:
+            cached = self._cache.get(service_name)
+        if cached is not None and time.monotonic() < cached[2]:
+            return cached[0]
+
+        headers = dict(self.headers)
+        if cached is not None:
+            headers["If-None-Match"] = cached[1]
+        response = self.http.get(f"/keys/{quote(service_name, safe='')}", headers=headers)
+        if response.status_code == 404:
+            with self._lock:
+                self._cache.pop(service_name, None)
+            raise KeyNotFoundError(service_name)
+        if response.status_code == 304 and cached is not None:
+            api_key = cached[0]
+        else:
+            response.raise_for_status()
+            api_key = response.json()["api_key"]
+        match = MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        fresh_for = int(match.group(1)) if match else 0
+        with self._lock:
+            self._cache[service_name] = (api_key, response.headers.get("ETag", ""), time.monotonic() + fresh_for)
+        return api_key
+
+    def invalidate(self, service_name: str):
+        with self._lock:
+            self._cache.pop(service_name, None)
+
+    def on_rotate(self, callback: Callable[[str, Optional[str]], None]):
+        """Call `callback(service_name, api_key)` after a cached key changes; api_key is None once revoked."""
+        self._callbacks.append(callback)
+
+    def _expire(self, service_name: str):
+        """Mark a cached key stale, so the next get_key revalidates it but a failure keeps it."""
+        with self._lock:
+            cached = self._cache.get(service_name)
+            if cached is not None:
+                self._cache[service_name] = cached[:2] + (0,)
+
+    def apply(self, delta: dict):
+        """
+        Refresh cached keys whose etag differs from a /keys/events delta or snapshot, then
+        move to its version. If a refresh fails, the version and the stale entry stay put,
+        so the next poll reports the same change again and no on_rotate call is lost.
+        """
+        if "snapshot" in delta:
+            current = delta["snapshot"]
+        else:
+            current = {change["service_name"]: change["etag"] for change in delta.get("changes", [])}
+        with self._lock:
+            stale = [
+                name for name, (_, etag, _) in self._cache.items()
+                if (name in current or "snapshot" in delta) and current.get(name) != etag
+            ]
+        for service_name in stale:
+            self._expire(service_name)
+            try:
+                api_key = self.get_key(service_name)
+            except KeyNotFoundError:
+                api_key = None
+            logger.info("KMS key for %s changed", service_name)
+            for callback in self._callbacks:
+                callback(service_name, api_key)
+        self.version = delta["version"]
+
+    def poll_events(self):
+        """One long poll of GET /keys/events, applied to the cache."""
+        params = {"timeout": self.watch_timeout}
+        if self.version is not None:
+            params["since"] = self.version
+        response = self.http.get("/keys/events", params=params, headers=self.headers, timeout=self.watch_timeout + 5)
+        response.raise_for_status()
+        self.apply(response.json())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_events()
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                logger.warning("Watching KMS key events failed: %s", e)
+                self._stop.wait(self.retry_interval)
+
+    def watch(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kms-key-events", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            # A long poll in flight is abandoned rather than waited out; the thread is a daemon.
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.http.close()
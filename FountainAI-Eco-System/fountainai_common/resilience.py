@@ -0,0 +1,290 @@
+"""
+fountainai_common.resilience
+
+Failure handling for the gateways' upstream calls.
+
+Features:
+  - ServiceGuard is a per-service circuit breaker plus bulkhead: it fails fast while a
+    backend keeps failing and caps the requests in flight to it.
+  - with_retries repeats idempotent calls with full-jitter backoff after a transport
+    failure or a 502/503/504, drawing every retry from a global RetryBudget so a downed
+    backend is not hit with a multiple of its normal traffic.
+  - hedged_attempt sends a second copy of a GET that is slower than the service's recent
+    latency quantile (tracked by LatencyTracker) and uses whichever answers first.
+
+An attempt is any coroutine function returning a call object with `.response` (an
+httpx.Response) and `aclose()`; a transport failure is raised as HTTPException(502).
+
+Usage:
+    retry_budget, latency_tracker = RetryBudget(), LatencyTracker()
+    call = await with_retries(
+        "search", "GET", None, attempt,
+        budget=retry_budget, tracker=latency_tracker, retries=2, hedge=True,
+    )
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+CIRCUIT_STATE = Gauge(
+    "gateway_circuit_breaker_state", "Circuit breaker state (0=closed, 1=half-open, 2=open)", ["service"]
+)
+BULKHEAD_IN_FLIGHT = Gauge(
+    "gateway_bulkhead_in_flight", "Requests currently admitted by the service bulkhead", ["service"]
+)
+REJECTED_REQUESTS = Counter(
+    "gateway_rejected_requests_total", "Requests failed fast by a circuit breaker or bulkhead", ["service", "reason"]
+)
+
+class ServiceGuard:
+    """
+    Circuit breaker plus bulkhead for a single backend service.
+
+    The breaker opens after `failure_threshold` consecutive failures (transport
+    errors or 5xx responses), rejects everything for `reset_timeout` seconds, then
+    lets up to `half_open_max_calls` trial requests through. A successful trial
+    closes it again; a failed one re-opens it, and a cancelled one (a lost hedge, a
+    /batch deadline) hands its trial slot to the next request. Independently, the
+    bulkhead caps the number of requests in flight to the service at `max_in_flight`.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        service_name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        half_open_max_calls: int = 1,
+        max_in_flight: int = 50,
+    ):
+        self.service_name = service_name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.max_in_flight = max_in_flight
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_calls = 0
+        self.in_flight = 0
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.labels(service=self.service_name).set(self._STATE_VALUES[state])
+
+    def try_acquire(self) -> Optional[str]:
+        """Admit a request, or return the reason ("circuit_open" / "bulkhead_full") it is rejected."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return self._reject("circuit_open")
+            self._set_state(self.HALF_OPEN)
+            self.trial_calls = 0
+        if self.state == self.HALF_OPEN and self.trial_calls >= self.half_open_max_calls:
+            return self._reject("circuit_open")
+        if self.in_flight >= self.max_in_flight:
+            return self._reject("bulkhead_full")
+        if self.state == self.HALF_OPEN:
+            self.trial_calls += 1
+        self.in_flight += 1
+        BULKHEAD_IN_FLIGHT.labels(service=self.service_name).inc()
+        return None
+
+    def _reject(self, reason: str) -> str:
+        REJECTED_REQUESTS.labels(service=self.service_name, reason=reason).inc()
+        return reason
+
+    def release(self):
+        self.in_flight -= 1
+        BULKHEAD_IN_FLIGHT.labels(service=self.service_name).dec()
+
+    def abandon(self):
+        """An admitted request was cancelled before it had an outcome: free its half-open trial slot."""
+        if self.state == self.HALF_OPEN and self.trial_calls > 0:
+            self.trial_calls -= 1
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+            logger.info("Circuit for %s closed", self.service_name)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit for %s opened after %d failures", self.service_name, self.failures)
+            self._set_state(self.OPEN)
+            self.opened_at = time.monotonic()
+
+UPSTREAM_RETRY_ATTEMPTS = Counter(
+    "gateway_upstream_retries_total", "Upstream attempts repeated after a failure", ["service", "reason"]
+)
+RETRY_BUDGET_EXHAUSTED = Counter(
+    "gateway_retry_budget_exhausted_total", "Retries or hedges skipped because the retry budget was empty"
+)
+HEDGED_REQUESTS = Counter(
+    "gateway_hedged_requests_total", "Hedged GET attempts sent, and how many of them won", ["service", "outcome"]
+)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+class RetryBudget:
+    """
+    Token bucket shared by all backends that caps extra load from retries and hedges:
+    every first attempt deposits `ratio` tokens, a floor of `min_per_second` tokens
+    accrues over time, and each retry or hedge spends one token. When a backend is
+    down, retries stop after the budget is drained instead of multiplying traffic.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(1.0, 10 * min_per_second)
+        self.tokens = self.capacity
+        self._refilled = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._refilled) * self.min_per_second)
+        self._refilled = now
+
+    def record_request(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        RETRY_BUDGET_EXHAUSTED.inc()
+        return False
+
+class LatencyTracker:
+    """Recent time-to-headers samples per service, used to pick the hedging delay."""
+
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, window: int = 256, min_delay: float = 0.01):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self._samples: Dict[str, deque] = {}
+
+    def observe(self, service_name: str, seconds: float):
+        samples = self._samples.get(service_name)
+        if samples is None:
+            samples = self._samples[service_name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def hedge_delay(self, service_name: str) -> Optional[float]:
+        """The service's recent latency quantile, or None until enough samples exist."""
+        samples = self._samples.get(service_name)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))])
+
+def retry_backoff(attempt: int, base: float = 0.05, maximum: float = 1.0) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+async def timed_attempt(service_name: str, attempt: Callable[[], Awaitable[Any]], tracker: LatencyTracker) -> Any:
+    started = time.perf_counter()
+    call = await attempt()
+    tracker.observe(service_name, time.perf_counter() - started)
+    return call
+
+async def discard_attempts(tasks):
+    """Cancel losing attempts and close any that already produced a response."""
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if not isinstance(result, BaseException):
+            await result.aclose()
+
+async def hedged_attempt(
+    service_name: str,
+    attempt: Callable[[], Awaitable[Any]],
+    budget: RetryBudget,
+    tracker: LatencyTracker,
+) -> Any:
+    """
+    Run `attempt`; if it has not produced response headers within the service's recent
+    latency quantile, send a second copy and use whichever answers first.
+    """
+    delay = tracker.hedge_delay(service_name)
+    if delay is None:
+        return await timed_attempt(service_name, attempt, tracker)
+    first = asyncio.ensure_future(timed_attempt(service_name, attempt, tracker))
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and budget.try_spend():
+            HEDGED_REQUESTS.labels(service=service_name, outcome="sent").inc()
+            tasks.append(asyncio.ensure_future(timed_attempt(service_name, attempt, tracker)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                if task is not first:
+                    HEDGED_REQUESTS.labels(service=service_name, outcome="won").inc()
+                tasks.remove(task)
+                return task.result()
+        raise error
+    finally:
+        await discard_attempts(tasks)
+
+async def with_retries(
+    service_name: str,
+    method: str,
+    content,
+    attempt: Callable[[], Awaitable[Any]],
+    budget: RetryBudget,
+    tracker: LatencyTracker,
+    retries: int = 2,
+    hedge: bool = False,
+    backoff_base: float = 0.05,
+    backoff_max: float = 1.0,
+) -> Any:
+    """
+    Call `attempt` and repeat it with jittered backoff after a transport failure (502) or
+    a 502/503/504 upstream response, as long as the request is idempotent, its body can
+    be replayed and `budget` allows. GETs are hedged when `hedge` is set.
+    """
+    replayable = method in IDEMPOTENT_METHODS and (content is None or isinstance(content, bytes))
+    budget.record_request()
+    tries = 0
+    while True:
+        try:
+            if method == "GET" and hedge:
+                call = await hedged_attempt(service_name, attempt, budget, tracker)
+            else:
+                call = await timed_attempt(service_name, attempt, tracker)
+        except HTTPException as e:
+            if not (replayable and e.status_code == 502 and tries < retries and budget.try_spend()):
+                raise
+            reason = "error"
+        else:
+            status_code = call.response.status_code
+            if not (replayable and status_code in RETRYABLE_STATUSES and tries < retries and budget.try_spend()):
+                return call
+            await call.aclose()
+            reason = str(status_code)
+        tries += 1
+        UPSTREAM_RETRY_ATTEMPTS.labels(service=service_name, reason=reason).inc()
+        await asyncio.sleep(retry_backoff(tries, backoff_base, backoff_max))
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import JWTError, jwk, jwt
+
+from fountainai_common.auth import JWKSVerifier, RevocationList
+
+def keypair(kid):
+    pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = jwk.construct(pem, "ES256").public_key().to_dict()
+    return pem, {**public, "kid": kid, "alg": "ES256", "use": "sig"}
+
+def test_jwks_verifier_caches_keys_and_refetches_for_unknown_kid(monkeypatch):
+    old_pem, old_jwk = keypair("1-old")
+    new_pem, new_jwk = keypair("2-new")
+    published = {"keys": [old_jwk]}
+    fetches = []
+    verifier = JWKSVerifier(url="http://rbac/.well-known/jwks.json", min_refetch_interval=60)
+    monkeypatch.setattr(verifier, "_fetch", lambda: fetches.append(1) or published)
+    verifier.refresh()
+
+    token = jwt.encode({"sub": "alice"}, old_pem, algorithm="ES256", headers={"kid": "1-old"})
+    assert verifier.decode(token, "unused", "HS256")["sub"] == "alice"
+    assert verifier.decode(token, "unused", "HS256")["sub"] == "alice"
+    assert len(fetches) == 1
+
+    # An unknown kid is rejected without waiting on the issuer; the refetch it starts in
+    # the background picks up the rotated key for the next request.
+    published = {"keys": [old_jwk, new_jwk]}
+    monkeypatch.setattr(verifier, "_last_fetch", float("-inf"))
+    gate = threading.Event()
+    monkeypatch.setattr(verifier, "_fetch", lambda: gate.wait(5) and (fetches.append(1) or published))
+    rotated = jwt.encode({"sub": "bob"}, new_pem, algorithm="ES256", headers={"kid": "2-new"})
+    with pytest.raises(JWTError):
+        verifier.decode(rotated, "unused", "HS256")
+    with pytest.raises(JWTError):
+        verifier.decode(rotated, "unused", "HS256")  # While the refetch runs: no second one.
+    gate.set()
+    verifier._refetch_thread.join(5)
+    assert verifier.decode(rotated, "unused", "HS256")["sub"] == "bob"
+    assert len(fetches) == 2
+
+    # A forged kid does not trigger another fetch within min_refetch_interval.
+    forged = jwt.encode({"sub": "eve"}, new_pem, algorithm="ES256", headers={"kid": "3-forged"})
+    with pytest.raises(JWTError):
+        verifier.decode(forged, "unused", "HS256")
+    assert not verifier._refetch_thread.is_alive() and len(fetches) == 2
+
+    # Shared-secret tokens still verify unless they are switched off.
+    legacy = jwt.encode({"sub": "carol"}, "secret", algorithm="HS256")
+    assert verifier.decode(legacy, "secret", "HS256")["sub"] == "carol"
+    verifier.accept_hmac = False
+    with pytest.raises(JWTError):
+        verifier.decode(legacy, "secret", "HS256")
+
+def test_revocation_list_follows_change_stream_and_rejects_revoked_jti(monkeypatch):
+    revocations = RevocationList(url="http://rbac/token/revocations")
+    now = time.time()
+    revocations.apply({"version": "e1.3", "snapshot": [{"jti": "a", "expires": now + 60}, {"jti": "old", "expires": now - 1}]})
+    revocations.apply({"version": "e1.4", "changes": [{"version": "e1.4", "jti": "b", "expires": now + 60}]})
+    assert ("a" in revocations, "b" in revocations, "old" in revocations, None in revocations) == (True, True, False, False)
+    assert revocations.version == "e1.4"
+    polls = []
+    monkeypatch.setattr(revocations, "_poll", lambda: polls.append(revocations.version) or {"version": "e2.0", "snapshot": []})
+    # After an issuer restart the poll answers with a snapshot under the new epoch.
+    revocations.apply(revocations._poll())
+    assert polls == ["e1.4"] and "a" not in revocations
+
+    revocations.apply({"version": "e2.1", "changes": [{"version": "e2.1", "jti": "revoked-jti", "expires": now + 60}]})
+    verifier = JWKSVerifier(url="", revocations=revocations)
+    assert verifier.decode(jwt.encode({"sub": "x", "jti": "live-jti"}, "k", algorithm="HS256"), "k", "HS256")["sub"] == "x"
+    with pytest.raises(JWTError):
+        verifier.decode(jwt.encode({"sub": "x", "jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
+    # Without a revocation list nothing is revoked.
+    assert JWKSVerifier(url="").decode(jwt.encode({"jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
@@ -0,0 +1,38 @@
+import asyncio
+
+from fountainai_common.changefeed import ChangeFeed
+
+def test_changes_since_a_version_of_this_feed():
+    feed = ChangeFeed(max_changes=2)
+    start = feed.version
+    first = feed.publish({"name": "a"})
+    feed.publish({"name": "b"}, {"name": "c"})
+    assert feed.changes_since(feed.version) == []
+    assert feed.changes_since(first) == [
+        {"version": f"{feed.epoch}.2", "name": "b"}, {"version": feed.version, "name": "c"},
+    ]
+    # Trimmed from the log: the caller needs a snapshot.
+    assert feed.changes_since(start) is None
+
+def test_versions_from_another_process_or_malformed_need_a_snapshot():
+    old, new = ChangeFeed(), ChangeFeed()
+    for feed in (old, new):
+        feed.publish({"name": "a"})
+    new.publish({"name": "b"})
+    # Same sequence number, different epoch: not a continuation of the old process's log.
+    assert old.version.split(".")[1] == "1" and new.changes_since(f"{new.epoch}.1") is not None
+    for since in (None, old.version, "", "1", f"{new.epoch}.x", f"{new.epoch}.9"):
+        assert new.changes_since(since) is None
+
+def test_wait_wakes_on_publish_from_another_thread():
+    feed = ChangeFeed()
+
+    async def scenario():
+        since = feed.version
+        assert await feed.wait(since, 0.01) is False
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, lambda: loop.run_in_executor(None, feed.publish, {"name": "a"}))
+        assert await feed.wait(since, 5) is True
+        assert await feed.wait("stale", 5) is True
+
+    asyncio.run(scenario())
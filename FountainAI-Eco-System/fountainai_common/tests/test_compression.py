@@ -0,0 +1,29 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from fountainai_common.compression import CompressionMiddleware, negotiate_encoding
+
+def test_negotiate_encoding_prefers_the_highest_q_then_the_server_order():
+    assert negotiate_encoding("gzip;q=0.5, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=0.5, br;q=0", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("*", ["gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+
+def test_middleware_compresses_large_bodies_and_weakens_their_etag():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, route_label=lambda path: path.strip("/"), encodings=["gzip"])
+
+    @app.get("/big")
+    def big():
+        return JSONResponse({"data": "x" * 4096}, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    client = TestClient(app)
+    big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip" and big.headers["etag"] == 'W/"v1"'
+    assert int(big.headers["content-length"]) < 4096 and big.json() == {"data": "x" * 4096}
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
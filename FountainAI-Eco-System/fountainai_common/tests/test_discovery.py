@@ -0,0 +1,88 @@
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from fountainai_common.discovery import ServiceDiscovery
+
+class FakeGateway:
+    """Just enough of central_gateway's GET /registry?watch=true."""
+
+    def __init__(self):
+        self.responses = asyncio.Queue()
+        self.requests = []
+        self.up = True
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.params.get("since"))
+        if not self.up:
+            raise httpx.ConnectError("gateway down", request=request)
+        return httpx.Response(200, json=await self.responses.get())
+
+def instances(*states):
+    return [{"url": url, "weight": weight, "healthy": healthy} for url, weight, healthy in states]
+
+def test_resolve_balances_over_the_watched_healthy_instances():
+    async def scenario():
+        gateway = FakeGateway()
+        discovery = ServiceDiscovery("http://gateway:8000", retry_interval=0, transport=httpx.MockTransport(gateway))
+        gateway.responses.put_nowait({"version": "e.1", "snapshot": {
+            "character_service": {"url": "http://a:8000", "instances": instances(
+                ("http://a:8000", 1, True), ("http://b:8000", 3, True), ("http://c:8000", 5, False),
+            )},
+        }})
+        picks = Counter([await discovery.resolve("character_service") for _ in range(400)])
+        assert set(picks) == {"http://a:8000", "http://b:8000"}
+        assert picks["http://b:8000"] > picks["http://a:8000"]
+        assert gateway.requests == [None, "e.1"]  # One snapshot, then the watch waits.
+
+        with pytest.raises(HTTPException) as e:
+            await discovery.resolve("unknown_service")
+        assert e.value.status_code == 503 and len(gateway.requests) == 2
+
+        # Changes replace a service's instances; a deleted service resolves no more.
+        gateway.responses.put_nowait({"version": "e.2", "changes": [
+            {"version": "e.2", "service_name": "character_service", "url": "http://a:8000",
+             "instances": instances(("http://a:8000", 1, False), ("http://c:8000", 5, True))},
+        ]})
+        while discovery.version != "e.2":
+            await asyncio.sleep(0)
+        assert {await discovery.resolve("character_service") for _ in range(20)} == {"http://c:8000"}
+        gateway.responses.put_nowait({"version": "e.3", "changes": [
+            {"version": "e.3", "service_name": "character_service", "url": None, "instances": []},
+        ]})
+        while discovery.version != "e.3":
+            await asyncio.sleep(0)
+        with pytest.raises(HTTPException):
+            await discovery.resolve("character_service")
+        await discovery.aclose()
+
+    asyncio.run(scenario())
+
+def test_resolve_serves_the_last_known_instances_until_stale():
+    async def scenario():
+        gateway = FakeGateway()
+        discovery = ServiceDiscovery("http://gateway:8000", retry_interval=0.01, stale_ttl=300, timeout=0.05,
+                                     transport=httpx.MockTransport(gateway))
+        gateway.up = False
+        with pytest.raises(HTTPException):  # Nothing loaded yet.
+            await discovery.resolve("character_service")
+
+        gateway.up = True
+        gateway.responses.put_nowait({"version": "e.1", "snapshot": {
+            "character_service": {"url": "http://a:8000", "instances": []},
+        }})
+        while discovery.version is None:
+            await asyncio.sleep(0.01)
+        gateway.up = False
+        await asyncio.sleep(0.05)
+        assert await discovery.resolve("character_service") == "http://a:8000"
+
+        discovery._synced_at -= 301
+        with pytest.raises(HTTPException):
+            await discovery.resolve("character_service")
+        await discovery.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,21 @@
+from fountainai_common.http_cache import CachedResponse, ResponseCache, etag_matches
+
+def test_etag_matches_compares_weakly_and_understands_lists_and_star():
+    assert etag_matches('"v1"', '"v1"')
+    assert etag_matches('W/"v1"', '"v1"') and etag_matches('"v1"', 'W/"v1"')
+    assert etag_matches('"v0", W/"v1"', '"v1"')
+    assert etag_matches("*", '"v1"')
+    assert not etag_matches('"v2"', '"v1"')
+    assert not etag_matches(None, '"v1"') and not etag_matches('"v1"', None)
+
+def test_response_cache_ttls_public_routes_and_byte_bound():
+    cache = ResponseCache(max_bytes=100, route_ttls={"stories": 30, "stories/drafts": 5}, public_routes=["/stories/"])
+    assert cache.ttl_for("stories/1", {}) == 30 and cache.ttl_for("stories/drafts/1", {}) == 5
+    assert cache.ttl_for("stories/1", {}, route_ttl=1) == 1
+    assert cache.ttl_for("stories/1", {"cache-control": "max-age=7"}) == 7
+    assert cache.ttl_for("stories/1", {"cache-control": "private"}, shared=True) is None
+    assert cache.is_public("stories/1") and not cache.is_public("storyboards")
+
+    for n in range(3):
+        cache.put(("stories", str(n)), CachedResponse(200, {}, b"x" * 40, 30))
+    assert cache.get(("stories", "0")) is None and cache.get(("stories", "2")) is not None
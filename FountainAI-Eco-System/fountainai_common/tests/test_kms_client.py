@@ -0,0 +1,75 @@
+import httpx
+import pytest
+
+from fountainai_common.kms_client import KMSClient, KeyNotFoundError
+
+class FakeKMS:
+    """Just enough of kms-app's GET /keys/{service_name} and GET /keys/events."""
+
+    def __init__(self):
+        self.keys = {"search": ("key-1", '"v1"')}
+        self.version = "e.1"
+        self.requests = []
+        self.failing = False
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.url.path, request.headers.get("if-none-match")))
+        if request.url.path == "/keys/events":
+            return httpx.Response(200, json={
+                "version": self.version, "snapshot": {name: etag for name, (_, etag) in self.keys.items()},
+            })
+        if self.failing:
+            return httpx.Response(503)
+        name = request.url.path.rsplit("/", 1)[1]
+        if name not in self.keys:
+            return httpx.Response(404, json={"detail": "Key not found"})
+        api_key, etag = self.keys[name]
+        headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, json={"api_key": api_key}, headers=headers)
+
+@pytest.fixture
+def kms():
+    backend = FakeKMS()
+    client = KMSClient(http=httpx.Client(base_url="http://kms", transport=httpx.MockTransport(backend)), token="t")
+    client.backend = backend
+    yield client
+    client.close()
+
+def test_get_key_is_cached_then_revalidated_with_its_etag(kms):
+    assert kms.get_key("search") == "key-1"
+    assert kms.get_key("search") == "key-1"
+    assert kms.backend.requests == [("/keys/search", None)]
+
+    kms._cache["search"] = kms._cache["search"][:2] + (0,)
+    assert kms.get_key("search") == "key-1"
+    assert kms.backend.requests[-1] == ("/keys/search", '"v1"')
+
+    with pytest.raises(KeyNotFoundError):
+        kms.get_key("missing")
+
+def test_events_refresh_rotated_keys_and_notify(kms):
+    seen = []
+    kms.on_rotate(lambda name, api_key: seen.append((name, api_key)))
+    kms.get_key("search")
+    kms.poll_events()
+    assert seen == [] and kms.version == "e.1"
+
+    # A rotation whose key cannot be fetched yet is neither skipped nor forgotten: the
+    # version stays put and the old key is kept until the refresh succeeds.
+    kms.backend.keys["search"] = ("key-2", '"v2"')
+    kms.backend.version = "e.2"
+    kms.backend.failing = True
+    with pytest.raises(httpx.HTTPStatusError):
+        kms.poll_events()
+    assert seen == [] and kms.version == "e.1" and kms._cache["search"][0] == "key-1"
+    kms.backend.failing = False
+    kms.poll_events()
+    assert seen == [("search", "key-2")] and kms.get_key("search") == "key-2"
+    assert kms.version == "e.2"
+
+    del kms.backend.keys["search"]
+    kms.backend.version = "e.3"
+    kms.poll_events()
+    assert seen[-1] == ("search", None)
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from fountainai_common.resilience import LatencyTracker, RetryBudget, ServiceGuard, with_retries
+
+class Call:
+    def __init__(self, status_code: int):
+        self.response = httpx.Response(status_code)
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+def test_with_retries_repeats_idempotent_calls_within_the_budget():
+    async def scenario():
+        calls = []
+
+        async def attempt():
+            calls.append(Call(503 if len(calls) < 2 else 200))
+            return calls[-1]
+
+        budget, tracker = RetryBudget(ratio=0, min_per_second=10), LatencyTracker()
+        call = await with_retries("svc", "GET", None, attempt, budget, tracker, backoff_base=0)
+        assert call.response.status_code == 200 and [c.closed for c in calls] == [True, True, False]
+
+        # Not replayable: a streamed body is sent once, whatever the answer.
+        calls.clear()
+        call = await with_retries("svc", "PUT", iter([b"x"]), attempt, budget, tracker, backoff_base=0)
+        assert call.response.status_code == 503 and len(calls) == 1
+
+        # An empty budget stops retries of transport failures too.
+        async def unreachable():
+            raise HTTPException(status_code=502, detail="Bad Gateway")
+
+        with pytest.raises(HTTPException):
+            await with_retries("svc", "GET", None, unreachable, RetryBudget(ratio=0, min_per_second=0), tracker)
+
+    asyncio.run(scenario())
+
+def test_service_guard_opens_after_consecutive_failures_and_caps_in_flight():
+    guard = ServiceGuard("svc", failure_threshold=2, reset_timeout=60, max_in_flight=1)
+    assert guard.try_acquire() is None
+    assert guard.try_acquire() == "bulkhead_full"
+    guard.release()
+    guard.record_failure()
+    guard.record_failure()
+    assert guard.state == ServiceGuard.OPEN and guard.try_acquire() == "circuit_open"
@@ -0,0 +1,109 @@
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from fountainai_common import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    exporter = tracing.SpanExporter(mode="file", path=str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "span_exporter", exporter)
+    return exporter
+
+def exported(exporter):
+    exporter.flush()
+    with open(exporter.path) as f:
+        return [
+            span
+            for line in f
+            for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        ]
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    return app
+
+def test_parse_traceparent_rejects_malformed_and_all_zero_ids():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-01") == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+    assert tracing.parse_traceparent("00-00000000000000000000000000000000-b7ad6b7169203331-01") is None
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-b7ad6b7169203331-01-extra") is None
+    assert tracing.parse_traceparent(None) is None
+
+def test_middleware_continues_traceparent_and_exports_server_span(exporter):
+    client = TestClient(make_app())
+    response = client.get("/items/7", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.status_code == 200
+    _, trace_id, span_id, _ = response.headers["traceresponse"].split("-")
+    assert trace_id == TRACE_ID
+
+    [span] = exported(exporter)
+    assert span["name"] == "GET /items/{item_id}"
+    assert (span["traceId"], span["spanId"], span["parentSpanId"]) == (TRACE_ID, span_id, "00f067aa0ba902b7")
+    assert span["kind"] == tracing.SPAN_KINDS["server"]
+
+    # Exemplars need the OpenMetrics exposition format.
+    metrics = client.get("/metrics", headers={"Accept": "application/openmetrics-text"})
+    assert metrics.headers["content-type"].startswith("application/openmetrics-text")
+    assert f'# {{trace_id="{TRACE_ID}"}}' in metrics.text
+
+def test_configure_replaces_exporter_and_sampling(monkeypatch, tmp_path):
+    for name in ("TRACING_ENABLED", "TRACE_SERVICE_NAME", "TRACE_SAMPLE_RATIO", "TRACE_STATEMENT_MAX_LENGTH", "span_exporter"):
+        monkeypatch.setattr(tracing, name, getattr(tracing, name))
+    tracing.configure(service_name="svc", exporter="file", path=str(tmp_path / "t.jsonl"), sample_ratio=0.0)
+    assert (tracing.span_exporter.mode, tracing.span_exporter.path) == ("file", str(tmp_path / "t.jsonl"))
+    with tracing.Span("unsampled") as span:
+        pass
+    assert span.sampled is False
+    assert tracing.span_exporter.payload([])["resourceSpans"][0]["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+
+def test_client_hooks_inject_child_traceparent(exporter):
+    sent = []
+    def backend(request: httpx.Request) -> httpx.Response:
+        sent.append(request.headers.get("traceparent"))
+        return httpx.Response(503)
+
+    with httpx.Client(transport=httpx.MockTransport(backend), event_hooks={
+        "request": [tracing.start_client_span], "response": [tracing.end_client_span],
+    }) as client:
+        client.get("http://untraced/")  # No current span: nothing to continue.
+        with tracing.Span("parent") as parent:
+            client.get("http://backend/path?q=1")
+
+    assert sent[0] is None
+    _, trace_id, span_id, _ = sent[1].split("-")
+    spans = {span["spanId"]: span for span in exported(exporter)}
+    outbound = spans[span_id]
+    assert (trace_id, outbound["parentSpanId"]) == (parent.trace_id, parent.span_id)
+    assert outbound["name"] == "GET backend"
+    assert outbound["status"]["message"] == "HTTP 503"
+
+def test_trace_engine_times_statements_under_the_current_span(exporter, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_STATEMENT_MAX_LENGTH", 10)
+    engine = create_engine("sqlite://")
+    tracing.trace_engine(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # Outside a span: not traced.
+        with tracing.Span("request") as parent:
+            conn.execute(text("SELECT 1 + 1"))
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing"))
+
+    query, failed = [span for span in exported(exporter) if span["spanId"] != parent.span_id]
+    assert query["parentSpanId"] == parent.span_id
+    assert query["name"] == "SELECT sqlite"
+    statement = next(a for a in query["attributes"] if a["key"] == "db.statement")
+    assert statement["value"] == {"stringValue": "SELECT 1 +"}
+    assert "no such table" in failed["status"]["message"]
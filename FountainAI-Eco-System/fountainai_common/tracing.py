@@ -0,0 +1,406 @@
+"""
+fountainai_common.tracing
+
+W3C Trace Context propagation and OTLP/JSON span export shared by every service.
+
+Features:
+  - TracingMiddleware opens a server span per request, continuing an incoming `traceparent`
+    and answering with `traceresponse`; latency lands in `http_server_duration_seconds`
+    with the trace id as exemplar.
+  - TRACE_HOOKS (httpx event hooks) open a client span per outgoing call and inject its
+    `traceparent`; trace_engine() does the same for every SQL statement on an engine.
+  - Spans are batched and exported from a background thread to a file or an OTLP/HTTP
+    collector, so requests never wait on the exporter.
+
+Usage:
+    from fountainai_common import tracing
+    tracing.configure(service_name="action_service", exporter=TRACE_EXPORTER, ...)
+    app.add_middleware(tracing.TracingMiddleware)
+    ...
+    tracing.span_exporter.start()
+
+configure() is called by each service once its own .env is loaded; until then tracing is
+enabled with export switched off.
+"""
+
+import json
+import logging
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import Response
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.openmetrics.exposition import (
+    CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE,
+    generate_latest as generate_openmetrics,
+)
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = True
+TRACE_SERVICE_NAME = "fountainai"
+TRACE_SAMPLE_RATIO = 1.0
+TRACE_STATEMENT_MAX_LENGTH = 1024
+
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+TRACE_SPANS_EXPORTED = Counter(
+    "trace_spans_exported_total", "Sampled spans handed to the trace exporter", ["outcome"]
+)
+HTTP_SERVER_DURATION = Histogram(
+    "http_server_duration_seconds",
+    "Request latency as seen by the tracing middleware; exemplars carry the trace id",
+    ["method", "handler", "status"],
+)
+
+current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return (trace_id, parent_id, sampled) from a `traceparent` header, or None if it is invalid."""
+    match = TRACEPARENT_RE.match(value.strip().lower()) if value else None
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest) or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+def otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+class Span:
+    """
+    One timed operation of a trace. A span continues `remote` (a parsed `traceparent`) when
+    given, else becomes a child of the current span, else starts a new trace sampled with
+    TRACE_SAMPLE_RATIO. Used as a context manager it is the current span for its body.
+    Unsampled spans still propagate context but are never exported.
+    """
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_id", "sampled", "tracestate",
+        "attributes", "error", "start_ns", "end_ns", "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[dict] = None,
+        remote: Optional[Tuple[str, str, bool]] = None,
+        tracestate: Optional[str] = None,
+    ):
+        parent = current_span.get()
+        if remote is not None:
+            self.trace_id, self.parent_id, self.sampled = remote
+            self.tracestate = tracestate
+        elif parent is not None:
+            self.trace_id, self.parent_id, self.sampled = parent.trace_id, parent.span_id, parent.sampled
+            self.tracestate = parent.tracestate
+        else:
+            self.trace_id, self.parent_id = secrets.token_hex(16), None
+            self.sampled = random.random() < TRACE_SAMPLE_RATIO
+            self.tracestate = None
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._token = None
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def record_exception(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                span_exporter.export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        current_span.reset(self._token)
+        self.end()
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.tracestate:
+            span["traceState"] = self.tracestate
+        return span
+
+def trace_exemplar() -> Optional[Dict[str, str]]:
+    """Exemplar labels tying a histogram observation to the current sampled trace."""
+    span = current_span.get()
+    return {"trace_id": span.trace_id} if span is not None and span.sampled else None
+
+class SpanExporter:
+    """
+    Batches finished spans and ships them as OTLP/JSON from a background thread, so requests
+    never wait on the collector. `file` appends one ExportTraceServiceRequest per line (what
+    the collector's otlpjsonfile receiver reads); `otlp` POSTs the same payload to an
+    OTLP/HTTP endpoint. Spans arriving while the queue is full are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        mode: str = "none",
+        path: str = "./traces.jsonl",
+        endpoint: str = "http://otel-collector:4318/v1/traces",
+        interval: float = 2.0,
+        max_queue: int = 4096,
+    ):
+        self.mode = mode
+        self.path = path
+        self.endpoint = endpoint
+        self.interval = interval
+        self.max_queue = max_queue
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, span: Span):
+        if self.mode == "none":
+            return
+        if len(self._queue) >= self.max_queue:
+            TRACE_SPANS_EXPORTED.labels(outcome="dropped").inc()
+            return
+        self._queue.append(span)
+
+    def payload(self, spans: List[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": TRACE_SERVICE_NAME}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+
+    def flush(self):
+        with self._lock:
+            spans = []
+            while self._queue:
+                spans.append(self._queue.popleft())
+            if not spans:
+                return
+            body = json.dumps(self.payload(spans))
+            try:
+                if self.mode == "file":
+                    with open(self.path, "a") as f:
+                        f.write(body + "\n")
+                else:
+                    request = urllib.request.Request(
+                        self.endpoint, data=body.encode(), headers={"Content-Type": "application/json"}
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+                outcome = "exported"
+            except (OSError, ValueError) as e:
+                logger.warning("Exporting %d spans failed: %s", len(spans), e)
+                outcome = "failed"
+            TRACE_SPANS_EXPORTED.labels(outcome=outcome).inc(len(spans))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self.mode != "none" and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+span_exporter = SpanExporter()
+
+def configure(
+    service_name: str,
+    enabled: bool = True,
+    exporter: str = "none",
+    path: str = "./traces.jsonl",
+    endpoint: str = "http://otel-collector:4318/v1/traces",
+    sample_ratio: float = 1.0,
+    export_interval: float = 2.0,
+    max_queue: int = 4096,
+    statement_max_length: int = 1024,
+):
+    """Apply a service's TRACE_* settings and replace the (not yet started) span exporter."""
+    global TRACING_ENABLED, TRACE_SERVICE_NAME, TRACE_SAMPLE_RATIO, TRACE_STATEMENT_MAX_LENGTH, span_exporter
+    TRACING_ENABLED = enabled
+    TRACE_SERVICE_NAME = service_name
+    TRACE_SAMPLE_RATIO = sample_ratio
+    TRACE_STATEMENT_MAX_LENGTH = statement_max_length
+    span_exporter = SpanExporter(exporter, path, endpoint, export_interval, max_queue)
+
+def route_template(scope) -> str:
+    """The path template of the route serving `scope`, which keeps metric labels bounded."""
+    for route in getattr(scope.get("app"), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening a server span per request. A valid incoming `traceparent`
+    is continued; the span's own id is returned in `traceresponse`. Latency is observed in
+    `http_server_duration_seconds` with the trace id as exemplar, and /metrics is served in
+    the OpenMetrics format (the only one that carries exemplars) when the scraper asks for it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if scope["path"] == "/metrics":
+            if "application/openmetrics-text" in headers.get("accept", ""):
+                response = Response(generate_openmetrics(REGISTRY), media_type=OPENMETRICS_CONTENT_TYPE)
+                await response(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        span = Span(
+            f"{method} {scope['path']}",
+            kind="server",
+            attributes={"http.method": method, "http.target": scope["path"]},
+            remote=parse_traceparent(headers.get("traceparent")),
+            tracestate=headers.get("tracestate"),
+        )
+        status_code = 500
+
+        async def send_traced(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("traceresponse", span.traceparent())
+            await send(message)
+
+        started = time.perf_counter()
+        with span:
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                handler = route_template(scope)
+                span.name = f"{method} {handler}"
+                span.attributes["http.route"] = handler
+                span.attributes["http.status_code"] = status_code
+                if status_code >= 500 and span.error is None:
+                    span.error = f"HTTP {status_code}"
+                HTTP_SERVER_DURATION.labels(method=method, handler=handler, status=str(status_code)).observe(
+                    time.perf_counter() - started, exemplar=trace_exemplar()
+                )
+
+def start_client_span(request: httpx.Request):
+    """httpx request hook: open a child span for the call and inject its `traceparent`."""
+    if not TRACING_ENABLED or current_span.get() is None:
+        return
+    span = Span(
+        f"{request.method} {request.url.host}",
+        kind="client",
+        attributes={
+            "http.method": request.method,
+            "http.url": str(request.url.copy_with(query=None)),
+            "net.peer.name": request.url.host,
+        },
+    )
+    request.headers["traceparent"] = span.traceparent()
+    if span.tracestate:
+        request.headers["tracestate"] = span.tracestate
+    request.extensions["trace_span"] = span
+
+def end_client_span(response: httpx.Response):
+    """httpx response hook: close the call's span once the response headers arrive."""
+    span = response.request.extensions.get("trace_span")
+    if span is None:
+        return
+    span.attributes["http.status_code"] = response.status_code
+    if response.status_code >= 500:
+        span.error = f"HTTP {response.status_code}"
+    span.end()
+
+async def trace_request(request: httpx.Request):
+    start_client_span(request)
+
+async def trace_response(response: httpx.Response):
+    end_client_span(response)
+
+TRACE_HOOKS = {"request": [trace_request], "response": [trace_response]}
+
+def trace_engine(engine):
+    """Time every statement executed on `engine` as a child span of the current span."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_span(conn, cursor, statement, parameters, context, executemany):
+        if not TRACING_ENABLED or context is None or current_span.get() is None:
+            return
+        operation = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+        context._trace_span = Span(
+            f"{operation} {engine.url.get_backend_name()}",
+            kind="client",
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.operation": operation,
+                "db.statement": statement[:TRACE_STATEMENT_MAX_LENGTH],
+            },
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query_span(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.attributes["db.rows_affected"] = cursor.rowcount
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def fail_query_span(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
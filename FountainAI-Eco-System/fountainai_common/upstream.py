@@ -0,0 +1,258 @@
+"""
+fountainai_common.upstream
+
+Connections from the gateways to the backend instances they proxy to.
+
+Features:
+  - UpstreamPool keeps one long-lived httpx.AsyncClient per backend, so proxied requests
+    reuse keep-alive connections, and reports pool utilisation and connection wait time.
+  - Requests can be streamed: the connection stays checked out until the response is
+    closed, so bodies are relayed without buffering them.
+  - HealthChecker polls each instance's health endpoint in the background and ejects
+    instances that fail or answer too slowly until they recover.
+
+Usage:
+    upstream_pool = UpstreamPool(max_connections=100)
+    response = await upstream_pool.stream("search", "GET", "http://search:8000/items")
+    await upstream_pool.close_stream("search", response)
+
+    health_checker = HealthChecker(path="/health", on_change=publish)
+    health_checker.start(load_targets)      # async () -> [(service_name, url), ...]
+    if health_checker.is_healthy("search", "http://search:8000"): ...
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from fountainai_common.tracing import TRACE_HOOKS, trace_exemplar
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_POOL_IN_USE = Gauge(
+    "gateway_upstream_pool_in_use", "Upstream connections currently checked out", ["backend"]
+)
+UPSTREAM_POOL_LIMIT = Gauge(
+    "gateway_upstream_pool_max_connections", "Configured upstream connection limit", ["backend"]
+)
+UPSTREAM_POOL_WAIT = Histogram(
+    "gateway_upstream_pool_wait_seconds", "Time spent waiting for a free upstream connection", ["backend"]
+)
+
+class UpstreamPool:
+    """
+    One long-lived httpx.AsyncClient per backend, so forwarded requests reuse
+    keep-alive connections. A semaphore sized to the connection limit exposes
+    pool utilisation and connection wait time as metrics.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30,
+        http2: bool = False,
+        timeout: float = 30,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_connections = max_connections
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 is enabled but 'h2' is not installed; using HTTP/1.1.")
+                self.http2 = False
+        self.timeout = timeout
+        self.transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def client_for(self, backend: str) -> httpx.AsyncClient:
+        client = self._clients.get(backend)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=self.timeout,
+                transport=self.transport,
+                event_hooks=TRACE_HOOKS,
+            )
+            self._clients[backend] = client
+            self._slots[backend] = asyncio.Semaphore(self.max_connections)
+            UPSTREAM_POOL_LIMIT.labels(backend=backend).set(self.max_connections)
+        return client
+
+    async def _acquire(self, backend: str):
+        slot = self._slots[backend]
+        started = time.perf_counter()
+        await slot.acquire()
+        UPSTREAM_POOL_WAIT.labels(backend=backend).observe(
+            time.perf_counter() - started, exemplar=trace_exemplar()
+        )
+        UPSTREAM_POOL_IN_USE.labels(backend=backend).inc()
+
+    def _release(self, backend: str):
+        UPSTREAM_POOL_IN_USE.labels(backend=backend).dec()
+        self._slots[backend].release()
+
+    async def request(self, backend: str, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.client_for(backend)
+        await self._acquire(backend)
+        try:
+            return await client.request(method, url, **kwargs)
+        finally:
+            self._release(backend)
+
+    async def stream(self, backend: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request and return as soon as the response headers arrive.
+        The connection stays checked out until close_stream() is called.
+        """
+        client = self.client_for(backend)
+        await self._acquire(backend)
+        try:
+            upstream_request = client.build_request(method, url, **kwargs)
+            return await client.send(upstream_request, stream=True)
+        except BaseException:
+            self._release(backend)
+            raise
+
+    async def close_stream(self, backend: str, response: httpx.Response):
+        try:
+            await response.aclose()
+        finally:
+            self._release(backend)
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._slots.clear()
+
+BACKEND_HEALTHY = Gauge(
+    "gateway_backend_healthy", "1 if the instance is admitted to receive traffic, 0 if ejected", ["service", "instance"]
+)
+BACKEND_EJECTIONS = Counter(
+    "gateway_backend_ejections_total", "Instances ejected by the active health checker", ["service", "instance"]
+)
+
+class HealthChecker:
+    """
+    Polls every backend instance's health endpoint in the background.
+
+    An instance is ejected after `unhealthy_threshold` consecutive checks that fail
+    or take longer than `max_latency` seconds, and re-admitted after
+    `healthy_threshold` consecutive good checks. Instances start out admitted, and
+    `on_change(service_name)` is called whenever one is ejected or re-admitted.
+    Probes use their own client rather than the upstream pool, so a busy but healthy
+    instance is not ejected for the time its probe spent queued behind proxied traffic.
+    """
+
+    def __init__(
+        self,
+        path: str = "/health",
+        interval: float = 10,
+        timeout: float = 2,
+        max_latency: float = 1.0,
+        unhealthy_threshold: int = 3,
+        healthy_threshold: int = 2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        on_change: Optional[Callable[[str], None]] = None,
+    ):
+        self.path = path
+        self.interval = interval
+        self.timeout = timeout
+        self.max_latency = max_latency
+        self.unhealthy_threshold = unhealthy_threshold
+        self.healthy_threshold = healthy_threshold
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._successes: Dict[Tuple[str, str], int] = {}
+        self._ejected = set()
+        self.transport = transport
+        self.on_change = on_change
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=self.transport)
+        return self._client
+
+    def is_healthy(self, service_name: str, url: str) -> bool:
+        return (service_name, url) not in self._ejected
+
+    def record(self, service_name: str, url: str, ok: bool):
+        key = (service_name, url)
+        if ok:
+            self._failures[key] = 0
+            self._successes[key] = self._successes.get(key, 0) + 1
+            if key in self._ejected and self._successes[key] >= self.healthy_threshold:
+                self._ejected.discard(key)
+                BACKEND_HEALTHY.labels(service=service_name, instance=url).set(1)
+                logger.info("Re-admitted %s instance %s", service_name, url)
+                if self.on_change is not None:
+                    self.on_change(service_name)
+        else:
+            self._successes[key] = 0
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if key not in self._ejected and self._failures[key] >= self.unhealthy_threshold:
+                self._ejected.add(key)
+                BACKEND_HEALTHY.labels(service=service_name, instance=url).set(0)
+                BACKEND_EJECTIONS.labels(service=service_name, instance=url).inc()
+                logger.warning("Ejected %s instance %s after %d failed checks", service_name, url, self._failures[key])
+                if self.on_change is not None:
+                    self.on_change(service_name)
+
+    async def check(self, service_name: str, url: str):
+        started = time.perf_counter()
+        try:
+            response = await self._http().get(f"{url.rstrip('/')}{self.path}")
+            ok = response.status_code == 200 and time.perf_counter() - started <= self.max_latency
+        except httpx.HTTPError:
+            ok = False
+        self.record(service_name, url, ok)
+
+    async def run_once(self, targets: List[Tuple[str, str]]):
+        known = set(targets)
+        for state in (self._failures, self._successes):
+            for key in [k for k in state if k not in known]:
+                del state[key]
+        self._ejected &= known
+        for service_name, url in targets:
+            if self.is_healthy(service_name, url):
+                BACKEND_HEALTHY.labels(service=service_name, instance=url).set(1)
+        await asyncio.gather(*(self.check(service_name, url) for service_name, url in targets))
+
+    async def _run(self, load_targets: Callable[[], Awaitable[List[Tuple[str, str]]]]):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once(await load_targets())
+            except Exception as e:
+                logger.error("Health check round failed: %s", e)
+
+    def start(self, load_targets: Callable[[], Awaitable[List[Tuple[str, str]]]]):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(load_targets))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
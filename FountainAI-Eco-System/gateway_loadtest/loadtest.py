@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+FountainAI Gateway Load Test
+----------------------------
+
+Boots either gateway (central_gateway or api_gateway) in-process against a stub
+backend with configurable latency, payload size and error rate, drives it with N
+concurrent clients and reports throughput (RPS), latency percentiles (p50/p95/p99)
+and peak memory. Results can be saved as a baseline and later runs compared
+against it, exiting non-zero on a regression so CI can gate on it.
+
+The stub backend is an httpx.MockTransport installed into the gateway's shared
+upstream pool, so the full gateway path (auth, routing, guards, balancing,
+streaming, compression) is exercised without network or Docker.
+
+Usage Examples:
+  # 2000 GETs from 50 clients through central_gateway, 5 ms backend latency:
+  python loadtest.py --gateway central --clients 50 --requests 2000 --latency-ms 5
+
+  # Record a baseline, then fail if a later run regresses by more than 15%:
+  python loadtest.py --gateway api --write-baseline baseline.json
+  python loadtest.py --gateway api --baseline baseline.json --tolerance 0.15
+
+Options:
+  --gateway         central or api (default: central).
+  --clients         Concurrent clients (default: 20).
+  --requests        Measured requests in total (default: 1000).
+  --warmup          Unmeasured requests sent first (default: 100).
+  --method          HTTP method of each request (default: GET).
+  --latency-ms      Stub backend latency in milliseconds (default: 0).
+  --payload-bytes   Stub backend JSON response size in bytes (default: 1024).
+  --error-rate      Share of stub responses that are 500s, 0..1 (default: 0).
+  --seed            Random seed for the stub's error injection (default: 1).
+  --scenario        Baseline key (default: derived from the options above).
+  --baseline        Compare with this baseline file; exit 1 on regression.
+  --tolerance       Allowed relative regression (default: 0.15).
+  --write-baseline  Save (or update) this run's result in the given file.
+  --json            Print the result as JSON instead of a table.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import importlib.util
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+import httpx
+from jose import jwt
+
+ECOSYSTEM_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GATEWAYS = {
+    "central": os.path.join(ECOSYSTEM_ROOT, "central_gateway", "main.py"),
+    "api": os.path.join(ECOSYSTEM_ROOT, "api_gateway", "main.py"),
+}
+STUB_SERVICE = "stub"
+STUB_URL = "http://stub_backend:8000"
+
+# Metrics where lower is better; everything else in REGRESSION_METRICS is higher-is-better.
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "max_rss_mb"}
+# Ratios in 0..1 whose shortfall from 1 (e.g. the failure share) is held to the tolerance.
+RATIOS = {"success_ratio"}
+REGRESSION_METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "max_rss_mb", "success_ratio")
+
+def stub_backend(latency_ms: float, payload_bytes: int, error_rate: float, seed: int):
+    """Return an async httpx.MockTransport handler emulating a backend service."""
+    rng = random.Random(seed)
+    # {"data": "xxx..."} sized to roughly payload_bytes once serialised.
+    body = json.dumps({"data": "x" * max(0, payload_bytes - 12)}).encode()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "healthy"})
+        if rng.random() < error_rate:
+            return httpx.Response(500, json={"detail": "injected error"})
+        return httpx.Response(200, content=body, headers={"content-type": "application/json"})
+
+    return handler
+
+def load_gateway(name: str, workdir: str):
+    """
+    Import a gateway's main.py as a fresh module, configured for benchmarking:
+    background health checks and route reloads off, registry in a scratch database.
+    Gateways register Prometheus metrics globally, so load one gateway per process.
+    """
+    os.environ.setdefault("HEALTH_CHECK_ENABLED", "false")
+    os.environ.setdefault("ROUTES_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("ROUTES_FILE", os.path.join(workdir, "routes.json"))
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'registry.db')}")
+    # Configure logging first so the gateway's own basicConfig() is a no-op: per-request
+    # INFO logs would dominate the measurement, and stdout is reserved for the report.
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+    # Gateways import the shared fountainai_common package from the ecosystem root.
+    if ECOSYSTEM_ROOT not in sys.path:
+        sys.path.insert(0, ECOSYSTEM_ROOT)
+    spec =importlib.util.spec_from_file_location(f"{name}_gateway_main", GATEWAYS[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def prepare_gateway(name: str, module, handler):
+    """Point the gateway at the stub backend. Returns (path prefix, request kwargs) for the client."""
+    module.upstream_pool = module.UpstreamPool(transport=httpx.MockTransport(handler))
+    if name == "central":
+        db = module.SessionLocal()
+        try:
+            db.query(module.ServiceRegistry).filter(module.ServiceRegistry.service_name == STUB_SERVICE).delete()
+            db.add(module.ServiceRegistry(service_name=STUB_SERVICE, url=STUB_URL))
+            db.commit()
+        finally:
+            db.close()
+        token = jwt.encode({"sub": "loadtest", "role": "admin"}, module.JWT_SECRET, algorithm=module.JWT_ALGORITHM)
+        return f"/proxy/{STUB_SERVICE}", {"headers": {"Authorization": f"Bearer {token}"}}
+    module.set_routing_table(module.compile_routes({STUB_SERVICE: STUB_URL}))
+    token = jwt.encode({"sub": "loadtest", "username": "loadtest"}, module.SECRET_KEY, algorithm="HS256")
+    # api_gateway reads the bearer token from the 'authorization' query parameter.
+    return f"/{STUB_SERVICE}", {"params": {"authorization": f"Bearer {token}"}}
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def max_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+async def drive(client: httpx.AsyncClient, method: str, prefix: str, kwargs: dict, clients: int, total: int):
+    """Send `total` requests from `clients` concurrent workers; return (latencies, status counts, seconds)."""
+    latencies = []
+    statuses = {}
+    remaining = [total]
+
+    async def worker(worker_id: int):
+        sequence = 0
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            sequence += 1
+            path = f"{prefix}/items/{worker_id}-{sequence}"
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(clients)))
+    return latencies, statuses, time.perf_counter() - started
+
+async def run_benchmark(options) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        module = load_gateway(options.gateway, workdir)
+        handler = stub_backend(options.latency_ms, options.payload_bytes, options.error_rate, options.seed)
+        prefix, kwargs = prepare_gateway(options.gateway, module, handler)
+        await module.app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=module.app, base_url="http://gateway", timeout=60) as client:
+                if options.warmup:
+                    await drive(client, options.method, prefix, kwargs, options.clients, options.warmup)
+                latencies, statuses, elapsed = await drive(
+                    client, options.method, prefix, kwargs, options.clients, options.requests
+                )
+        finally:
+            await module.app.router.shutdown()
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "scenario": options.scenario,
+        "gateway": options.gateway,
+        "clients": options.clients,
+        "requests": options.requests,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_rss_mb": round(max_rss_mb(), 1),
+        "success_ratio": round(ok / len(latencies), 4) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+def find_regressions(result: dict, baseline: dict, tolerance: float):
+    """Return human-readable regressions of `result` against a baseline entry."""
+    regressions = []
+    for metric in REGRESSION_METRICS:
+        expected = baseline.get(metric)
+        actual = result.get(metric)
+        if not expected or actual is None:
+            continue
+        if metric in RATIOS:
+            limit = 1 - (1 - expected) * (1 + tolerance)
+            if actual < limit:
+                regressions.append(f"{metric}: {actual} < {limit:.4f} (baseline {expected})")
+        elif metric in LOWER_IS_BETTER:
+            limit = expected * (1 + tolerance)
+            if actual > limit:
+                regressions.append(f"{metric}: {actual} > {limit:.3f} (baseline {expected})")
+        else:
+            limit = expected * (1 - tolerance)
+            if actual < limit:
+                regressions.append(f"{metric}: {actual} < {limit:.3f} (baseline {expected})")
+    return regressions
+
+def read_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_baseline(path: str, result: dict):
+    baselines = read_baselines(path)
+    baselines[result["scenario"]] = {metric: result[metric] for metric in REGRESSION_METRICS}
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Baseline for '{result['scenario']}' written to {path}")
+
+def print_table(result: dict):
+    print(f"Scenario: {result['scenario']}")
+    print(f"  clients={result['clients']} requests={result['requests']} statuses={result['statuses']}")
+    print(f"  RPS:          {result['rps']}")
+    print(f"  p50/p95/p99:  {result['p50_ms']} / {result['p95_ms']} / {result['p99_ms']} ms")
+    print(f"  Max RSS:      {result['max_rss_mb']} MB")
+    print(f"  Success:      {result['success_ratio'] * 100:.2f}%")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a FountainAI gateway against stub backends.")
+    parser.add_argument("--gateway", choices=sorted(GATEWAYS), default="central")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--write-baseline")
+    parser.add_argument("--json", action="store_true")
+    options = parser.parse_args(argv)
+    if options.scenario is None:
+        options.scenario = (
+            f"{options.gateway}-{options.method.lower()}-c{options.clients}"
+            f"-{options.latency_ms:g}ms-{options.payload_bytes}b-err{options.error_rate:g}"
+        )
+    return options
+
+def main(argv=None) -> int:
+    options = parse_args(argv)
+    result = asyncio.run(run_benchmark(options))
+    if options.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_table(result)
+    if options.write_baseline:
+        write_baseline(options.write_baseline, result)
+    if options.baseline:
+        baseline = read_baselines(options.baseline).get(options.scenario)
+        if baseline is None:
+            print(f"No baseline for '{options.scenario}' in {options.baseline}; nothing to compare.")
+            return 0
+        regressions = find_regressions(result, baseline, options.tolerance)
+        if regressions:
+            print("Performance regression detected:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"Within {options.tolerance:.0%} of baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import subprocess
+
+import loadtest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loadtest.py")
+
+def run(*args):
+    # Each run imports a gateway, whose Prometheus metrics are process-global.
+    return subprocess.run([sys.executable, SCRIPT, *args], capture_output=True, text=True, timeout=300)
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 0.50) == 50
+    assert loadtest.percentile(values, 0.99) == 99
+    assert loadtest.percentile([], 0.5) == 0.0
+
+def test_find_regressions_respects_direction_and_tolerance():
+    baseline = {"rps": 1000, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "max_rss_mb": 100}
+    ok = {"rps": 900, "p50_ms": 11, "p95_ms": 22, "p99_ms": 33, "max_rss_mb": 110}
+    assert loadtest.find_regressions(ok, baseline, 0.15) == []
+    slow = {**ok, "rps": 800, "p99_ms": 40}
+    regressions = loadtest.find_regressions(slow, baseline, 0.15)
+    assert [r.split(":")[0] for r in regressions] == ["rps", "p99_ms"]
+
+def test_find_regressions_holds_the_failure_share_to_the_tolerance():
+    assert loadtest.find_regressions({"success_ratio": 0.999}, {"success_ratio": 1.0}, 0.15) != []
+    assert loadtest.find_regressions({"success_ratio": 0.78}, {"success_ratio": 0.8}, 0.15) == []
+    regressions = loadtest.find_regressions({"success_ratio": 0.7}, {"success_ratio": 0.8}, 0.15)
+    assert [r.split(":")[0] for r in regressions] == ["success_ratio"]
+
+def test_benchmark_runs_both_gateways_and_gates_on_baseline(tmp_path):
+    for gateway in ("central", "api"):
+        result = run("--gateway", gateway, "--requests", "50", "--warmup", "5", "--clients", "5",
+                     "--error-rate", "0.2", "--json")
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout)
+        assert sum(report["statuses"].values()) == 50
+        assert set(report["statuses"]) <= {"200", "500"}
+        assert report["rps"] > 0 and report["p50_ms"] <= report["p99_ms"]
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"gate": {"rps": 10 ** 9}}))
+    result = run("--requests", "20", "--warmup", "0", "--scenario", "gate", "--baseline", str(baseline))
+    assert result.returncode == 1
+    assert "rps" in result.stdout
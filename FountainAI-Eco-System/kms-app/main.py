@@ -6,6 +6,8 @@ Production-Grade FastAPI Application for Key Management Service API
 Features:
   - Centralized management of API keys for external services.
   - Endpoints to create, retrieve, revoke, and rotate API keys.
+  - Key reads carry ETag/Cache-Control; GET /keys/events streams create/rotate/revoke events
+    (long-poll or Server-Sent Events) so clients can cache keys and refresh them on rotation.
   - Endpoints secured by JWT-based Bearer Authentication requiring admin privileges.
   - Uses SQLAlchemy with SQLite for persistence.
   - Environment configuration via a .env file.
@@ -17,12 +19,16 @@ Note:
 """
 
 import os
+import hashlib
 import logging
+import json
 import secrets
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Tuple
 
-from fastapi import FastAPI, HTTPException, Depends, status, Path, Body
+from fastapi import FastAPI, HTTPException, Depends, status, Path, Body, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
@@ -34,14 +40,42 @@ from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 # Prometheus Instrumentator for monitoring
 from prometheus_fastapi_instrumentator import Instrumentator
-from jose import JWTError, jwt
+from prometheus_client import Gauge
+from jose import JWTError
+
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine
+from fountainai_common.auth import JWKSVerifier, RevocationList
+from fountainai_common.changefeed import ChangeFeed
+from fountainai_common.http_cache import etag_matches
 
 # -----------------------------------------------------------------------------
 # Load Environment Variables
 # -----------------------------------------------------------------------------
 load_dotenv()
 SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey")
+JWKS_URL = os.environ.get("JWKS_URL", "")  # e.g. http://fountainai-rbac:8001/.well-known/jwks.json
+JWKS_REFRESH_INTERVAL = float(os.environ.get("JWKS_REFRESH_INTERVAL", "300"))
+JWKS_MIN_REFETCH_INTERVAL = float(os.environ.get("JWKS_MIN_REFETCH_INTERVAL", "10"))
+JWKS_TIMEOUT = float(os.environ.get("JWKS_TIMEOUT", "2"))
+JWT_ACCEPT_HMAC = os.environ.get("JWT_ACCEPT_HMAC", "true").lower() == "true"
+REVOCATIONS_URL = os.environ.get("REVOCATIONS_URL", "")  # e.g. http://fountainai-rbac:8001/token/revocations
+REVOCATIONS_POLL_TIMEOUT = float(os.environ.get("REVOCATIONS_POLL_TIMEOUT", "30"))
+REVOCATIONS_RETRY_INTERVAL = float(os.environ.get("REVOCATIONS_RETRY_INTERVAL", "5"))
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./keys.db")
+KEY_CACHE_MAX_AGE = int(os.environ.get("KEY_CACHE_MAX_AGE", "60"))
+KEY_EVENTS_MAX_CHANGES = int(os.environ.get("KEY_EVENTS_MAX_CHANGES", "1000"))
+KEY_EVENTS_WATCH_TIMEOUT = float(os.environ.get("KEY_EVENTS_WATCH_TIMEOUT", "30"))
+KEY_EVENTS_KEEPALIVE = float(os.environ.get("KEY_EVENTS_KEEPALIVE", "15"))
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "kms-app")
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.environ.get("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.environ.get("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.environ.get("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.environ.get("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.environ.get("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.environ.get("TRACE_STATEMENT_MAX_LENGTH", "1024"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -49,10 +83,26 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./keys.db")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # Database Setup with SQLAlchemy
 # -----------------------------------------------------------------------------
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -83,6 +133,25 @@ def get_db():
     finally:
         db.close()
 
+# -----------------------------------------------------------------------------
+# Token Revocation (Change Stream from fountainai-rbac)
+# -----------------------------------------------------------------------------
+revocation_list = RevocationList(
+    url=REVOCATIONS_URL, poll_timeout=REVOCATIONS_POLL_TIMEOUT, retry_interval=REVOCATIONS_RETRY_INTERVAL
+)
+
+# -----------------------------------------------------------------------------
+# JWKS Verification (Asymmetric Tokens from fountainai-rbac)
+# -----------------------------------------------------------------------------
+jwks_verifier = JWKSVerifier(
+    url=JWKS_URL,
+    refresh_interval=JWKS_REFRESH_INTERVAL,
+    min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+    timeout=JWKS_TIMEOUT,
+    accept_hmac=JWT_ACCEPT_HMAC,
+    revocations=revocation_list,
+)
+
 # -----------------------------------------------------------------------------
 # Security Dependencies
 # -----------------------------------------------------------------------------
@@ -91,7 +160,7 @@ security = HTTPBearer()
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        payload = jwks_verifier.decode(token, SECRET_KEY, "HS256")
     except JWTError as e:
         logger.error("JWT decoding error: %s", e)
         raise HTTPException(
@@ -163,6 +232,76 @@ app.openapi = custom_openapi
 # -----------------------------------------------------------------------------
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+@app.on_event("startup")
+async def start_jwks_refresh():
+    jwks_verifier.start()
+
+@app.on_event("shutdown")
+async def stop_jwks_refresh():
+    jwks_verifier.stop()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    revocation_list.stop()
+
+# -----------------------------------------------------------------------------
+# Key Change Feed (for GET /keys/events)
+# -----------------------------------------------------------------------------
+KEY_EVENT_WATCHERS = Gauge("kms_key_event_watchers", "Clients currently watching key events", ["mode"])
+
+def key_etag(record: APIKey) -> str:
+    """Strong validator for a key read; changes whenever the key is rotated."""
+    return '"' + hashlib.sha256(f"{record.service_name}:{record.api_key}".encode()).hexdigest()[:32] + '"'
+
+key_feed = ChangeFeed(KEY_EVENTS_MAX_CHANGES)
+
+def key_snapshot(db: Session) -> Tuple[str, Dict[str, str]]:
+    """Current etag of every active key, plus the feed version it is at least as new as."""
+    version = key_feed.version
+    return version, {record.service_name: key_etag(record) for record in db.query(APIKey).filter(APIKey.revoked == False).all()}
+
+async def key_delta(since: Optional[str], db: Session) -> Dict[str, object]:
+    """{"version", "changes"} when deltas since `since` are available, else {"version", "snapshot"}."""
+    changes = key_feed.changes_since(since)
+    if changes is not None:
+        return {"version": changes[-1]["version"] if changes else since, "changes": changes}
+    version, snapshot = await run_in_threadpool(key_snapshot, db)
+    return {"version": version, "snapshot": snapshot}
+
+def sse_event(event: str, version: str, data) -> str:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def key_event_stream(request: Request, since: Optional[str], db: Session):
+    KEY_EVENT_WATCHERS.labels(mode="sse").inc()
+    try:
+        while True:
+            delta = await key_delta(since, db)
+            if "snapshot" in delta:
+                yield sse_event("snapshot", delta["version"], delta["snapshot"])
+            for change in delta.get("changes", []):
+                yield sse_event("change", change["version"], change)
+            since = delta["version"]
+            while not await key_feed.wait(since, KEY_EVENTS_KEEPALIVE):
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+    finally:
+        KEY_EVENT_WATCHERS.labels(mode="sse").dec()
+
 # -----------------------------------------------------------------------------
 # API Endpoints
 # -----------------------------------------------------------------------------
@@ -189,17 +328,68 @@ def create_api_key(key_create: KeyCreate = Body(...), db: Session = Depends(get_
     db.add(api_key_record)
     db.commit()
     db.refresh(api_key_record)
+    key_feed.publish({"service_name": api_key_record.service_name, "event": "created", "etag": key_etag(api_key_record)})
     logger.info("API key created for service %s", key_create.service_name)
     return KeyResponse(service_name=api_key_record.service_name, api_key=api_key_record.api_key)
 
+@app.get("/keys/events", tags=["Keys"], operation_id="watch_key_events")
+async def watch_key_events(
+    request: Request,
+    since: Optional[str] = None,
+    timeout: Optional[float] = None,
+    db: Session = Depends(get_db),
+    _: dict = Depends(require_admin),
+):
+    """
+    Watch key changes.
+
+    Long-polls: answers as soon as a key is created, rotated or revoked after
+    `since` (or after `timeout` seconds, capped by KEY_EVENTS_WATCH_TIMEOUT, with
+    no changes) with {"version", "changes": [{"version", "service_name", "event",
+    "etag"}]}. A {"version", "snapshot": {service_name: etag}} is returned instead
+    when `since` is omitted, too old or from before a restart. Versions are opaque
+    tokens; send back the last one seen. Clients sending `Accept: text/event-stream`
+    get the same data as Server-Sent Events, resumable via Last-Event-ID.
+    """
+    if "text/event-stream" in request.headers.get("accept", ""):
+        if since is None:
+            since = request.headers.get("last-event-id") or None
+        return StreamingResponse(
+            key_event_stream(request, since, db),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    if since is not None and key_feed.version == since:
+        wait = min(timeout or KEY_EVENTS_WATCH_TIMEOUT, KEY_EVENTS_WATCH_TIMEOUT)
+        KEY_EVENT_WATCHERS.labels(mode="long_poll").inc()
+        try:
+            await key_feed.wait(since, wait)
+        finally:
+            KEY_EVENT_WATCHERS.labels(mode="long_poll").dec()
+    return await key_delta(since, db)
+
 @app.get("/keys/{service_name}", response_model=KeyResponse, tags=["Keys"], operation_id="get_api_key")
-def get_api_key(service_name: str = Path(..., description="The name of the service."), db: Session = Depends(get_db), _: dict = Depends(require_admin)):
+def get_api_key(
+    request: Request,
+    response: Response,
+    service_name: str = Path(..., description="The name of the service."),
+    db: Session = Depends(get_db),
+    _: dict = Depends(require_admin),
+):
     """
     Retrieve an API key.
+
+    The response carries an ETag and `Cache-Control: private, max-age=KEY_CACHE_MAX_AGE`;
+    a request whose If-None-Match still matches gets 304 Not Modified.
     """
     key_record = db.query(APIKey).filter(APIKey.service_name == service_name, APIKey.revoked == False).first()
     if not key_record:
         raise HTTPException(status_code=404, detail="Key not found.")
+    etag = key_etag(key_record)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={KEY_CACHE_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return KeyResponse(service_name=key_record.service_name, api_key=key_record.api_key)
 
 @app.delete("/keys/{service_name}", status_code=status.HTTP_204_NO_CONTENT, tags=["Keys"], operation_id="revoke_api_key")
@@ -212,6 +402,7 @@ def revoke_api_key(service_name: str = Path(..., description="The name of the se
         raise HTTPException(status_code=404, detail="Key not found.")
     key_record.revoked = True
     db.commit()
+    key_feed.publish({"service_name": service_name, "event": "revoked", "etag": None})
     logger.info("API key for service %s revoked", service_name)
     return
 
@@ -228,6 +419,7 @@ def rotate_api_key(service_name: str = Path(..., description="The name of the se
     key_record.api_key = new_key
     db.commit()
     db.refresh(key_record)
+    key_feed.publish({"service_name": service_name, "event": "rotated", "etag": key_etag(key_record)})
     logger.info("API key for service %s rotated", service_name)
     return KeyResponse(service_name=key_record.service_name, api_key=key_record.api_key)
 
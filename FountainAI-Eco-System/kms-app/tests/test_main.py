@@ -1,12 +1,17 @@
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from jose import jwt
+from jose import JWTError, jwt
 
 # Import from our application.
+import main
 from main import app, Base, get_db, APIKey, SECRET_KEY
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 # Use an in-memory SQLite database.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
@@ -138,3 +143,81 @@ def test_security_admin_required():
     # Without token, should result in 403/401.
     assert response.status_code in (401, 403)
 
+def test_key_reads_carry_etag_and_revalidate_with_304():
+    headers = generate_admin_token()
+    create_key("serviceEtag", headers)
+    first = get_key("serviceEtag", headers)
+    assert first.headers["Cache-Control"] == "private, max-age=60"
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/keys/serviceEtag", headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+
+    rotate_key("serviceEtag", headers)
+    changed = client.get("/keys/serviceEtag", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+def test_key_events_report_rotations_and_revocations():
+    headers = generate_admin_token()
+    since = client.get("/keys/events", headers=headers).json()["version"]
+    create_key("serviceFeed", headers)
+    rotated = rotate_key("serviceFeed", headers).json()
+    revoke_key("serviceFeed", headers)
+
+    delta = client.get("/keys/events", params={"since": since}, headers=headers).json()
+    assert [(c["service_name"], c["event"]) for c in delta["changes"]] == [
+        ("serviceFeed", "created"), ("serviceFeed", "rotated"), ("serviceFeed", "revoked"),
+    ]
+    assert delta["changes"][2]["etag"] is None
+    assert "api_key" not in str(delta) and rotated["api_key"] not in str(delta)
+    assert client.get("/keys/events", params={"since": delta["version"], "timeout": 0.01}, headers=headers).json()["changes"] == []
+    assert "serviceFeed" not in client.get("/keys/events", headers=headers).json()["snapshot"]
+    assert client.get("/keys/events").status_code == 403
+
+    # A version from before a restart (another epoch) gets a snapshot, even when the new
+    # process has published as many changes since.
+    epoch, sequence = delta["version"].split(".")
+    stale = client.get("/keys/events", params={"since": f"0{epoch}.{sequence}"}, headers=headers).json()
+    assert "snapshot" in stale and stale["version"] == delta["version"]
+
+def test_kms_client_caches_revalidates_and_follows_rotation(monkeypatch):
+    from fountainai_common.kms_client import KMSClient, KeyNotFoundError
+
+    headers = generate_admin_token()
+    original = create_key("serviceSdk", headers).json()["api_key"]
+    token = headers["Authorization"].split(" ", 1)[1]
+    kms = KMSClient(http=client, token=token, watch_timeout=0.01)
+    requests = []
+    monkeypatch.setattr(client, "get", lambda url, **kw: requests.append(url) or TestClient.get(client, url, **kw))
+
+    assert kms.get_key("serviceSdk") == original
+    assert kms.get_key("serviceSdk") == original
+    assert requests == ["/keys/serviceSdk"]
+
+    # Once stale, the key is revalidated with its etag and a 304 keeps the cached value.
+    kms._cache["serviceSdk"] = kms._cache["serviceSdk"][:2] + (0,)
+    assert kms.get_key("serviceSdk") == original
+    assert len(requests) == 2
+
+    seen = []
+    kms.on_rotate(lambda name, api_key: seen.append((name, api_key)))
+    kms.poll_events()  # First poll: a snapshot that matches the cache.
+    assert seen == []
+    rotated = rotate_key("serviceSdk", headers).json()["api_key"]
+    kms.poll_events()
+    assert seen == [("serviceSdk", rotated)] and kms.get_key("serviceSdk") == rotated
+    revoke_key("serviceSdk", headers)
+    kms.poll_events()
+    assert seen[-1] == ("serviceSdk", None)
+    with pytest.raises(KeyNotFoundError):
+        kms.get_key("serviceSdk")
+
+def test_requests_are_traced_and_tokens_checked_against_the_shared_revocation_list():
+    response = client.get("/openapi.json", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
+
+    main.revocation_list.apply({"version": "test.1", "snapshot": [{"jti": "revoked-jti", "expires": time.time() + 60}]})
+    with pytest.raises(JWTError):
+        main.jwks_verifier.decode(jwt.encode({"jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
+    main.revocation_list.apply({"version": "test.2", "snapshot": []})
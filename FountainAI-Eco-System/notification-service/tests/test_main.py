@@ -1,12 +1,17 @@
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from jose import jwt
+from jose import JWTError, jwt
 
 # Import objects from our application.
+import main
 from main import app, Base, get_db, SECRET_KEY, Notification
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 # Use an in-memory SQLite database.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
@@ -94,3 +99,12 @@ def test_create_notification_without_admin():
         headers=headers
     )
     assert response.status_code in (401, 403)
+
+def test_requests_are_traced_and_tokens_checked_against_the_shared_revocation_list():
+    response = client.get("/openapi.json", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
+
+    main.revocation_list.apply({"version": "test.1", "snapshot": [{"jti": "revoked-jti", "expires": time.time() + 60}]})
+    with pytest.raises(JWTError):
+        main.jwks_verifier.decode(jwt.encode({"jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
+    main.revocation_list.apply({"version": "test.2", "snapshot": []})
@@ -13,20 +13,24 @@ import sys
 import logging
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, Query, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status, Response
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 from prometheus_fastapi_instrumentator import Instrumentator
 from dotenv import load_dotenv
-import httpx
-from jose import JWTError, jwt
+from jose import JWTError
 
 # SQLAlchemy imports for SQLite persistence
 from sqlalchemy import create_engine, Column, Integer, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
+from fountainai_common import tracing
+from fountainai_common.tracing import TracingMiddleware, trace_engine
+from fountainai_common.auth import JWKSVerifier, RevocationList
+from fountainai_common.discovery import ServiceDiscovery
+
 # -----------------------------------------------------------------------------
 # Load Environment Variables
 # -----------------------------------------------------------------------------
@@ -34,8 +38,29 @@ load_dotenv()
 SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./paraphrase.db")
 API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://gateway:8000")
+DISCOVERY_POLL_TIMEOUT = float(os.getenv("DISCOVERY_POLL_TIMEOUT", "30"))
+DISCOVERY_RETRY_INTERVAL = float(os.getenv("DISCOVERY_RETRY_INTERVAL", "5"))
+DISCOVERY_STALE_TTL = float(os.getenv("DISCOVERY_STALE_TTL", "300"))
+DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", "2"))
 JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret_key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWKS_URL = os.getenv("JWKS_URL", "")  # e.g. http://fountainai-rbac:8001/.well-known/jwks.json
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "300"))
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "2"))
+JWT_ACCEPT_HMAC = os.getenv("JWT_ACCEPT_HMAC", "true").lower() == "true"
+REVOCATIONS_URL = os.getenv("REVOCATIONS_URL", "")  # e.g. http://fountainai-rbac:8001/token/revocations
+REVOCATIONS_POLL_TIMEOUT = float(os.getenv("REVOCATIONS_POLL_TIMEOUT", "30"))
+REVOCATIONS_RETRY_INTERVAL = float(os.getenv("REVOCATIONS_RETRY_INTERVAL", "5"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "paraphrase_service")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+TRACE_STATEMENT_MAX_LENGTH = int(os.getenv("TRACE_STATEMENT_MAX_LENGTH", "1024"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -47,6 +72,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger("paraphrase_service")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+    statement_max_length=TRACE_STATEMENT_MAX_LENGTH,
+)
+
 # -----------------------------------------------------------------------------
 # SQLAlchemy Database Setup
 # -----------------------------------------------------------------------------
@@ -54,6 +94,7 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 )
+trace_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -74,6 +115,25 @@ def get_db():
     finally:
         db.close()
 
+# -----------------------------------------------------------------------------
+# Token Revocation (Change Stream from fountainai-rbac)
+# -----------------------------------------------------------------------------
+revocation_list = RevocationList(
+    url=REVOCATIONS_URL, poll_timeout=REVOCATIONS_POLL_TIMEOUT, retry_interval=REVOCATIONS_RETRY_INTERVAL
+)
+
+# -----------------------------------------------------------------------------
+# JWKS Verification (Asymmetric Tokens from fountainai-rbac)
+# -----------------------------------------------------------------------------
+jwks_verifier = JWKSVerifier(
+    url=JWKS_URL,
+    refresh_interval=JWKS_REFRESH_INTERVAL,
+    min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+    timeout=JWKS_TIMEOUT,
+    accept_hmac=JWT_ACCEPT_HMAC,
+    revocations=revocation_list,
+)
+
 # -----------------------------------------------------------------------------
 # JWT Authentication (RBAC)
 # -----------------------------------------------------------------------------
@@ -81,7 +141,7 @@ http_bearer = HTTPBearer()
 
 def verify_jwt(token: str) -> dict:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwks_verifier.decode(token, JWT_SECRET, JWT_ALGORITHM)
         return payload
     except JWTError as e:
         logger.error(f"JWT validation failed: {e}")
@@ -117,16 +177,16 @@ class StandardError(BaseModel):
     details: Optional[str]
 
 # -----------------------------------------------------------------------------
-# Helper Function for Service Discovery via API Gateway
+# Service Discovery (Registry Watch on the API Gateway)
 # -----------------------------------------------------------------------------
-def get_service_url(service_name: str) -> str:
-    try:
-        r = httpx.get(f"{API_GATEWAY_URL}/lookup/{service_name}", timeout=5.0)
-        r.raise_for_status()
-        return r.json().get("url")
-    except Exception as e:
-        logger.error(f"Service discovery failed for '{service_name}': {e}")
-        raise HTTPException(status_code=503, detail=f"Service discovery failed for '{service_name}'")
+# Peer calls resolve a base URL per call with `await discovery.resolve(service_name)`.
+discovery = ServiceDiscovery(
+    API_GATEWAY_URL,
+    poll_timeout=DISCOVERY_POLL_TIMEOUT,
+    retry_interval=DISCOVERY_RETRY_INTERVAL,
+    stale_ttl=DISCOVERY_STALE_TTL,
+    timeout=DISCOVERY_TIMEOUT,
+)
 
 # -----------------------------------------------------------------------------
 # FastAPI Application Initialization
@@ -143,6 +203,40 @@ app = FastAPI(
 
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+@app.on_event("startup")
+async def start_jwks_refresh():
+    jwks_verifier.start()
+
+@app.on_event("shutdown")
+async def stop_jwks_refresh():
+    jwks_verifier.stop()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    revocation_list.stop()
+
+@app.on_event("startup")
+async def start_discovery():
+    discovery.start()
+
+@app.on_event("shutdown")
+async def stop_discovery():
+    await discovery.aclose()
+
 # -----------------------------------------------------------------------------
 # Endpoints for Paraphrase Service
 # -----------------------------------------------------------------------------
@@ -1,7 +1,13 @@
+import time
+
 import pytest
 from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+import main
 from main import app, Base, SessionLocal, Paraphrase
 
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
 @pytest.fixture(scope="module")
 def client():
     with TestClient(app) as c:
@@ -67,3 +73,11 @@ def test_update_paraphrase(client: TestClient):
     data = patch_resp.json()
     assert data["text"] == "Updated paraphrase text."
 
+def test_requests_are_traced_and_tokens_checked_against_the_shared_revocation_list(client: TestClient):
+    response = client.get("/health", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+    assert response.headers["traceresponse"].split("-")[1] == TRACE_ID
+
+    main.revocation_list.apply({"version": "test.1", "snapshot": [{"jti": "revoked-jti", "expires": time.time() + 60}]})
+    with pytest.raises(JWTError):
+        main.jwks_verifier.decode(jwt.encode({"jti": "revoked-jti"}, "k", algorithm="HS256"), "k", "HS256")
+    main.revocation_list.apply({"version": "test.2", "snapshot": []})
@@ -20,7 +20,11 @@ from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from prometheus_fastapi_instrumentator import Instrumentator
 import typesense
-import requests
+import httpx
+
+from fountainai_common import tracing
+from fountainai_common.kms_client import KMSClient
+from fountainai_common.tracing import Span, TracingMiddleware
 
 # -----------------------------------------------------------------------------
 # Configuration
@@ -34,9 +38,17 @@ TYPESENSE_PROTOCOL = os.getenv("TYPESENSE_PROTOCOL", "http")
 TYPESENSE_API_KEY = os.getenv("TYPESENSE_API_KEY", "super_secure_typesense_key")
 
 # Optional: KMS settings for dynamic API key retrieval
-KEY_MANAGEMENT_URL = os.getenv("KEY_MANAGEMENT_URL", "http://key_management_service:8003")
+KEY_MANAGEMENT_URL = os.getenv("KEY_MANAGEMENT_URL", "http://kms-app:8000")
 SERVICE_NAME = os.getenv("SERVICE_NAME", "typesense_client_service")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "typesense_client_service")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
 
 # -----------------------------------------------------------------------------
 # Logging Configuration
@@ -44,9 +56,27 @@ ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("typesense_client_service")
 
+# -----------------------------------------------------------------------------
+# Tracing (W3C Trace Context) and Span Export
+# -----------------------------------------------------------------------------
+tracing.configure(
+    service_name=TRACE_SERVICE_NAME,
+    enabled=TRACING_ENABLED,
+    exporter=TRACE_EXPORTER,
+    path=TRACE_FILE,
+    endpoint=OTLP_ENDPOINT,
+    sample_ratio=TRACE_SAMPLE_RATIO,
+    export_interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_MAX_QUEUE,
+)
+
 # -----------------------------------------------------------------------------
 # KMS Integration (Optional)
 # -----------------------------------------------------------------------------
+# Only used when TYPESENSE_API_KEY is empty. The client caches the key and, once
+# watching, swaps in the new key as soon as it is rotated in KMS.
+kms_client = None if TYPESENSE_API_KEY else KMSClient(KEY_MANAGEMENT_URL, token=ADMIN_TOKEN)
+
 def retrieve_typesense_api_key_via_kms() -> str:
     """
     Retrieve the Typesense API key from KMS if not provided in the environment.
@@ -54,15 +84,8 @@ def retrieve_typesense_api_key_via_kms() -> str:
     if TYPESENSE_API_KEY:
         return TYPESENSE_API_KEY
     try:
-        resp = requests.get(
-            f"{KEY_MANAGEMENT_URL}/api-keys/{SERVICE_NAME}",
-            headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
-            timeout=5
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("typesense_api_key", "")
-    except Exception as ex:
+        return kms_client.get_key(SERVICE_NAME)
+    except (httpx.HTTPError, LookupError) as ex:
         logger.error("Failed to retrieve Typesense API key from KMS: %s", ex)
         raise RuntimeError(f"Failed to retrieve Typesense API key from KMS: {ex}")
 
@@ -81,6 +104,19 @@ typesense_client = typesense.Client({
     "connection_timeout_seconds": 2
 })
 
+def typesense_span(operation: str, collection: str) -> Span:
+    """Client span around one call to the Typesense server (the typesense library cannot carry hooks)."""
+    return Span(
+        f"typesense {operation}",
+        kind="client",
+        attributes={
+            "db.system": "typesense",
+            "db.operation": operation,
+            "db.collection": collection,
+            "net.peer.name": TYPESENSE_HOST,
+        },
+    )
+
 # -----------------------------------------------------------------------------
 # Pydantic Schemas
 # -----------------------------------------------------------------------------
@@ -149,6 +185,32 @@ app.openapi = custom_openapi
 # -----------------------------------------------------------------------------
 Instrumentator().instrument(app).expose(app)
 
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    tracing.span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    tracing.span_exporter.shutdown()
+
+def use_rotated_api_key(service_name: str, api_key: Optional[str]):
+    if service_name == SERVICE_NAME and api_key:
+        typesense_client.config.api_key = api_key
+        logger.info("Typesense API key rotated via KMS")
+
+@app.on_event("startup")
+async def watch_kms_rotations():
+    if kms_client is not None:
+        kms_client.on_rotate(use_rotated_api_key)
+        kms_client.watch()
+
+@app.on_event("shutdown")
+async def stop_kms_watch():
+    if kms_client is not None:
+        kms_client.close()
+
 # -----------------------------------------------------------------------------
 # Endpoints
 # -----------------------------------------------------------------------------
@@ -170,11 +232,13 @@ def create_collection(payload: CreateCollectionRequest = Body(...)):
             schema["default_sorting_field"] = payload.default_sorting_field
 
         try:
-            collection = typesense_client.collections.create(schema)
+            with typesense_span("collections.create", payload.name):
+                collection = typesense_client.collections.create(schema)
             logger.info("Created collection '%s'", payload.name)
         except typesense.exceptions.ObjectAlreadyExists:
             logger.warning("Collection '%s' already exists.", payload.name)
-            collection = typesense_client.collections[payload.name].retrieve()
+            with typesense_span("collections.retrieve", payload.name):
+                collection = typesense_client.collections[payload.name].retrieve()
 
         return CollectionResponse(
             name=collection["name"],
@@ -191,7 +255,8 @@ def get_collection(name: str = Path(..., description="The collection name")):
     Retrieve an existing collection by name.
     """
     try:
-        collection = typesense_client.collections[name].retrieve()
+        with typesense_span("collections.retrieve", name):
+            collection = typesense_client.collections[name].retrieve()
         return CollectionResponse(
             name=collection["name"],
             num_documents=collection.get("num_documents", 0),
@@ -213,13 +278,15 @@ def sync_document(payload: DocumentSyncPayload = Body(...)):
         if operation in ["create", "update"]:
             if "id" not in payload.document:
                 raise HTTPException(status_code=400, detail="Missing 'id' in document for upsert.")
-            typesense_client.collections[payload.collection_name].documents.upsert(payload.document)
+            with typesense_span("documents.upsert", payload.collection_name):
+                typesense_client.collections[payload.collection_name].documents.upsert(payload.document)
             return {"message": "Document upserted successfully."}
         elif operation == "delete":
             doc_id = payload.document.get("id")
             if not doc_id:
                 raise HTTPException(status_code=400, detail="Missing 'id' in document for deletion.")
-            typesense_client.collections[payload.collection_name].documents[doc_id].delete()
+            with typesense_span("documents.delete", payload.collection_name):
+                typesense_client.collections[payload.collection_name].documents[doc_id].delete()
             return {"message": "Document deleted successfully."}
         else:
             raise HTTPException(status_code=400, detail="Invalid operation type.")
@@ -233,7 +300,8 @@ def search_documents(req: SearchRequest = Body(...)):
     Perform a search in a specified collection with user-defined parameters.
     """
     try:
-        results = typesense_client.collections[req.collection_name].documents.search(req.parameters)
+        with typesense_span("documents.search", req.collection_name):
+            results = typesense_client.collections[req.collection_name].documents.search(req.parameters)
         hits = [{"document": hit["document"]} for hit in results.get("hits", [])]
         return SearchResponse(hits=hits, found=results.get("found", 0))
     except Exception as e: